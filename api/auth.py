@@ -1,11 +1,22 @@
 # api/auth.py
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from contextlib import contextmanager
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from reference_cache import ReferenceCache
+import hashlib
 import ldap3
+from ldap3.core.exceptions import LDAPBindError
+import logging
 import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -15,6 +26,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 480
 # LDAP Configuration
 LDAP_SERVER = os.getenv("LDAP_SERVER", "ldap://your-domain-controller")
 LDAP_DOMAIN = os.getenv("LDAP_DOMAIN", "company.local")
+LDAP_POOL_SIZE = int(os.getenv("LDAP_POOL_SIZE", "8"))
+LDAP_GROUP_CACHE_TTL = float(os.getenv("LDAP_GROUP_CACHE_TTL", "900"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -42,44 +56,129 @@ ROLES = {
     }
 }
 
+class LDAPConnectionPool:
+    """Open LDAP connections reused across logins.
+
+    The ``ldap3.Server`` (and its schema/DSE info) is created once per process.
+    A login rebinds a pooled connection with the user's credentials instead of
+    opening a socket, so only the NTLM bind itself stays on the login path.
+    """
+
+    def __init__(self, url: str = LDAP_SERVER, size: int = LDAP_POOL_SIZE):
+        self.url = url
+        self.size = size
+        self._server = None
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def server(self) -> ldap3.Server:
+        with self._lock:
+            if self._server is None:
+                self._server = ldap3.Server(self.url, get_info=ldap3.ALL)
+            return self._server
+
+    def _open(self) -> ldap3.Connection:
+        server = self.server
+        conn = ldap3.Connection(server, authentication=ldap3.NTLM)
+        conn.open(read_server_info=server.info is None)
+        return conn
+
+    def _acquire(self) -> ldap3.Connection:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    break
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, conn: ldap3.Connection):
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            # Possibly a dead socket: replace it rather than hand it out again
+            self._discard(conn)
+            raise
+        if conn.closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+ldap_pool = LDAPConnectionPool()
+
+# Directory details per user; groups rarely change within a shift
+group_cache = ReferenceCache(max_entries=TOKEN_CACHE_SIZE, default_ttl=LDAP_GROUP_CACHE_TTL, namespace="ldap_groups")
+
+def _search_base() -> str:
+    return ",".join(f"DC={part}" for part in LDAP_DOMAIN.split("."))
+
+def _lookup_user(conn: ldap3.Connection, username: str) -> Optional[Dict]:
+    conn.search(
+        search_base=_search_base(),
+        search_filter=f"(sAMAccountName={ldap3.utils.conv.escape_filter_chars(username)})",
+        attributes=['memberOf', 'displayName', 'mail']
+    )
+    if not conn.entries:
+        return None
+
+    entry = conn.entries[0]
+    return {
+        "full_name": str(entry.displayName),
+        "email": str(entry.mail),
+        "groups": [group.split(',')[0].split('=')[1] for group in entry.memberOf.values]
+    }
+
 def authenticate_ldap(username: str, password: str) -> Optional[User]:
     """Authenticate user against LDAP/Active Directory"""
-    
+    if not password:
+        return None  # an empty password would be an anonymous bind
+
     try:
-        server = ldap3.Server(LDAP_SERVER, get_info=ldap3.ALL)
         user_dn = f"{username}@{LDAP_DOMAIN}"
-        
-        conn = ldap3.Connection(
-            server,
-            user=user_dn,
-            password=password,
-            authentication=ldap3.NTLM
-        )
-        
-        if conn.bind():
-            # Get user groups
-            conn.search(
-                search_base=f"DC={LDAP_DOMAIN.split('.')[0]},DC={LDAP_DOMAIN.split('.')[1]}",
-                search_filter=f"(sAMAccountName={username})",
-                attributes=['memberOf', 'displayName', 'mail']
-            )
-            
-            if conn.entries:
-                entry = conn.entries[0]
-                groups = [group.split(',')[0].split('=')[1] 
-                         for group in entry.memberOf.values]
-                
-                return User(
-                    username=username,
-                    full_name=str(entry.displayName),
-                    email=str(entry.mail),
-                    groups=groups
-                )
-        
-        return None
-        
+
+        with ldap_pool.connection() as conn:
+            # Without raise_exceptions ldap3 reports a failed bind by returning False
+            try:
+                if not conn.rebind(user=user_dn, password=password, authentication=ldap3.NTLM, read_server_info=False):
+                    return None  # wrong credentials; the connection stays usable
+            except LDAPBindError:
+                return None
+
+            # Group search only on a cache miss
+            details = group_cache.get(f"user:{username.lower()}", lambda: _lookup_user(conn, username))
+            if details is None:
+                group_cache.invalidate(f"user:{username.lower()}")
+                return None
+
+        return User(username=username, **details)
+
     except Exception as e:
-        print(f"LDAP authentication error: {e}")
+        logger.error(f"LDAP authentication error: {e}")
         return None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -105,4 +204,57 @@ def get_user_role(groups: List[str]) -> str:
     elif "Engineers" in groups or "Technical-Staff" in groups:
         return "engineer"
     else:
-        return "viewer"
\ No newline at end of file
+        return "viewer"
+
+def user_permissions(role: str) -> List[str]:
+    return ROLES.get(role, ROLES["viewer"])["permissions"]
+
+def create_user_token(user: User) -> str:
+    """Access token carrying the user's role, so requests need no directory lookup"""
+    return create_access_token({"sub": user.username, "role": get_user_role(user.groups)})
+
+class TokenCache:
+    """Verified JWT claims by token, kept until the token expires.
+
+    Signature checks and role resolution happen once per token; later requests
+    with the same token are a dictionary lookup.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # digest -> (exp, claims)
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> Optional[Dict]:
+        """Claims with ``role`` and ``permissions``, or None for an invalid token"""
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(digest)
+                    return entry[1]
+                del self._entries[digest]
+
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        if not claims.get("sub"):
+            return None
+
+        role = claims.get("role") if claims.get("role") in ROLES else "viewer"
+        claims = {**claims, "role": role, "permissions": user_permissions(role)}
+
+        with self._lock:
+            self._entries[digest] = (float(claims.get("exp", now)), claims)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+token_cache = TokenCache()
+
+def verify_access_token(token: str) -> Optional[Dict]:
+    return token_cache.verify(token)
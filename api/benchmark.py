@@ -0,0 +1,545 @@
+# api/benchmark.py
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "pump valve compressor pressure flow rate seal bearing vibration turbine separator "
+    "wellhead pipeline corrosion inspection maintenance shutdown startup procedure safety "
+    "permit isolation lockout temperature sensor calibration alarm trip setpoint manifold "
+    "flare gas oil water injection choke casing tubing packer mud drilling rig crane "
+    "lifting hazard incident report contractor schedule budget procurement vendor"
+).split()
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "langchain", "pandas", "PyPDF2", "docx", "openpyxl", "pyodbc", "cx_Oracle")
+
+# Run in a fresh interpreter, so imports are cold
+STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+rss_after_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+warm_up = main.get_embedding_batcher().engine.warm_up()
+print(json.dumps({
+    "import_seconds": round(imported - start, 3),
+    "max_rss_after_import_mb": round(rss_after_import / 1024, 1),
+    "heavy_modules_after_import": loaded,
+    "embedding_warm_up_seconds": round(warm_up, 3),
+    "max_rss_after_warm_up_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+}))
+"""
+
+class FakeOllama:
+    """Deterministic stand-in for ``ollama.AsyncClient``.
+
+    A call sleeps ``prefill_ms_per_1k`` per thousand prompt tokens, then
+    ``token_ms`` per generated token (streamed one token per chunk), and reports
+    the same counters Ollama does, so timing and telemetry code paths run as in
+    production.
+    """
+
+    def __init__(self, token_ms: float = 2.0, prefill_ms_per_1k: float = 15.0, answer_tokens: int = 64):
+        self.token_ms = token_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.answer_tokens = answer_tokens
+        self.loaded: Dict[str, object] = {}
+        self.calls = 0
+
+    def _prompt_tokens(self, messages: List[dict]) -> int:
+        return sum(len(m.get("content", "")) for m in messages) // 4
+
+    def _counters(self, model: str, prompt_tokens: int, prefill: float, decode: float) -> dict:
+        return {
+            "model": model,
+            "done": True,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": self.answer_tokens,
+            "eval_duration": int(decode * 1e9)
+        }
+
+    async def chat(self, model: str, messages: List[dict], stream: bool = False, **kwargs):
+        self.calls += 1
+        prompt_tokens = self._prompt_tokens(messages)
+        prefill = prompt_tokens / 1000 * self.prefill_ms_per_1k / 1000
+        if stream:
+            return self._stream(model, prompt_tokens, prefill)
+
+        decode = self.answer_tokens * self.token_ms / 1000
+        await asyncio.sleep(prefill + decode)
+        answer = " ".join(f"token{i}" for i in range(self.answer_tokens))
+        return {"message": {"role": "assistant", "content": answer}, **self._counters(model, prompt_tokens, prefill, decode)}
+
+    async def _stream(self, model: str, prompt_tokens: int, prefill: float):
+        await asyncio.sleep(prefill)
+        decode_start = time.perf_counter()
+        for i in range(self.answer_tokens):
+            await asyncio.sleep(self.token_ms / 1000)
+            yield {"model": model, "done": False, "message": {"role": "assistant", "content": f"token{i} "}}
+        decode = time.perf_counter() - decode_start
+        yield {"message": {"role": "assistant", "content": ""}, **self._counters(model, prompt_tokens, prefill, decode)}
+
+    async def list(self):
+        return {"models": [{"name": name} for name in self.loaded]}
+
+    async def ps(self):
+        return {"models": [{"name": name} for name in self.loaded]}
+
+    async def generate(self, model: str, prompt: str = "", keep_alive=None, **kwargs):
+        if keep_alive == 0:
+            self.loaded.pop(model, None)
+        else:
+            self.loaded[model] = keep_alive
+        return {"model": model, "response": "", "done": True}
+
+class InMemoryRedis:
+    """The subset of ``redis.asyncio.Redis`` the API uses, kept in a dict"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}  # key -> (expires_at or None, value)
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    async def get(self, key: str):
+        entry = self._live(key)
+        return None if entry is None else entry[1]
+
+    async def set(self, key: str, value, ex: Optional[int] = None):
+        self._data[key] = (time.monotonic() + ex if ex else None, str(value))
+        return True
+
+    async def setex(self, key: str, seconds: int, value):
+        return await self.set(key, value, ex=seconds)
+
+    async def incr(self, key: str) -> int:
+        return self.sync().incr(key)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def aclose(self):
+        pass
+
+    def sync(self) -> "SyncRedisView":
+        return SyncRedisView(self)
+
+class SyncRedisView:
+    """Synchronous ``incr`` over an InMemoryRedis, for semantic_cache.set_version_client"""
+
+    def __init__(self, redis: InMemoryRedis):
+        self.redis = redis
+
+    def incr(self, key: str) -> int:
+        entry = self.redis._live(key)
+        value = int(entry[1]) + 1 if entry else 1
+        self.redis._data[key] = (entry[0] if entry else None, str(value))
+        return value
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Minimal text PDF (one Helvetica text block per page), without a PDF library"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body.encode('latin-1'))} >>\nstream\n{body}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_docx(path: str, rng: random.Random, sections: int):
+    import docx
+    document = docx.Document()
+    for i in range(sections):
+        document.add_heading(f"Section {i + 1}: {synthetic_text(rng, 4)}", level=2)
+        for _ in range(4):
+            document.add_paragraph(synthetic_text(rng, 80))
+    document.save(path)
+
+def write_xlsx(path: str, rng: random.Random, rows: int):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Equipment")
+    sheet.append(["equipment_id", "type", "location", "pressure_bar", "temperature_c", "status", "notes"])
+    for i in range(rows):
+        sheet.append([
+            f"EQ-{i:05d}", rng.choice(WORDS), f"Area {rng.randint(1, 40)}",
+            round(rng.uniform(1, 250), 2), round(rng.uniform(-20, 180), 1),
+            rng.choice(["running", "standby", "maintenance"]), synthetic_text(rng, 12)
+        ])
+    workbook.save(path)
+
+def generate_documents(target_dir: str, count: int, seed: int = 0) -> Dict[str, List[str]]:
+    """``count`` synthetic PDF, DOCX and XLSX files each, by extension"""
+    rng = random.Random(seed)
+    os.makedirs(target_dir, exist_ok=True)
+    files: Dict[str, List[str]] = {".pdf": [], ".docx": [], ".xlsx": []}
+    for i in range(count):
+        path = os.path.join(target_dir, f"manual_{i}.pdf")
+        write_pdf(path, [[synthetic_text(rng, 12) for _ in range(60)] for _ in range(20)])
+        files[".pdf"].append(path)
+
+        path = os.path.join(target_dir, f"procedure_{i}.docx")
+        write_docx(path, rng, sections=20)
+        files[".docx"].append(path)
+
+        path = os.path.join(target_dir, f"register_{i}.xlsx")
+        write_xlsx(path, rng, rows=2000)
+        files[".xlsx"].append(path)
+    return files
+
+def latency_stats(latencies: List[float], elapsed: float, errors: int = 0) -> Dict:
+    """Percentiles in milliseconds and throughput of one measured run"""
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2) if len(ms) else None,
+        "p95_ms": round(float(np.percentile(ms, 95)), 2) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 2) if len(ms) else None,
+        "mean_ms": round(float(ms.mean()), 2) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 2) if len(ms) else None,
+        "throughput_per_sec": round(len(latencies) / elapsed, 2) if elapsed else None
+    }
+
+async def run_load(send: Callable[[dict], Awaitable[bool]], payloads: List[dict], concurrency: int) -> Dict:
+    """Send ``payloads`` with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(payload: dict):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            ok = await send(payload)
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(payload) for payload in payloads])
+    return latency_stats(latencies, time.perf_counter() - started, errors)
+
+class Benchmark:
+    """The API and ingestion path, in-process against local stand-ins.
+
+    Ollama is a FakeOllama, Redis an InMemoryRedis and the vector store a
+    persistent Chroma instance (or the embedded local store) under ``state_dir``.
+    Embeddings, retrieval, context packing, routing and caching are the real code.
+    """
+
+    def __init__(self, state_dir: str, vector_store: str = "chroma", llm: Optional[FakeOllama] = None):
+        self.state_dir = state_dir
+        self.vector_store = vector_store
+        self.llm = llm or FakeOllama()
+
+        # Read at import time by the modules below, so set before importing them
+        os.environ["MANIFEST_DIR"] = os.path.join(state_dir, "manifests")
+        os.environ["LEXICAL_INDEX_DIR"] = os.path.join(state_dir, "lexical")
+        os.environ["UPLOAD_DIR"] = os.path.join(state_dir, "uploads")
+
+        # Indexing bumps collection versions synchronously; point it at the stand-in
+        from semantic_cache import set_version_client
+        self.redis = InMemoryRedis()
+        set_version_client(self.redis.sync())
+
+    def vector_client(self):
+        if self.vector_store == "local":
+            from vector_store import LocalVectorClient
+            return LocalVectorClient(os.path.join(self.state_dir, "vectors"))
+        import chromadb
+        return chromadb.PersistentClient(path=os.path.join(self.state_dir, "chroma"))
+
+    def processor(self, client):
+        from document_processor import DocumentProcessor
+        processor = DocumentProcessor()
+        processor._client = client
+        return processor
+
+    def build_app(self):
+        """The FastAPI app with the state its lifespan would create, on stand-ins"""
+        import main
+        from collection_registry import get_collection_registry
+        from embedding_batcher import get_embedding_batcher
+        from jobs import JobManager
+        from model_residency import FakeBackend, ModelResidencyManager
+        from model_router import get_model_router
+        from gpu_optimizer import GPUOptimizer
+        from semantic_cache import SemanticCache
+        from telemetry import track_queue_depth
+        from write_behind import get_write_behind_queue
+
+        state = main.app.state
+        state.chroma_client = self.vector_client()
+        state.redis_client = self.redis
+        state.ollama_client = self.llm
+        state.collections = get_collection_registry(state.chroma_client)
+        state.write_behind = get_write_behind_queue(state.chroma_client)
+        state.embedder = get_embedding_batcher()
+        state.semantic_cache = SemanticCache()
+        state.document_processor = self.processor(state.chroma_client)
+        state.job_manager = JobManager(state.redis_client)
+        state.model_router = get_model_router()
+        state.residency = ModelResidencyManager(FakeBackend(), GPUOptimizer(max_memory_gb=11), warm_set=[])
+        track_queue_depth(state.residency.queue_depth)
+        return main.app
+
+    def startup(self) -> Dict:
+        """Cold import time of the API, and peak RSS before and after loading the embedding model (Linux)"""
+        probe = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{STARTUP_PROBE}"
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def seed_corpus(self, app, collection: str, chunks: int, seed: int = 0):
+        rng = random.Random(seed)
+        documents = [
+            {"content": synthetic_text(rng, 150), "metadata": {"source": f"seed_{i // 20}.txt", "page": i % 20}}
+            for i in range(chunks)
+        ]
+        app.state.document_processor.index_documents(documents, collection)
+
+    async def query_scenarios(self, requests: int, concurrency: int, corpus_chunks: int, seed: int = 0) -> Dict:
+        """/api/query latency for cache misses and hits, with and without RAG"""
+        import httpx
+        from auth import create_access_token
+
+        import main
+        app = self.build_app()
+        app.state.warm_up = asyncio.create_task(main.warm_up_models(app))
+        await app.state.warm_up
+        collection = "benchmark"
+        await asyncio.to_thread(self.seed_corpus, app, collection, corpus_chunks, seed)
+
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'benchmark', 'role': 'admin'})}"}
+        rng = random.Random(seed)
+        results = {}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                     headers=headers, timeout=300) as client:
+            async def send(payload: dict) -> bool:
+                response = await client.post("/api/query", json=payload)
+                return response.status_code == 200
+
+            for use_rag in (True, False):
+                label = "rag" if use_rag else "no_rag"
+                payloads = [
+                    {"query": f"{synthetic_text(rng, 10)} #{i}", "collection": collection, "use_rag": use_rag}
+                    for i in range(requests)
+                ]
+
+                # Unique queries miss the exact cache; disable semantic matches for the miss run
+                threshold = app.state.semantic_cache.threshold
+                app.state.semantic_cache.threshold = 2.0
+                try:
+                    results[f"query_miss_{label}"] = await run_load(send, payloads, concurrency)
+                finally:
+                    app.state.semantic_cache.threshold = threshold
+
+                # The miss run cached every answer, so repeating the queries hits
+                results[f"query_hit_{label}"] = await run_load(send, payloads, concurrency)
+        return results
+
+    def ingestion_scenarios(self, files_per_type: int, seed: int = 0) -> Dict:
+        """Extraction and indexing time per synthetic file, by file type"""
+        processor = self.processor(self.vector_client())
+        files = generate_documents(os.path.join(self.state_dir, "documents"), files_per_type, seed)
+        results = {}
+
+        for extension, paths in files.items():
+            extract, index, total = [], [], []
+            chunks = 0
+            size = sum(os.path.getsize(p) for p in paths)
+            started = time.perf_counter()
+            for path in paths:
+                start = time.perf_counter()
+                file_chunks = processor.process_file(path)
+                extracted = time.perf_counter()
+                processor.index_documents(file_chunks, f"benchmark_ingest{extension.replace('.', '_')}")
+                done = time.perf_counter()
+
+                extract.append(extracted - start)
+                index.append(done - extracted)
+                total.append(done - start)
+                chunks += len(file_chunks)
+            elapsed = time.perf_counter() - started
+
+            results[f"ingest{extension.replace('.', '_')}"] = {
+                **latency_stats(total, elapsed),
+                "extract_p50_ms": round(float(np.percentile(extract, 50)) * 1000, 2),
+                "index_p50_ms": round(float(np.percentile(index, 50)) * 1000, 2),
+                "chunks": chunks,
+                "chunks_per_sec": round(chunks / elapsed, 2),
+                "mb_per_sec": round(size / 2**20 / elapsed, 3)
+            }
+        return results
+
+    def large_pdf_scenario(self, pages: int, seed: int = 0) -> Dict:
+        """Page-streaming extraction and chunking of one long synthetic manual"""
+        rng = random.Random(seed)
+        path = os.path.join(self.state_dir, "documents", f"manual_{pages}_pages.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_pdf(path, [[synthetic_text(rng, 12) for _ in range(60)] for _ in range(pages)])
+        processor = self.processor(None)  # extraction only, no vector store
+
+        started = time.perf_counter()
+        chunks = processor.process_pdf(path)
+        elapsed = time.perf_counter() - started
+
+        # Second pass for memory: tracing slows the run, so it is not timed
+        tracemalloc.start()
+        processor.process_pdf(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            "pages": pages,
+            "file_mb": round(os.path.getsize(path) / 2**20, 2),
+            "chunks": len(chunks),
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(pages / elapsed, 1),
+            "peak_traced_mb": round(peak / 2**20, 1)
+        }
+
+        # Chunking alone, against langchain's splitter when it is installed
+        page_texts = list(processor.pdf_pages(path))
+        text = "\n".join(page_text for _, page_text in page_texts)
+        started = time.perf_counter()
+        list(processor.chunker.split_pages(page_texts))
+        result["chunker_mb_per_sec"] = round(len(text) / 2**20 / (time.perf_counter() - started), 1)
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            RecursiveCharacterTextSplitter = None
+        if RecursiveCharacterTextSplitter is not None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=processor.chunker.chunk_size, chunk_overlap=processor.chunker.chunk_overlap
+            )
+            started = time.perf_counter()
+            splitter.split_text(text)
+            result["langchain_mb_per_sec"] = round(len(text) / 2**20 / (time.perf_counter() - started), 1)
+        return result
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Scenarios whose p95 grew by more than ``tolerance`` over the baseline"""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not previous.get("p95_ms") or current.get("p95_ms") is None:
+            continue
+        ratio = current["p95_ms"] / previous["p95_ms"]
+        current["p95_vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency and throughput benchmark of the API and ingestion")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per query scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--corpus-chunks", type=int, default=2000, help="Chunks indexed before the query runs")
+    parser.add_argument("--files", type=int, default=3, help="Synthetic files per type for the ingestion run")
+    parser.add_argument("--pdf-pages", type=int, default=2000, help="Pages of the long PDF extraction run (0 skips it)")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="Fake LLM time per generated token")
+    parser.add_argument("--prefill-ms", type=float, default=15.0, help="Fake LLM prompt time per 1k tokens")
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--vector-store", choices=["chroma", "local"], default="chroma")
+    parser.add_argument("--state-dir", help="Keep indexes and documents here instead of a temporary directory")
+    parser.add_argument("--skip-startup", action="store_true")
+    parser.add_argument("--skip-query", action="store_true")
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="ai-benchmark-") as scratch:
+        benchmark = Benchmark(
+            args.state_dir or scratch,
+            args.vector_store,
+            FakeOllama(args.token_ms, args.prefill_ms, args.answer_tokens)
+        )
+        startup = None if args.skip_startup else benchmark.startup()
+        scenarios = {}
+        if not args.skip_query:
+            scenarios.update(asyncio.run(
+                benchmark.query_scenarios(args.requests, args.concurrency, args.corpus_chunks, args.seed)
+            ))
+        if not args.skip_ingest:
+            scenarios.update(benchmark.ingestion_scenarios(args.files, args.seed))
+            if args.pdf_pages:
+                scenarios[f"extract_pdf_{args.pdf_pages}_pages"] = benchmark.large_pdf_scenario(args.pdf_pages, args.seed)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "state_dir")},
+        "startup": startup,
+        "scenarios": scenarios
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    print(json.dumps(report, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if regressions:
+        raise SystemExit("p95 regressions: " + "; ".join(regressions))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# api/collection_registry.py
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def is_missing_collection(error: Exception) -> bool:
+    """Whether ``error`` means the collection behind a handle no longer exists.
+
+    Chroma reports it as NotFoundError (0.6+), InvalidCollectionException (0.5)
+    or a ValueError (0.4); the embedded store's files are simply gone.
+    """
+    if isinstance(error, FileNotFoundError):
+        return True
+    if type(error).__name__ in ("NotFoundError", "InvalidCollectionException"):
+        return True
+    message = str(error).lower()
+    return isinstance(error, ValueError) and "collection" in message and "does not exist" in message
+
+class CollectionRegistry:
+    """Collection handles resolved once per vector store client.
+
+    ``get_or_create_collection`` is a round-trip to Chroma, so handles are kept
+    by name (and embedding function, which the handle carries) and reused. A
+    handle goes stale when its collection is deleted or recreated; ``run``
+    re-resolves it and retries once when a call on it fails for that reason.
+    Other errors are raised as-is: the call may have partly applied, and a
+    retried ``add`` or filtered ``delete`` would not be the same operation.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._handles: Dict[Tuple[str, int], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, create: bool = True, embedding_function=None, metadata: Optional[Dict] = None):
+        """Cached handle for ``name``; ``metadata`` only applies when the collection is created"""
+        key = (name, id(embedding_function))
+        handle = self._handles.get(key)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                kwargs = {"embedding_function": embedding_function} if embedding_function is not None else {}
+                if create:
+                    if metadata:
+                        kwargs["metadata"] = metadata
+                    handle = self.client.get_or_create_collection(name, **kwargs)
+                else:
+                    handle = self.client.get_collection(name, **kwargs)
+                self._handles[key] = handle
+            return handle
+
+    def invalidate(self, name: str):
+        """Drop cached handles for ``name`` so the next use resolves it again"""
+        with self._lock:
+            for key in [key for key in self._handles if key[0] == name]:
+                del self._handles[key]
+
+    def run(self, name: str, fn: Callable[[Any], T], create: bool = True, embedding_function=None) -> T:
+        """``fn(collection)``, retried once on a freshly resolved handle if the collection went away"""
+        try:
+            return fn(self.get(name, create, embedding_function))
+        except Exception as e:
+            if not is_missing_collection(e):
+                raise
+            logger.warning(f"Collection {name} handle is stale, refreshing: {e}")
+            self.invalidate(name)
+            return fn(self.get(name, create, embedding_function))
+
+_registries: Dict[int, CollectionRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_collection_registry(client) -> CollectionRegistry:
+    """Shared registry per vector store client"""
+    with _registries_lock:
+        # The registry holds the client, so its id is not reused while cached
+        if id(client) not in _registries:
+            _registries[id(client)] = CollectionRegistry(client)
+        return _registries[id(client)]
@@ -0,0 +1,130 @@
+# api/context_packer.py
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from model_config import context_length, tokenizer_name
+
+logger = logging.getLogger(__name__)
+
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "2048"))
+ANSWER_RESERVE_TOKENS = int(os.getenv("ANSWER_RESERVE_TOKENS", "1024"))
+MIN_OVERLAP_CHARS = 32
+
+class TokenCounter:
+    """Counts tokens with a model's Hugging Face tokenizer.
+
+    Falls back to a ~4 characters per token estimate when no tokenizer is
+    declared in models.yml or it cannot be loaded (e.g. offline installs).
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self._tokenizer = None
+
+        if name:
+            try:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(name)
+            except Exception as e:
+                logger.warning(f"Tokenizer {name} unavailable, estimating token counts: {e}")
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False))
+        return (len(text) + 3) // 4
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+def get_token_counter(model: str) -> TokenCounter:
+    """Shared token counter for a model's tokenizer"""
+    name = tokenizer_name(model)
+    key = name or "_estimate"
+    with _counters_lock:
+        if key not in _counters:
+            _counters[key] = TokenCounter(name)
+        return _counters[key]
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``"""
+    if len(left) < MIN_OVERLAP_CHARS or len(right) < MIN_OVERLAP_CHARS:
+        return 0
+
+    probe = right[:MIN_OVERLAP_CHARS]
+    start = max(0, len(left) - len(right))
+    position = left.find(probe, start)
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+def strip_overlap(text: str, packed: List[str]) -> str:
+    """Remove spans of ``text`` already present at the edge of a packed chunk"""
+    for previous in packed:
+        if text in previous:
+            return ""
+
+        head = overlap_length(previous, text)
+        if head:
+            text = text[head:]
+
+        tail = overlap_length(text, previous)
+        if tail:
+            text = text[:-tail]
+    return text.strip()
+
+def context_budget(model: str, prompt_overhead: int = 0) -> int:
+    """Tokens available for retrieved context in a model's window"""
+    available = context_length(model) - ANSWER_RESERVE_TOKENS - prompt_overhead
+    return max(0, min(MAX_CONTEXT_TOKENS, available))
+
+def pack_context(
+    documents: List[str],
+    metadatas: Optional[List[Dict]],
+    model: str,
+    prompt_overhead: int = 0,
+    separator: str = "\n\n"
+) -> Tuple[str, Dict]:
+    """Assemble retrieved chunks, in relevance order, into a token-budgeted context.
+
+    Overlap between chunks of the same source (from the splitter's chunk_overlap)
+    is stripped before counting, and chunks that do not fit the remaining budget
+    are skipped in favour of smaller, lower-ranked ones.
+    """
+    counter = get_token_counter(model)
+    budget = context_budget(model, prompt_overhead)
+    separator_tokens = counter.count(separator)
+    metadatas = metadatas or [{}] * len(documents)
+
+    packed: List[str] = []
+    packed_by_source: Dict[str, List[str]] = {}
+    used = 0
+    stripped_chars = 0
+    dropped = 0
+
+    for document, metadata in zip(documents, metadatas):
+        source = (metadata or {}).get("source", "")
+        text = strip_overlap(document, packed_by_source.get(source, []))
+        stripped_chars += len(document) - len(text)
+        if not text:
+            continue
+
+        tokens = counter.count(text) + (separator_tokens if packed else 0)
+        if used + tokens > budget:
+            dropped += 1
+            continue
+
+        packed.append(text)
+        packed_by_source.setdefault(source, []).append(text)
+        used += tokens
+
+    stats = {
+        "budget_tokens": budget,
+        "context_tokens": used,
+        "chunks_used": len(packed),
+        "chunks_dropped": dropped,
+        "overlap_chars_removed": stripped_chars
+    }
+    return separator.join(packed), stats
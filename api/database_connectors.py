@@ -1,80 +1,361 @@
 # api/database_connectors.py
+import logging
 import os
-from typing import List, Dict, Any
-import pyodbc
-import cx_Oracle
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
 import pandas as pd
 from contextlib import contextmanager
+from reference_cache import ReferenceCache, cache_key, get_reference_cache
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_CHECK_SECONDS = float(os.getenv("DB_POOL_CHECK_SECONDS", "30"))
+DB_ARRAYSIZE = int(os.getenv("DB_ARRAYSIZE", "5000"))
+EQUIPMENT_CACHE_TTL = float(os.getenv("EQUIPMENT_CACHE_TTL", "600"))
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "3600"))
+
+# Query parameters: a sequence for "?" placeholders (SQL Server, SQLite) or a
+# mapping for ":name" placeholders (Oracle, SQLite)
+Params = Optional[Union[Sequence[Any], Dict[str, Any]]]
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections with a size limit.
+
+    Idle connections are reused newest first; one idle for longer than
+    ``check_after`` seconds is pinged with ``ping_query`` before being handed out
+    and replaced if the ping fails. Connections are rolled back when returned, and
+    dropped if that fails. When ``max_size`` connections are checked out, callers
+    wait up to ``timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = DB_POOL_SIZE,
+        ping_query: str = "SELECT 1",
+        check_after: float = DB_POOL_CHECK_SECONDS,
+        timeout: float = DB_POOL_TIMEOUT,
+        name: str = "db"
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.ping_query = ping_query
+        self.check_after = check_after
+        self.timeout = timeout
+        self.name = name
+
+        self._idle: List[tuple] = []  # (connection, returned_at)
+        self._size = 0
+        self._condition = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+
+    def _healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.ping_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pool {self.name}: dropping dead connection: {e}")
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No {self.name} connection available within {self.timeout}s")
+                self.waits += 1
+                self._condition.wait(remaining)
+
+        # Connecting and pinging happen outside the lock
+        try:
+            if conn is not None and time.monotonic() - returned_at > self.check_after and not self._healthy(conn):
+                self._close(conn)
+                self.discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                self.created += 1
+            else:
+                self.reused += 1
+            return conn
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _checkin(self, conn):
+        # Ends any open transaction; a connection that cannot roll back is broken
+        try:
+            conn.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+
+        with self._condition:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self.discarded += 1
+            self._condition.notify()
+        if not reusable:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "waits": self.waits
+            }
+
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(key: tuple, connect: Callable[[], Any], **kwargs) -> ConnectionPool:
+    """Shared pool per database, so every DatabaseConnector reuses the same connections"""
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(connect, name=key[0], **kwargs)
+        return _pools[key]
 
 class DatabaseConnector:
-    def __init__(self):
+    """SQL Server and Oracle access through shared connection pools.
+
+    With ``sqlite_path`` (or SQLITE_DATABASE set) both databases are served by a
+    local SQLite file, a stand-in for development and tests; SQLite accepts both
+    the "?" and ":name" parameter styles used here.
+
+    Reference data (equipment specs, table schemas) is read through a TTL cache;
+    call the ``invalidate_*`` hooks after changing it.
+    """
+
+    def __init__(
+        self,
+        sqlite_path: Optional[str] = None,
+        pool_size: int = DB_POOL_SIZE,
+        cache: Optional[ReferenceCache] = None
+    ):
         self.sql_server_conn_string = os.getenv("SQL_SERVER_CONN_STRING")
         self.oracle_dsn = os.getenv("ORACLE_DSN")
         self.oracle_user = os.getenv("ORACLE_USER")
         self.oracle_password = os.getenv("ORACLE_PASSWORD")
-    
-    @contextmanager
+        self.sqlite_path = sqlite_path or os.getenv("SQLITE_DATABASE")
+        self.pool_size = pool_size
+        self.cache = cache or get_reference_cache()
+
+    def _connect_sql_server(self):
+        import pyodbc
+        return pyodbc.connect(self.sql_server_conn_string)
+
+    def _connect_oracle(self):
+        import cx_Oracle
+        return cx_Oracle.connect(
+            user=self.oracle_user,
+            password=self.oracle_password,
+            dsn=self.oracle_dsn
+        )
+
+    def _connect_sqlite(self):
+        import sqlite3
+        return sqlite3.connect(self.sqlite_path, check_same_thread=False)
+
+    def pool(self, database: str = "sql_server") -> ConnectionPool:
+        if self.sqlite_path:
+            return get_pool(("sqlite", self.sqlite_path), self._connect_sqlite, max_size=self.pool_size)
+        if database == "sql_server":
+            return get_pool(("sql_server", self.sql_server_conn_string), self._connect_sql_server,
+                            max_size=self.pool_size)
+        return get_pool(("oracle", self.oracle_dsn, self.oracle_user), self._connect_oracle,
+                        max_size=self.pool_size, ping_query="SELECT 1 FROM DUAL")
+
     def sql_server_connection(self):
-        """Context manager for SQL Server connections"""
-        conn = None
-        try:
-            conn = pyodbc.connect(self.sql_server_conn_string)
-            yield conn
-        finally:
-            if conn:
-                conn.close()
-    
-    @contextmanager
+        """Context manager for pooled SQL Server connections"""
+        return self.pool("sql_server").connection()
+
     def oracle_connection(self):
-        """Context manager for Oracle connections"""
-        conn = None
-        try:
-            conn = cx_Oracle.connect(
-                user=self.oracle_user,
-                password=self.oracle_password,
-                dsn=self.oracle_dsn
-            )
-            yield conn
-        finally:
-            if conn:
-                conn.close()
-    
-    def query_sql_server(self, query: str) -> pd.DataFrame:
+        """Context manager for pooled Oracle connections"""
+        return self.pool("oracle").connection()
+
+    def query(self, query: str, params: Params = None, database: str = "sql_server") -> pd.DataFrame:
+        """Execute a parameterized query and return the whole result as a DataFrame"""
+        frames = list(self.stream_query(query, params, database))
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def stream_query(
+        self,
+        query: str,
+        params: Params = None,
+        database: str = "sql_server",
+        arraysize: int = DB_ARRAYSIZE
+    ) -> Iterator[pd.DataFrame]:
+        """Yield the result in DataFrames of at most ``arraysize`` rows.
+
+        Rows are fetched from the open cursor batch by batch (``arraysize`` also
+        sets the driver's fetch size), so memory stays bounded however large the
+        result is. The pooled connection is held until the iterator is exhausted
+        or closed. At least one, possibly empty, frame is yielded.
+        """
+        with self.pool(database).connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.arraysize = arraysize
+                if hasattr(cursor, "prefetchrows"):
+                    cursor.prefetchrows = arraysize + 1  # cx_Oracle: fill a batch in one round trip
+                with span("db_execute", "db", database=database):
+                    if params is None:
+                        cursor.execute(query)
+                    else:
+                        cursor.execute(query, params)
+                columns = [column[0] for column in cursor.description or []]
+
+                yielded = False
+                while True:
+                    # Timed per batch, so time spent by the consumer between batches is not counted
+                    with span("db_fetch", "db", database=database):
+                        rows = cursor.fetchmany(arraysize)
+                    if not rows:
+                        break
+                    yielded = True
+                    yield pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+                if not yielded:
+                    yield pd.DataFrame(columns=columns)
+            finally:
+                cursor.close()
+
+    def query_sql_server(self, query: str, params: Params = None) -> pd.DataFrame:
         """Execute query on SQL Server and return DataFrame"""
-        with self.sql_server_connection() as conn:
-            return pd.read_sql(query, conn)
-    
-    def query_oracle(self, query: str) -> pd.DataFrame:
+        return self.query(query, params, "sql_server")
+
+    def query_oracle(self, query: str, params: Params = None) -> pd.DataFrame:
         """Execute query on Oracle and return DataFrame"""
-        with self.oracle_connection() as conn:
-            return pd.read_sql(query, conn)
-    
+        return self.query(query, params, "oracle")
+
+    def cached_query(
+        self,
+        query: str,
+        params: Params = None,
+        database: str = "sql_server",
+        ttl: Optional[float] = None,
+        key: Optional[str] = None
+    ) -> pd.DataFrame:
+        """``query`` read through the reference cache.
+
+        ``key`` names the entry so it can be invalidated; by default it is derived
+        from the query and parameters under the ``query:`` prefix.
+        """
+        key = key or f"query:{database}:{cache_key(query, params)}"
+        return self.cache.get(key, lambda: self.query(query, params, database), ttl)
+
+    def get_equipment_specs(self, equipment_id: str) -> pd.DataFrame:
+        """Specification rows for one piece of equipment (cached)"""
+        return self.cached_query(
+            "SELECT * FROM equipment_specs WHERE equipment_id = ?",
+            [equipment_id],
+            ttl=EQUIPMENT_CACHE_TTL,
+            key=f"equipment_specs:{equipment_id}"
+        )
+
+    def invalidate_equipment_specs(self, equipment_id: Optional[str] = None):
+        """Drop cached specs for one piece of equipment, or all of them"""
+        if equipment_id is None:
+            self.cache.invalidate_prefix("equipment_specs:")
+        else:
+            self.cache.invalidate(f"equipment_specs:{equipment_id}")
+
+    def invalidate_table_schema(self, table_name: Optional[str] = None, database: Optional[str] = None):
+        """Drop cached schemas, narrowed by database and table when given"""
+        if database and table_name:
+            self.cache.invalidate(f"schema:{database}:{table_name.upper()}")
+        else:
+            self.cache.invalidate_prefix(f"schema:{database}:" if database else "schema:")
+
     def get_table_schema(self, table_name: str, database: str = "sql_server") -> str:
-        """Get table schema information"""
-        
+        """Get table schema information (cached for SCHEMA_CACHE_TTL seconds)"""
+        return self.cache.get(
+            f"schema:{database}:{table_name.upper()}",
+            lambda: self._load_table_schema(table_name, database),
+            SCHEMA_CACHE_TTL
+        )
+
+    def _load_table_schema(self, table_name: str, database: str) -> str:
+
         if database == "sql_server":
-            query = f"""
-            SELECT 
+            query = """
+            SELECT
                 COLUMN_NAME,
                 DATA_TYPE,
                 CHARACTER_MAXIMUM_LENGTH,
                 IS_NULLABLE
             FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = '{table_name}'
+            WHERE TABLE_NAME = ?
             ORDER BY ORDINAL_POSITION
             """
-            df = self.query_sql_server(query)
+            df = self.query_sql_server(query, [table_name])
         else:  # Oracle
-            query = f"""
-            SELECT 
+            query = """
+            SELECT
                 COLUMN_NAME,
                 DATA_TYPE,
                 DATA_LENGTH,
                 NULLABLE
             FROM USER_TAB_COLUMNS
-            WHERE TABLE_NAME = UPPER('{table_name}')
+            WHERE TABLE_NAME = UPPER(:table_name)
             ORDER BY COLUMN_ID
             """
-            df = self.query_oracle(query)
-        
-        return df.to_string()
\ No newline at end of file
+            df = self.query_oracle(query, {"table_name": table_name})
+
+        return df.to_string()
+
+    def pool_stats(self) -> Dict[str, Dict]:
+        with _pools_lock:
+            return {key[0]: pool.stats() for key, pool in _pools.items()}
@@ -1,124 +1,197 @@
 # api/document_processor.py
 import os
-from typing import List, Dict, Any
-import PyPDF2
-import docx
-import pandas as pd
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import chromadb
-from chromadb.utils import embedding_functions
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from collection_registry import get_collection_registry
+from embedding_batcher import get_embedding_batcher
+from embeddings import get_embedding_engine
+from index_manifest import assign_chunk_ids, content_hash, file_hash, get_index_manifest
+from lexical_index import get_lexical_index
+from semantic_cache import bump_collection_version_sync
+from spreadsheet import iter_spreadsheet_chunks
+from telemetry import span
+from text_chunker import get_text_chunker
+from vector_store import create_vector_client
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.xlsx', '.xls')
 
 class DocumentProcessor:
+    """Extracts, chunks and indexes documents.
+
+    Parsers (PyPDF2, python-docx, openpyxl) are imported on first use, so
+    importing this module stays cheap for the API process. PDF and DOCX text is
+    read page by page and chunked as it streams, with page ranges in each
+    chunk's metadata.
+    """
+    
     def __init__(self, chroma_host: str = "chromadb", chroma_port: int = 8000):
-        self.client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self.chroma_host = chroma_host
+        self.chroma_port = chroma_port
+        self._client = None
+        self.chunker = get_text_chunker()
         
-        # Use Sentence Transformers for embeddings
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Use the process-wide Sentence Transformers engine for embeddings
+        self.embedding_function = get_embedding_engine("all-MiniLM-L6-v2")
+        self.embedder = get_embedding_batcher("all-MiniLM-L6-v2")
     
-    def process_pdf(self, file_path: str) -> List[Dict[str, Any]]:
-        """Extract text from PDF files"""
-        chunks = []
+    @property
+    def client(self):
+        """Vector store client, connected on first use so extraction-only workers stay cheap"""
+        if self._client is None:
+            self._client = create_vector_client(self.chroma_host, self.chroma_port)
+        return self._client
+    
+    def process_file(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extract chunks from any supported file type"""
+        extension = os.path.splitext(file_path)[1].lower()
+        
+        with span("extract", "ingest", extension=extension):
+            if extension == '.pdf':
+                return self.process_pdf(file_path)
+            elif extension == '.docx':
+                return self.process_docx(file_path)
+            elif extension in ('.xlsx', '.xls'):
+                return self.process_excel(file_path)
         
+        raise ValueError(f"Unsupported file type: {file_path}")
+    
+    def pdf_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """(page number, text) for each PDF page, extracted as consumed"""
+        import PyPDF2
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            # Split into chunks
-            text_chunks = self.text_splitter.split_text(text)
-            
-            for i, chunk in enumerate(text_chunks):
-                chunks.append({
-                    "content": chunk,
-                    "metadata": {
-                        "source": file_path,
-                        "page": i,
-                        "type": "pdf"
-                    }
-                })
-        
-        return chunks
+            for number, page in enumerate(pdf_reader.pages, start=1):
+                yield number, page.extract_text() or ""
     
-    def process_docx(self, file_path: str) -> List[Dict[str, Any]]:
-        """Extract text from DOCX files"""
-        chunks = []
-        doc = docx.Document(file_path)
-        text = ""
+    def docx_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """(page number, text) for each DOCX page.
         
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        
-        # Split into chunks
-        text_chunks = self.text_splitter.split_text(text)
-        
-        for i, chunk in enumerate(text_chunks):
-            chunks.append({
-                "content": chunk,
+        DOCX has no fixed pages; numbers follow the page breaks Word recorded
+        when it last saved the file, at paragraph granularity. Files without
+        them (e.g. generated ones) are a single page.
+        """
+        import docx
+        document = docx.Document(file_path)
+        number, lines = 1, []
+        for paragraph in document.paragraphs:
+            if lines and paragraph.contains_page_break:
+                yield number, "\n".join(lines)
+                number, lines = number + 1, []
+            lines.append(paragraph.text)
+        if lines:
+            yield number, "\n".join(lines)
+    
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], file_path: str, file_type: str) -> List[Dict[str, Any]]:
+        """Chunk streamed pages, recording the pages each chunk spans"""
+        return [
+            {
+                "content": chunk["text"],
                 "metadata": {
                     "source": file_path,
+                    "page": chunk["page_start"],
+                    "page_start": chunk["page_start"],
+                    "page_end": chunk["page_end"],
                     "chunk": i,
-                    "type": "docx"
+                    "type": file_type
                 }
-            })
-        
-        return chunks
+            }
+            for i, chunk in enumerate(self.chunker.split_pages(pages))
+        ]
+    
+    def process_pdf(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extract text from PDF files"""
+        return self.chunk_pages(self.pdf_pages(file_path), file_path, "pdf")
+    
+    def process_docx(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extract text from DOCX files"""
+        return self.chunk_pages(self.docx_pages(file_path), file_path, "docx")
     
     def process_excel(self, file_path: str) -> List[Dict[str, Any]]:
-        """Extract data from Excel files"""
-        chunks = []
-        
-        # Read all sheets
-        excel_file = pd.ExcelFile(file_path)
-        
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Convert dataframe to text representation
-            text = f"Sheet: {sheet_name}\n"
-            text += df.to_string()
-            
-            # Split into chunks
-            text_chunks = self.text_splitter.split_text(text)
-            
-            for i, chunk in enumerate(text_chunks):
-                chunks.append({
-                    "content": chunk,
-                    "metadata": {
-                        "source": file_path,
-                        "sheet": sheet_name,
-                        "chunk": i,
-                        "type": "excel"
-                    }
-                })
+        """Extract data from Excel files.
         
-        return chunks
+        Sheets are streamed row by row into token-sized row groups, each with the
+        header row repeated and its row range in the metadata.
+        """
+        return list(iter_spreadsheet_chunks(file_path))
     
     def index_documents(self, chunks: List[Dict[str, Any]], collection_name: str = "default"):
-        """Index document chunks in ChromaDB"""
-        collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.embedding_function
+        """Index document chunks in ChromaDB.
+        
+        Chunks get content-hash IDs and are checked against the collection's
+        manifest: only new chunks are embedded, and chunks a source no longer
+        produces are deleted. The manifest is only updated once the writes have
+        succeeded, so a failed call is redone in full by a retry. Chunks without
+        a ``source`` are tracked one by one under their own ID and never deleted
+        as orphans. Any change bumps the collection version, which invalidates
+        cached answers. Returns the number of chunks written.
+        """
+        collection = get_collection_registry(self.client).get(
+            collection_name, embedding_function=self.embedding_function
         )
+        manifest = get_index_manifest(collection_name)
+        manifest.refresh()
+        lexical_index = get_lexical_index(collection_name)
         
-        documents = [chunk["content"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-        ids = [f"{collection_name}_{i}_{hash(doc)}" for i, doc in enumerate(documents)]
+        sources = [chunk["metadata"].get("source") for chunk in chunks]
+        ids = assign_chunk_ids([source or "unknown" for source in sources], [chunk["content"] for chunk in chunks])
         
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        by_source: Dict[str, List[int]] = {}
+        for i, source in enumerate(sources):
+            by_source.setdefault(source or ids[i], []).append(i)
+        
+        new_indexes = []
+        orphaned_ids = []
+        updates = []
+        for source, indexes in by_source.items():
+            if os.path.isfile(source):
+                source_hash = file_hash(source)
+            else:
+                source_hash = content_hash(chunks[i]["content"] for i in indexes)
+            
+            source_ids = [ids[i] for i in indexes]
+            known_ids = set(manifest.chunk_ids(source))
+            new_indexes.extend(i for i in indexes if ids[i] not in known_ids)
+            orphaned_ids.extend(sorted(known_ids - set(source_ids)))
+            updates.append((source, source_hash, source_ids))
+        
+        if new_indexes:
+            documents = [chunks[i]["content"] for i in new_indexes]
+            with span("embed", "ingest", chunks=len(documents)):
+                embeddings = self.embedder.embed(documents, use_cache=False)
+            with span("vector_write", "ingest"):
+                collection.upsert(
+                    ids=[ids[i] for i in new_indexes],
+                    documents=documents,
+                    metadatas=[chunks[i]["metadata"] for i in new_indexes],
+                    embeddings=embeddings
+                )
+            with span("lexical_index", "ingest"):
+                lexical_index.add([ids[i] for i in new_indexes], documents)
         
-        return len(chunks)
\ No newline at end of file
+        if orphaned_ids:
+            with span("vector_delete", "ingest"):
+                collection.delete(ids=orphaned_ids)
+                lexical_index.delete(orphaned_ids)
+        
+        for source, source_hash, source_ids in updates:
+            manifest.update(source, source_hash, source_ids)
+        with span("save_index", "ingest"):
+            manifest.save()
+            lexical_index.save()
+        
+        # Cached answers may cite chunks that just changed
+        if new_indexes or orphaned_ids:
+            bump_collection_version_sync(collection_name)
+        
+        return len(new_indexes)
+
+_processors: Dict[tuple, DocumentProcessor] = {}
+_processors_lock = threading.Lock()
+
+def get_document_processor(chroma_host: str = "chromadb", chroma_port: int = 8000) -> DocumentProcessor:
+    """Shared processor per vector store endpoint, so assistants reuse one client and splitter"""
+    with _processors_lock:
+        key = (chroma_host, chroma_port)
+        if key not in _processors:
+            _processors[key] = DocumentProcessor(chroma_host, chroma_port)
+        return _processors[key]
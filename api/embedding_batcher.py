@@ -0,0 +1,211 @@
+# api/embedding_batcher.py
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from embeddings import EmbeddingEngine, get_embedding_engine
+from telemetry import record_embedding_batch, track_embedding_queue_depth
+
+QUERY = "query"
+DOCUMENT = "document"
+
+class _Request:
+    __slots__ = ("texts", "use_cache", "kind", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str], use_cache: bool):
+        self.texts = texts
+        self.use_cache = use_cache
+        # Cached lookups are queries; ingestion embeds its chunks uncached
+        self.kind = QUERY if use_cache else DOCUMENT
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into vectorized encodes.
+
+    A worker thread takes the first queued request, keeps collecting for up to
+    ``max_wait_ms`` or until ``max_batch_size`` texts are gathered, runs one
+    encode and resolves each caller's future with its own slice of the result.
+    Sync callers (ingestion, DocumentProcessor) and async callers (the API) share
+    the worker, but queries and documents queue separately: batches are filled
+    from the query queue first, so a search is not stuck behind a bulk
+    ingestion's backlog. Each queue holds at most ``max_queue`` requests.
+    """
+
+    def __init__(
+        self,
+        engine: EmbeddingEngine,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 1024
+    ):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self._queues: Dict[str, deque] = {QUERY: deque(), DOCUMENT: deque()}
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.wait_seconds = 0.0
+        self.max_observed_depth = 0
+
+        for kind, pending in self._queues.items():
+            track_embedding_queue_depth(engine.model_name, kind, pending.__len__)
+
+    def _ensure_worker(self):
+        # Re-create the worker after a fork, where the thread does not survive
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _put(self, request: _Request, block: bool = True) -> bool:
+        """Queue ``request``; without ``block``, False when its queue is full"""
+        pending = self._queues[request.kind]
+        with self._changed:
+            while len(pending) >= self.max_queue:
+                if not block:
+                    return False
+                self._changed.wait()
+            pending.append(request)
+            self._changed.notify_all()
+            depth = len(self._queues[QUERY]) + len(self._queues[DOCUMENT])
+        if depth > self.max_observed_depth:
+            self.max_observed_depth = depth
+        return True
+
+    def _take(self, timeout: Optional[float] = None) -> Optional[_Request]:
+        """Oldest query, else oldest document; None if nothing arrives within ``timeout``"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._changed:
+            while not (self._queues[QUERY] or self._queues[DOCUMENT]):
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+            request = (self._queues[QUERY] or self._queues[DOCUMENT]).popleft()
+            self._changed.notify_all()  # room for blocked producers
+            return request
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._take()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            request = self._take(timeout)
+            if request is None:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            waits: Dict[str, List[float]] = {}
+            for r in batch:
+                waits.setdefault(r.kind, []).append(started - r.enqueued_at)
+            texts = sum(len(r.texts) for r in batch)
+            record_embedding_batch(self.engine.model_name, texts, waits)
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += texts
+                self.wait_seconds += sum(sum(w) for w in waits.values())
+
+            try:
+                # At most two encodes: cacheable query texts and uncached document texts
+                results: Dict[int, List[List[float]]] = {}
+                for use_cache in (True, False):
+                    group = [r for r in batch if r.use_cache == use_cache]
+                    if not group:
+                        continue
+                    vectors = self.engine.embed([t for r in group for t in r.texts], use_cache=use_cache)
+                    offset = 0
+                    for r in group:
+                        results[id(r)] = vectors[offset:offset + len(r.texts)]
+                        offset += len(r.texts)
+
+                for r in batch:
+                    r.future.set_result(results[id(r)])
+            except Exception as e:
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+
+    def submit(self, texts: List[str], use_cache: bool = True) -> Future:
+        """Queue texts for embedding; blocks while the queue is full"""
+        self._ensure_worker()
+        request = _Request(list(texts), use_cache)
+        self._put(request)
+        return request.future
+
+    def embed(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.submit(texts, use_cache).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    async def aembed(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        if not texts:
+            return []
+
+        self._ensure_worker()
+        request = _Request(list(texts), use_cache)
+        if not self._put(request, block=False):
+            # Wait for room without blocking the event loop
+            await asyncio.to_thread(self._put, request)
+        return await asyncio.wrap_future(request.future)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed([text]))[0]
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": {kind: len(pending) for kind, pending in self._queues.items()},
+                "max_queue_depth": self.max_observed_depth,
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "avg_wait_ms": round(self.wait_seconds / self.requests * 1000, 3) if self.requests else 0.0
+            }
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+def get_embedding_batcher(model_name: Optional[str] = None) -> EmbeddingBatcher:
+    """Shared batcher in front of the shared engine for a model"""
+    engine = get_embedding_engine(model_name) if model_name else get_embedding_engine()
+    with _batchers_lock:
+        if engine.model_name not in _batchers:
+            _batchers[engine.model_name] = EmbeddingBatcher(
+                engine,
+                max_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "32")),
+                max_wait_ms=float(os.getenv("EMBED_MAX_WAIT_MS", "5")),
+                max_queue=int(os.getenv("EMBED_MAX_QUEUE", "1024"))
+            )
+        return _batchers[engine.model_name]
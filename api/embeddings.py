@@ -0,0 +1,133 @@
+# api/embeddings.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from chromadb.api.types import EmbeddingFunction
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+class EmbeddingEngine(EmbeddingFunction):
+    """Process-wide SentenceTransformer with an LRU cache of query embeddings.
+
+    The engine doubles as a Chroma embedding function, so collections created by
+    DocumentProcessor and the query paths in the API embed with the same model.
+    Query paths call ``embed_query`` and pass ``query_embeddings`` to Chroma;
+    document batches bypass the cache so ingestion does not flush it.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, cache_size: int = 10000):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.encode_calls = 0
+        self.texts_encoded = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def model(self):
+        """Load the SentenceTransformer on first use"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def ready(self) -> bool:
+        """Whether the model has been loaded"""
+        return self._model is not None
+
+    def warm_up(self) -> float:
+        """Load the model and run one encode, so the first request pays for neither; returns seconds taken"""
+        start = time.perf_counter()
+        self.model.encode(["warm up"], convert_to_numpy=True)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Run one vectorized encode over a batch of texts"""
+        start = time.perf_counter()
+        vectors = self.model.encode(texts, convert_to_numpy=True).tolist()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.encode_calls += 1
+            self.texts_encoded += len(texts)
+            self.encode_seconds += elapsed
+        return vectors
+
+    def embed(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        """Embed texts, encoding only those missing from the cache in a single batch"""
+        if not use_cache:
+            return self.encode(texts)
+
+        keys = [f"{self.model_name}:{self.normalize(t)}" for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            # Encode the normalized text so every spelling of a key maps to one vector
+            unique_keys = list(missing)
+            vectors = self.encode([self.normalize(texts[missing[k][0]]) for k in unique_keys])
+
+            with self._lock:
+                for key, vector in zip(unique_keys, vectors):
+                    for i in missing[key]:
+                        results[i] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.embed(list(input), use_cache=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "encode_calls": self.encode_calls,
+            "texts_encoded": self.texts_encoded,
+            "encode_seconds": round(self.encode_seconds, 3)
+        }
+
+_engines: Dict[str, EmbeddingEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_embedding_engine(model_name: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingEngine:
+    """Return the shared engine for a model, creating it on first request"""
+    with _engines_lock:
+        if model_name not in _engines:
+            _engines[model_name] = EmbeddingEngine(model_name)
+        return _engines[model_name]
@@ -1,20 +1,36 @@
 # api/gpu_optimizer.py
-import torch
 import gc
+import os
 from typing import Dict, Any
 
+GPU_MEMORY_GB = float(os.getenv("GPU_MEMORY_GB", "11"))  # RTX 3060 has 12GB
+MEMORY_HEADROOM = 1.2  # 20% buffer over a model's declared size
+
+def _torch():
+    """torch if it is installed with CUDA, else None (the API process may run on CPU)"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch if torch.cuda.is_available() else None
+
 class GPUOptimizer:
-    def __init__(self, max_memory_gb: int = 11):  # RTX 3060 has 12GB
+    def __init__(self, max_memory_gb: float = GPU_MEMORY_GB):
         self.max_memory = max_memory_gb * 1024 * 1024 * 1024
         self.current_models = {}
-    
+
+    @property
+    def max_memory_gb(self) -> float:
+        return self.max_memory / 1024**3
+
     def check_memory(self) -> Dict[str, Any]:
         """Check current GPU memory usage"""
-        if torch.cuda.is_available():
+        torch = _torch()
+        if torch is not None:
             allocated = torch.cuda.memory_allocated()
             reserved = torch.cuda.memory_reserved()
             free = self.max_memory - allocated
-            
+
             return {
                 "allocated_gb": allocated / 1024**3,
                 "reserved_gb": reserved / 1024**3,
@@ -22,14 +38,24 @@ class GPUOptimizer:
                 "utilization": (allocated / self.max_memory) * 100
             }
         return {"error": "CUDA not available"}
-    
+
     def optimize_memory(self):
         """Free up GPU memory"""
-        if torch.cuda.is_available():
+        torch = _torch()
+        if torch is not None:
             torch.cuda.empty_cache()
             gc.collect()
-    
-    def can_load_model(self, model_size_gb: float) -> bool:
-        """Check if model can be loaded"""
-        memory_status = self.check_memory()
-        return memory_status.get("free_gb", 0) >= model_size_gb * 1.2  # 20% buffer
\ No newline at end of file
+
+    def can_load_model(self, model_size_gb: float, resident_gb: float = 0.0) -> bool:
+        """Check if model can be loaded.
+
+        ``resident_gb`` is memory held outside this process, e.g. by models Ollama
+        already has loaded; without CUDA here only that is counted.
+        """
+        allocated_gb = self.check_memory().get("allocated_gb", 0.0)
+        free_gb = self.max_memory_gb - allocated_gb - resident_gb
+        return free_gb >= model_size_gb * MEMORY_HEADROOM
+
+    def fits(self, model_size_gb: float) -> bool:
+        """Whether a model fits the budget at all, with nothing else loaded"""
+        return model_size_gb * MEMORY_HEADROOM <= self.max_memory_gb
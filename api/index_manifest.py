@@ -0,0 +1,155 @@
+# api/index_manifest.py
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", "data/manifests")
+
+def make_chunk_id(source: str, content: str, occurrence: int = 0) -> str:
+    """Deterministic chunk ID from the source path and chunk content.
+
+    ``occurrence`` disambiguates identical chunks repeated within one source, so
+    editing one part of a file leaves the IDs of every other chunk unchanged.
+    """
+    digest = hashlib.sha256(f"{source}\0{occurrence}\0{content}".encode("utf-8")).hexdigest()
+    return f"chunk_{digest[:32]}"
+
+def assign_chunk_ids(sources: Iterable[str], contents: Iterable[str]) -> List[str]:
+    """Chunk IDs for a sequence of (source, content) pairs in document order"""
+    seen: Dict[tuple, int] = {}
+    ids = []
+    for source, content in zip(sources, contents):
+        occurrence = seen.get((source, content), 0)
+        seen[(source, content)] = occurrence + 1
+        ids.append(make_chunk_id(source, content, occurrence))
+    return ids
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(contents: Iterable[str]) -> str:
+    """Stand-in file hash for sources that are not on local disk"""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class IndexManifest:
+    """Per-collection record of source path -> file hash -> chunk IDs.
+
+    Lets re-indexing skip unchanged files, embed only chunks whose IDs are new,
+    and delete the chunks a changed or removed file no longer produces.
+
+    Use ``get_index_manifest`` so writers in one process share an instance.
+    Changes are tracked per source and ``save`` merges them onto the file under
+    an exclusive lock, so concurrent writers in other processes (the ingestion
+    CLI alongside the API) keep each other's entries.
+    """
+
+    def __init__(self, collection_name: str, manifest_dir: str = MANIFEST_DIR):
+        self.collection_name = collection_name
+        self.path = os.path.join(manifest_dir, f"{collection_name}.json")
+        self.sources: Dict[str, Dict] = {}
+        self._changes: Dict[str, Optional[Dict]] = {}  # unsaved entries; None marks a removal
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                self._mtime = os.fstat(f.fileno()).st_mtime_ns
+                return json.load(f).get("sources", {})
+        except FileNotFoundError:
+            self._mtime = None
+            return {}
+
+    def _load(self):
+        # Another writer's entries, with this instance's unsaved changes on top
+        sources = self._read()
+        for source, entry in self._changes.items():
+            if entry is None:
+                sources.pop(source, None)
+            else:
+                sources[source] = entry
+        self.sources = sources
+
+    def refresh(self):
+        """Pick up entries saved by another process since the last load or save"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime != self._mtime:
+                self._load()
+
+    def is_unchanged(self, source: str, source_hash: str) -> bool:
+        entry = self.sources.get(source)
+        return entry is not None and entry["file_hash"] == source_hash
+
+    def chunk_ids(self, source: str) -> List[str]:
+        entry = self.sources.get(source)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def update(self, source: str, source_hash: str, chunk_ids: List[str]) -> List[str]:
+        """Record a source's current chunks and return the IDs it no longer has"""
+        with self._lock:
+            previous = set(self.chunk_ids(source))
+            entry = {"file_hash": source_hash, "chunk_ids": list(chunk_ids)}
+            self.sources[source] = entry
+            self._changes[source] = entry
+            return sorted(previous - set(chunk_ids))
+
+    def remove(self, source: str) -> List[str]:
+        """Forget a source and return all of its chunk IDs"""
+        with self._lock:
+            entry = self.sources.pop(source, None)
+            self._changes[source] = None
+            return list(entry["chunk_ids"]) if entry else []
+
+    def missing_sources(self, under: Optional[List[str]] = None) -> List[str]:
+        """Local sources in the manifest that no longer exist on disk"""
+        missing = []
+        for source in list(self.sources):
+            if under and not any(source.startswith(prefix) for prefix in under):
+                continue
+            if not os.path.exists(source):
+                missing.append(source)
+        return missing
+
+    def save(self):
+        """Merge unsaved changes onto the latest file and write it atomically"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self._lock, open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not self._changes:
+                return
+
+            self._load()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"collection": self.collection_name, "sources": self.sources}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._changes = {}
+
+_manifests: Dict[str, IndexManifest] = {}
+_manifests_lock = threading.Lock()
+
+def get_index_manifest(collection_name: str) -> IndexManifest:
+    """Shared per-collection manifest for this process"""
+    with _manifests_lock:
+        if collection_name not in _manifests:
+            _manifests[collection_name] = IndexManifest(collection_name)
+        return _manifests[collection_name]
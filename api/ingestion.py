@@ -0,0 +1,418 @@
+# api/ingestion.py
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from collection_registry import get_collection_registry
+from document_processor import DocumentProcessor, SUPPORTED_EXTENSIONS
+from index_manifest import IndexManifest, assign_chunk_ids, file_hash, get_index_manifest
+from lexical_index import get_lexical_index
+from semantic_cache import bump_collection_version_sync
+
+logger = logging.getLogger(__name__)
+
+# Extraction workers are spawned, not forked: the API process runs threads (the
+# embedding batcher, write-behind worker, threadpool) whose locks a fork would copy
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "spawn")
+
+_STOP = object()
+
+# Extraction runs in worker processes; each keeps one DocumentProcessor
+_worker_processor: Optional[DocumentProcessor] = None
+
+def _init_worker():
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+
+def _extract(path: str) -> Tuple[str, List[Dict[str, Any]]]:
+    return path, _worker_processor.process_file(path)
+
+class StageCounter:
+    """Throughput counter for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def as_dict(self, elapsed: float) -> Dict:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_sec": round(self.items / elapsed, 2) if elapsed else 0.0
+        }
+
+class Checkpoint:
+    """Set of fully indexed files, persisted after every completed file"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.completed = set(json.load(f).get("completed", []))
+
+    def mark(self, source: str):
+        with self._lock:
+            self.completed.add(source)
+            if self.path:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"completed": sorted(self.completed)}, f)
+                os.replace(tmp_path, self.path)
+
+class IngestionPipeline:
+    """Four-stage ingestion: extract -> chunk -> embed -> write.
+
+    Files are extracted in a process pool, chunks stream into fixed-size embedding
+    batches, and embedded chunks are written to Chroma in bounded batches. Stages
+    are connected by bounded queues, so a slow stage blocks the one feeding it
+    instead of letting chunks pile up in memory.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[DocumentProcessor] = None,
+        collection_name: str = "default",
+        workers: int = os.cpu_count() or 2,
+        embed_batch_size: int = 64,
+        write_batch_size: int = 256,
+        queue_size: int = 8,
+        checkpoint_path: Optional[str] = None,
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        manifest: Optional[IndexManifest] = None,
+        manifest_save_every: int = 100,
+        on_file_done: Optional[Callable[[str, int, Optional[str]], None]] = None
+    ):
+        self.processor = processor or DocumentProcessor()
+        self.collection_name = collection_name
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.extra_metadata = extra_metadata or {}
+        self.manifest = manifest or get_index_manifest(collection_name)
+        self.manifest_save_every = manifest_save_every
+        self.lexical_index = get_lexical_index(collection_name)
+        self.on_file_done = on_file_done
+        
+        self._file_hashes: Dict[str, str] = {}
+        self._file_chunk_ids: Dict[str, List[str]] = {}
+        self._file_new_chunks: Dict[str, int] = {}
+        self._finalized = 0
+        self._finalize_lock = threading.Lock()
+
+        self.counters = {name: StageCounter(name) for name in ("extract", "chunk", "embed", "write")}
+        self.errors: Dict[str, str] = {}
+        self.unchanged = 0
+        self.reused_chunks = 0
+        self.deleted_chunks = 0
+
+    def collection(self):
+        return get_collection_registry(self.processor.client).get(
+            self.collection_name, embedding_function=self.processor.embedding_function
+        )
+
+    def _finalize(self, path: str):
+        """Record a fully written file in the manifest and drop its orphaned chunks"""
+        with self._finalize_lock:
+            orphaned_ids = self.manifest.update(path, self._file_hashes.pop(path), self._file_chunk_ids.pop(path))
+            if orphaned_ids:
+                self.collection().delete(ids=orphaned_ids)
+                self.lexical_index.delete(orphaned_ids)
+                self.deleted_chunks += len(orphaned_ids)
+
+            self.checkpoint.mark(path)
+            self._finalized += 1
+            if self._finalized % self.manifest_save_every == 0:
+                self.save_indexes()
+
+        if self.on_file_done:
+            self.on_file_done(path, self._file_new_chunks.pop(path, 0), None)
+
+    def _fail(self, path: str, error: Exception):
+        logger.error(f"Ingestion failed for {path}: {error}")
+        self.errors[path] = str(error)
+        if self.on_file_done:
+            self.on_file_done(path, 0, str(error))
+
+    def save_indexes(self):
+        """Persist the manifest and the lexical index"""
+        self.manifest.save()
+        self.lexical_index.save()
+
+    def _changed_files(self, paths: List[str]) -> Iterator[str]:
+        """Yield files whose content differs from what the manifest recorded"""
+        for path in paths:
+            try:
+                source_hash = file_hash(path)
+            except OSError as e:
+                self._fail(path, e)
+                continue
+
+            if self.manifest.is_unchanged(path, source_hash):
+                self.unchanged += 1
+                if self.on_file_done:
+                    self.on_file_done(path, 0, None)
+                continue
+
+            self._file_hashes[path] = source_hash
+            yield path
+
+    def _extract_files(self, paths: List[str]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yield (path, chunks) as files finish, keeping at most 2x workers in flight"""
+        pending_paths = self._changed_files(paths)
+        in_flight = {}
+        max_in_flight = self.workers * 2
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(INGEST_START_METHOD),
+            initializer=_init_worker
+        ) as pool:
+            while True:
+                while len(in_flight) < max_in_flight:
+                    path = next(pending_paths, None)
+                    if path is None:
+                        break
+                    in_flight[pool.submit(_extract, path)] = (path, time.perf_counter())
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, started = in_flight.pop(future)
+                    try:
+                        _, chunks = future.result()
+                    except Exception as e:
+                        self._fail(path, e)
+                        self._file_hashes.pop(path, None)
+                        continue
+                    self.counters["extract"].record(1, time.perf_counter() - started)
+                    yield path, chunks
+
+    def _chunk_batches(self, paths: List[str], remaining: Dict[str, int]) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        """Stream chunks from extracted files into embedding-sized batches"""
+        batch = []
+        for path, chunks in self._extract_files(paths):
+            ids = assign_chunk_ids([path] * len(chunks), [chunk["content"] for chunk in chunks])
+            known_ids = set(self.manifest.chunk_ids(path))
+            self._file_chunk_ids[path] = ids
+
+            # Only chunks whose content-hash ID is new need embedding and writing
+            new_chunks = []
+            for chunk_id, chunk in zip(ids, chunks):
+                if chunk_id not in known_ids:
+                    chunk["id"] = chunk_id
+                    new_chunks.append(chunk)
+            self.reused_chunks += len(chunks) - len(new_chunks)
+            self._file_new_chunks[path] = len(new_chunks)
+
+            if not new_chunks:
+                self._finalize(path)
+                continue
+
+            remaining[path] = len(new_chunks)
+            self.counters["chunk"].record(len(new_chunks), 0.0)
+            for chunk in new_chunks:
+                chunk["metadata"].update(self.extra_metadata)
+                batch.append((path, chunk))
+                if len(batch) >= self.embed_batch_size:
+                    yield batch
+                    batch = []
+
+        if batch:
+            yield batch
+
+    def _embed_worker(self, inbox: queue.Queue, outbox: queue.Queue, failure: List[Exception]):
+        while True:
+            batch = inbox.get()
+            if batch is _STOP:
+                break
+            if failure:
+                continue  # keep draining so the producer is never blocked
+
+            try:
+                start = time.perf_counter()
+                embeddings = self.processor.embedder.embed(
+                    [chunk["content"] for _, chunk in batch], use_cache=False
+                )
+                self.counters["embed"].record(len(batch), time.perf_counter() - start)
+                outbox.put(list(zip(batch, embeddings)))
+            except Exception as e:
+                logger.error(f"Embedding failed: {e}")
+                failure.append(e)
+
+        outbox.put(_STOP)
+
+    def _write_worker(self, inbox: queue.Queue, remaining: Dict[str, int], failure: List[Exception]):
+        pending = []
+
+        def flush(items):
+            start = time.perf_counter()
+            self.collection().upsert(
+                ids=[chunk["id"] for (_, chunk), _ in items],
+                documents=[chunk["content"] for (_, chunk), _ in items],
+                metadatas=[chunk["metadata"] for (_, chunk), _ in items],
+                embeddings=[embedding for _, embedding in items]
+            )
+            self.lexical_index.add(
+                [chunk["id"] for (_, chunk), _ in items],
+                [chunk["content"] for (_, chunk), _ in items]
+            )
+            self.counters["write"].record(len(items), time.perf_counter() - start)
+
+            for (path, _), _ in items:
+                remaining[path] -= 1
+                if remaining[path] == 0:
+                    self._finalize(path)
+
+        while True:
+            items = inbox.get()
+            if items is _STOP:
+                break
+            if failure:
+                continue  # keep draining so upstream stages are not blocked
+
+            pending.extend(items)
+            try:
+                while len(pending) >= self.write_batch_size:
+                    flush(pending[:self.write_batch_size])
+                    pending = pending[self.write_batch_size:]
+            except Exception as e:
+                logger.error(f"Write to {self.collection_name} failed: {e}")
+                failure.append(e)
+
+        if pending and not failure:
+            try:
+                flush(pending)
+            except Exception as e:
+                logger.error(f"Write to {self.collection_name} failed: {e}")
+                failure.append(e)
+
+    def prune(self, roots: List[str]):
+        """Delete the chunks of indexed files under ``roots`` that no longer exist"""
+        for source in self.manifest.missing_sources(roots):
+            ids = self.manifest.remove(source)
+            if ids:
+                self.collection().delete(ids=ids)
+                self.lexical_index.delete(ids)
+                self.deleted_chunks += len(ids)
+
+    def run(self, paths: List[str], prune_roots: Optional[List[str]] = None) -> Dict:
+        """Ingest files, skipping any already recorded in the checkpoint or unchanged since the last run"""
+        self.manifest.refresh()
+        todo = [p for p in paths if p not in self.checkpoint.completed]
+        skipped = len(paths) - len(todo)
+
+        embed_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        remaining: Dict[str, int] = {}
+        failure: List[Exception] = []
+
+        embedder = threading.Thread(target=self._embed_worker, args=(embed_queue, write_queue, failure), daemon=True)
+        writer = threading.Thread(target=self._write_worker, args=(write_queue, remaining, failure), daemon=True)
+        embedder.start()
+        writer.start()
+
+        start = time.perf_counter()
+        changes = self.counters["write"].items + self.deleted_chunks
+        try:
+            try:
+                for batch in self._chunk_batches(todo, remaining):
+                    if failure:
+                        break
+                    embed_queue.put(batch)
+            finally:
+                embed_queue.put(_STOP)
+                embedder.join()
+                writer.join()
+                self.save_indexes()
+
+            if failure:
+                raise failure[0]
+
+            if prune_roots:
+                self.prune(prune_roots)
+                self.save_indexes()
+        finally:
+            # Invalidate cached answers after any write, including a partial run
+            if self.counters["write"].items + self.deleted_chunks > changes:
+                bump_collection_version_sync(self.collection_name)
+
+        return self.stats(time.perf_counter() - start, files=len(todo), skipped=skipped)
+
+    def stats(self, elapsed: float, files: int = 0, skipped: int = 0) -> Dict:
+        return {
+            "collection": self.collection_name,
+            "files": files,
+            "skipped_from_checkpoint": skipped,
+            "unchanged_files": self.unchanged,
+            "reused_chunks": self.reused_chunks,
+            "deleted_chunks": self.deleted_chunks,
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {name: c.as_dict(elapsed) for name, c in self.counters.items()},
+            "errors": dict(self.errors)
+        }
+
+def collect_paths(inputs: List[str]) -> List[str]:
+    """Expand directories into the supported files they contain"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(
+                    os.path.join(root, name) for name in sorted(files)
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS)
+                )
+        else:
+            paths.append(item)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-index documents into ChromaDB")
+    parser.add_argument("paths", nargs="+", help="Files or directories to ingest")
+    parser.add_argument("--collection", default="default")
+    parser.add_argument("--chroma-host", default=os.getenv("CHROMA_HOST", "chromadb"))
+    parser.add_argument("--chroma-port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--write-batch-size", type=int, default=256)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--checkpoint", help="JSON file recording completed files, for resuming")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete chunks of previously indexed files under the given directories that no longer exist")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    pipeline = IngestionPipeline(
+        processor=DocumentProcessor(args.chroma_host, args.chroma_port),
+        collection_name=args.collection,
+        workers=args.workers,
+        embed_batch_size=args.embed_batch_size,
+        write_batch_size=args.write_batch_size,
+        queue_size=args.queue_size,
+        checkpoint_path=args.checkpoint
+    )
+    prune_roots = [p for p in args.paths if os.path.isdir(p)] if args.prune else None
+    print(json.dumps(pipeline.run(collect_paths(args.paths), prune_roots=prune_roots), indent=2))
+
+if __name__ == "__main__":
+    main()
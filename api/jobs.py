@@ -0,0 +1,98 @@
+# api/jobs.py
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+JOB_TTL_SECONDS = 24 * 3600
+
+class IndexingJob:
+    """Progress of one background indexing job"""
+
+    def __init__(self, collections: List[str], items: List[str]):
+        self.id = uuid.uuid4().hex
+        self.collections = collections
+        self.items = items
+        self.status = "queued"
+        self.processed = 0
+        self.chunks_indexed = 0
+        self.errors: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def item_done(self, item: str, chunks: int = 0, error: Optional[str] = None):
+        """Record one finished file or document (called from worker threads)"""
+        with self._lock:
+            self.processed += 1
+            self.chunks_indexed += chunks
+            if error:
+                self.errors[item] = error
+
+    def add_chunks(self, chunks: int):
+        with self._lock:
+            self.chunks_indexed += chunks
+
+    def finish(self, error: Optional[str] = None):
+        self.status = "failed" if error else "completed"
+        if error:
+            self.errors["_job"] = error
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "collections": self.collections,
+                "status": self.status,
+                "total": len(self.items),
+                "processed": self.processed,
+                "chunks_indexed": self.chunks_indexed,
+                "errors": dict(self.errors),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at
+            }
+
+class JobManager:
+    """Tracks indexing jobs in-process and mirrors their status to Redis,
+    so any API worker can answer a status request."""
+
+    def __init__(self, redis_client, publish_interval: float = 1.0):
+        self.redis_client = redis_client
+        self.publish_interval = publish_interval
+        self.jobs: Dict[str, IndexingJob] = {}
+
+    def create(self, collections: List[str], items: List[str]) -> IndexingJob:
+        job = IndexingJob(collections, items)
+        self.jobs[job.id] = job
+        return job
+
+    async def publish(self, job: IndexingJob):
+        await self.redis_client.setex(f"job:{job.id}", JOB_TTL_SECONDS, json.dumps(job.to_dict()))
+
+    async def run(self, job: IndexingJob, func, *args):
+        """Run blocking ``func(*args)`` in a thread, publishing job progress while it runs"""
+        job.status = "running"
+        await self.publish(job)
+
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        while not task.done():
+            await asyncio.wait({task}, timeout=self.publish_interval)
+            await self.publish(job)
+
+        error = task.exception()
+        job.finish(str(error) if error else None)
+        await self.publish(job)
+
+        # Finished jobs are served from Redis from now on
+        self.jobs.pop(job.id, None)
+
+    async def status(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job:
+            return job.to_dict()
+
+        data = await self.redis_client.get(f"job:{job_id}")
+        return json.loads(data) if data else None
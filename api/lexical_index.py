@@ -0,0 +1,436 @@
+# api/lexical_index.py
+import fcntl
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "data/lexical")
+MAX_SEGMENTS = 8
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+SEPARATORS = re.compile(r"[-_./:]")
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens that keep identifiers such as P-101A intact.
+
+    A compound identifier also yields its parts and its separator-free form, so
+    "P-101A", "P101A" and "101A" all match a chunk mentioning P-101A.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if SEPARATORS.search(token):
+            parts = [p for p in SEPARATORS.split(token) if p]
+            tokens.extend(parts)
+            tokens.append("".join(parts))
+    return tokens
+
+def _as_bytes(values) -> np.ndarray:
+    """Fixed-width UTF-8 byte strings, the on-disk and lookup form of IDs and terms"""
+    encoded = [value.encode("utf-8") for value in values]
+    return np.array(encoded, dtype=f"S{max(1, max((len(e) for e in encoded), default=1))}")
+
+class _Segment:
+    """Immutable on-disk BM25 segment of memory-mapped NumPy arrays.
+
+    Documents are stored in ID order and terms in sorted order, so both are
+    found with a binary search and nothing is parsed into Python objects on
+    load. Deletions live beside the segment in an index-aligned bit mask that
+    is rewritten when it changes.
+    """
+
+    FILES = ("doc_ids", "doc_len", "terms", "offsets", "postings", "tfs")
+
+    def __init__(self, path: str, segment_id: int):
+        self.id = segment_id
+        self.path = path
+        prefix = os.path.join(path, f"segment.{segment_id}")
+        self.doc_ids = np.load(f"{prefix}.doc_ids.npy", mmap_mode="r")
+        self.doc_len = np.load(f"{prefix}.doc_len.npy", mmap_mode="r")
+        self.terms = np.load(f"{prefix}.terms.npy", mmap_mode="r")
+        self.offsets = np.load(f"{prefix}.offsets.npy", mmap_mode="r")
+        self.postings = np.load(f"{prefix}.postings.npy", mmap_mode="r")
+        self.tfs = np.load(f"{prefix}.tfs.npy", mmap_mode="r")
+        self.load_deleted(None)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _mask_file(self, generation: int) -> str:
+        return os.path.join(self.path, f"segment.{self.id}.deleted.{generation}.npy")
+
+    def load_deleted(self, generation: Optional[int]):
+        """Read the deletion mask saved at ``generation`` (None: nothing deleted)"""
+        self.deleted_generation = generation
+        if generation is None:
+            self.deleted = np.zeros(len(self), dtype=bool)
+        else:
+            self.deleted = np.unpackbits(np.load(self._mask_file(generation)), count=len(self)).astype(bool)
+        live = ~self.deleted
+        self.live_count = int(live.sum())
+        self.live_len = int(np.asarray(self.doc_len)[live].sum())
+
+    def save_deleted(self, generation: int) -> Optional[str]:
+        """Write the deletion mask as ``generation``; returns the file it replaces"""
+        np.save(self._mask_file(generation), np.packbits(self.deleted))
+        previous = self.deleted_generation
+        self.deleted_generation = generation
+        return self._mask_file(previous) if previous is not None else None
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """Rows holding any of ``ids`` (byte strings)"""
+        if not len(self) or not len(ids):
+            return np.zeros(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.doc_ids, ids), len(self) - 1)
+        return positions[np.asarray(self.doc_ids[positions]) == ids]
+
+    def delete(self, rows: np.ndarray) -> bool:
+        """Mark rows deleted; False if they already were"""
+        rows = rows[~self.deleted[rows]]
+        if not len(rows):
+            return False
+        self.deleted[rows] = True
+        self.live_count -= len(rows)
+        self.live_len -= int(np.asarray(self.doc_len)[rows].sum())
+        return True
+
+    def term_postings(self, term: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(document rows, term frequencies) for a term, or None"""
+        i = int(np.searchsorted(self.terms, term))
+        if i >= len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return np.asarray(self.postings[start:end]), np.asarray(self.tfs[start:end], dtype=np.float32)
+
+    def doc_id(self, row: int) -> str:
+        return bytes(self.doc_ids[row]).decode("utf-8")
+
+    def live_postings(self, terms: np.ndarray):
+        """Live documents and their postings, with term indexes into ``terms`` (a
+        sorted superset of this segment's terms) and rows renumbered from 0"""
+        keep = ~self.deleted
+        new_row = np.cumsum(keep) - 1
+        term_map = np.searchsorted(terms, self.terms)
+        posting_terms = np.repeat(term_map, np.diff(np.asarray(self.offsets)))
+        docs = np.asarray(self.postings)
+        live = keep[docs] if len(docs) else np.zeros(0, dtype=bool)
+        return (
+            np.asarray(self.doc_ids)[keep],
+            np.asarray(self.doc_len)[keep],
+            posting_terms[live],
+            new_row[docs[live]],
+            np.asarray(self.tfs)[live]
+        )
+
+    @staticmethod
+    def write(path: str, segment_id: int, doc_ids: np.ndarray, doc_len: np.ndarray, terms: np.ndarray,
+              posting_terms: np.ndarray, posting_docs: np.ndarray, posting_tfs: np.ndarray):
+        """Write a segment; ``terms`` is sorted and ``posting_terms`` indexes into it"""
+        prefix = os.path.join(path, f"segment.{segment_id}")
+
+        # Documents in ID order, so lookups are a binary search
+        order = np.argsort(doc_ids, kind="stable")
+        new_row = np.empty(len(order), dtype=np.int64)
+        new_row[order] = np.arange(len(order))
+        posting_docs = new_row[posting_docs] if len(posting_docs) else posting_docs
+
+        # Terms whose postings were all deleted are dropped from the dictionary
+        counts = np.bincount(posting_terms, minlength=len(terms)) if len(terms) else np.zeros(0, dtype=np.int64)
+        used = counts > 0
+        if not used.all():
+            posting_terms = (np.cumsum(used) - 1)[posting_terms]
+            terms, counts = terms[used], counts[used]
+
+        postings_order = np.lexsort((posting_docs, posting_terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(counts)
+
+        np.save(f"{prefix}.doc_ids.npy", doc_ids[order])
+        np.save(f"{prefix}.doc_len.npy", np.asarray(doc_len, dtype=np.int32)[order])
+        np.save(f"{prefix}.terms.npy", terms)
+        np.save(f"{prefix}.offsets.npy", offsets)
+        np.save(f"{prefix}.postings.npy", np.asarray(posting_docs, dtype=np.int32)[postings_order])
+        np.save(f"{prefix}.tfs.npy", np.asarray(posting_tfs, dtype=np.uint16)[postings_order])
+
+    @staticmethod
+    def remove(path: str, segment_id: int):
+        prefix = f"segment.{segment_id}."
+        for name in os.listdir(path):
+            if name.startswith(prefix):
+                os.remove(os.path.join(path, name))
+
+class LexicalIndex:
+    """Per-collection BM25 inverted index.
+
+    On disk the index is a list of immutable segments (see ``_Segment``) named
+    by ``index.json``, all loaded with ``mmap_mode="r"`` so every worker shares
+    the same page-cached copy. Writes go to an in-memory delta; ``save`` writes
+    the delta as a new segment plus any changed deletion masks, so its cost
+    follows the size of the change rather than of the index. Small segments are
+    merged in tiers as in the vector store, so each document is rewritten
+    O(log N) times. Readers pick up new segments on their next search.
+    """
+
+    def __init__(self, collection_name: str, index_dir: str = LEXICAL_INDEX_DIR, k1: float = 1.2, b: float = 0.75):
+        self.collection_name = collection_name
+        self.path = os.path.join(index_dir, collection_name)
+        self.meta_path = os.path.join(self.path, "index.json")
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._delta: Dict[str, Tuple[Counter, int]] = {}
+        self._pending_deletes: set = set()  # IDs deleted or replaced since the last save
+        self._dirty: set = set()  # segments whose deletion masks changed since the last save
+        self._segments: List[_Segment] = []
+        self._generation = 0
+        self._next_segment = 0
+        self._mtime = None
+        self._load()
+
+    def _load(self):
+        # Segments are immutable, so ones already mapped are reused as-is
+        loaded = {s.id: s for s in self._segments}
+        for attempt in range(3):
+            try:
+                with open(self.meta_path) as f:
+                    mtime = os.fstat(f.fileno()).st_mtime_ns
+                    meta = json.load(f)
+                segments = []
+                for entry in meta["segments"]:
+                    segment = loaded.get(entry["id"]) or _Segment(self.path, entry["id"])
+                    segment.load_deleted(entry["deleted"])
+                    segments.append(segment)
+                break
+            except FileNotFoundError:
+                # No index yet, or a concurrent save replaced the files just read
+                if not os.path.exists(self.meta_path):
+                    return
+                if attempt == 2:
+                    raise
+
+        self._segments = segments
+        self._generation = meta["generation"]
+        self._next_segment = meta["next_segment"]
+        self._mtime = mtime
+        self._dirty = set()
+
+        # Unsaved deletes and replacements still apply on top of the reloaded segments
+        self._mark_deleted(self._pending_deletes)
+
+    def _maybe_reload(self):
+        """Pick up segments written by another process"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def _commit_meta(self, generation: int, next_segment: int, segments: List[Dict]):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": generation, "next_segment": next_segment, "segments": segments}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _mark_deleted(self, ids):
+        if not ids or not self._segments:
+            return
+        keys = _as_bytes(ids)
+        for segment in self._segments:
+            if segment.delete(segment.rows(keys)):
+                self._dirty.add(segment.id)
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Add or replace documents"""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                tokens = tokenize(text)
+                self._delta[doc_id] = (Counter(tokens), len(tokens))
+            self._pending_deletes.update(ids)
+            self._mark_deleted(ids)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._delta.pop(doc_id, None)
+            self._pending_deletes.update(ids)
+            self._mark_deleted(ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(s.live_count for s in self._segments) + len(self._delta)
+
+    @staticmethod
+    def _live_postings(segment: _Segment, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        hit = segment.term_postings(term.encode("utf-8"))
+        if hit is None:
+            return None
+        rows, tfs = hit
+        live = ~segment.deleted[rows]
+        return (rows[live], tfs[live]) if live.any() else None
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (id, BM25 score) pairs for a query"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            self._maybe_reload()
+
+            total_docs = sum(s.live_count for s in self._segments) + len(self._delta)
+            if total_docs == 0:
+                return []
+            total_len = sum(s.live_len for s in self._segments) + sum(n for _, n in self._delta.values())
+            avgdl = total_len / total_docs or 1.0
+
+            # Live postings per term and segment
+            postings = {term: [self._live_postings(s, term) for s in self._segments] for term in terms}
+            delta_hits = {
+                term: [(doc_id, counts[term], n) for doc_id, (counts, n) in self._delta.items() if term in counts]
+                for term in terms
+            }
+            idf = {}
+            for term in terms:
+                df = sum(len(p[0]) for p in postings[term] if p is not None) + len(delta_hits[term])
+                if df:
+                    idf[term] = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+
+            results: List[Tuple[str, float]] = []
+            for index, segment in enumerate(self._segments):
+                docs, contributions = [], []
+                for term, term_idf in idf.items():
+                    hit = postings[term][index]
+                    if hit is None:
+                        continue
+                    rows, tfs = hit
+                    dl = np.asarray(segment.doc_len)[rows]
+                    docs.append(rows)
+                    contributions.append(term_idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * dl / avgdl)))
+                if not docs:
+                    continue
+
+                # Scores over the matching documents only, not the whole segment
+                rows, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+                scores = np.bincount(inverse.reshape(-1), weights=np.concatenate(contributions))
+                if len(rows) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    rows, scores = rows[top], scores[top]
+                results.extend((segment.doc_id(row), float(score)) for row, score in zip(rows, scores) if score > 0)
+
+            delta_scores: Dict[str, float] = {}
+            for term, term_idf in idf.items():
+                for doc_id, tf, n in delta_hits[term]:
+                    score = term_idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * n / avgdl))
+                    delta_scores[doc_id] = delta_scores.get(doc_id, 0.0) + score
+            results.extend(delta_scores.items())
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def _write_delta(self, segment_id: int):
+        doc_ids = list(self._delta)
+        terms, term_index = np.unique(
+            _as_bytes([term for counts, _ in self._delta.values() for term in counts]), return_inverse=True
+        )
+        posting_docs = np.repeat(np.arange(len(doc_ids)), [len(counts) for counts, _ in self._delta.values()])
+        posting_tfs = np.fromiter(
+            (min(tf, 65535) for counts, _ in self._delta.values() for tf in counts.values()), dtype=np.uint16
+        )
+        doc_len = np.fromiter((n for _, n in self._delta.values()), dtype=np.int32, count=len(doc_ids))
+        _Segment.write(self.path, segment_id, _as_bytes(doc_ids), doc_len, terms,
+                       term_index.reshape(-1), posting_docs, posting_tfs)
+
+    def _merge_tail(self) -> List[_Segment]:
+        """Merge the newest segments, tiered like the vector store; returns the merged-away segments"""
+        sizes = [s.live_count for s in self._segments]
+        start = len(sizes) - 1
+        total = sizes[start]
+        while start > 0 and sizes[start - 1] <= 4 * total:
+            start -= 1
+            total += sizes[start]
+        start = min(start, len(sizes) - 2)
+
+        merged = self._segments[start:]
+        terms = np.unique(np.concatenate([np.asarray(s.terms) for s in merged]))
+        parts = [s.live_postings(terms) for s in merged]
+
+        kept = self._segments[:start]
+        if total:
+            row_base = np.cumsum([0] + [len(p[0]) for p in parts[:-1]])
+            segment_id = self._next_segment
+            self._next_segment += 1
+            _Segment.write(
+                self.path,
+                segment_id,
+                np.concatenate([p[0] for p in parts]),
+                np.concatenate([p[1] for p in parts]),
+                terms,
+                np.concatenate([p[2] for p in parts]),
+                np.concatenate([p[3] + base for p, base in zip(parts, row_base)]),
+                np.concatenate([p[4] for p in parts])
+            )
+            kept.append(_Segment(self.path, segment_id))
+        self._segments = kept
+        return merged
+
+    def save(self):
+        """Write the delta as a new segment and persist changed deletion masks"""
+        os.makedirs(self.path, exist_ok=True)
+
+        with self._lock, open(os.path.join(self.path, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # Build on the latest segments, which another process may have written
+            self._maybe_reload()
+            if not self._delta and not self._dirty:
+                self._pending_deletes = set()
+                return
+
+            generation = self._generation + 1
+            obsolete_files = []
+            for segment in self._segments:
+                if segment.id in self._dirty:
+                    replaced = segment.save_deleted(generation)
+                    if replaced:
+                        obsolete_files.append(replaced)
+
+            if self._delta:
+                segment_id = self._next_segment
+                self._next_segment += 1
+                self._write_delta(segment_id)
+                self._segments.append(_Segment(self.path, segment_id))
+
+            merged = self._merge_tail() if len(self._segments) > MAX_SEGMENTS else []
+
+            self._commit_meta(generation, self._next_segment, [
+                {"id": s.id, "deleted": s.deleted_generation} for s in self._segments
+            ])
+            self._generation = generation
+            self._mtime = os.stat(self.meta_path).st_mtime_ns
+            self._delta = {}
+            self._pending_deletes = set()
+            self._dirty = set()
+
+            # Only once index.json no longer names them; mapped files stay valid after unlink
+            for segment in merged:
+                _Segment.remove(self.path, segment.id)
+            for path in obsolete_files:
+                if os.path.exists(path):
+                    os.remove(path)
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_lexical_index(collection_name: str) -> LexicalIndex:
+    """Shared per-collection index for this process"""
+    with _indexes_lock:
+        if collection_name not in _indexes:
+            _indexes[collection_name] = LexicalIndex(collection_name)
+        return _indexes[collection_name]
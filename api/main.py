@@ -1,154 +1,646 @@
 # api/main.py
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, File, Form, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 import uvicorn
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-import chromadb
-from redis import Redis
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from redis.asyncio import Redis
 import ollama
+import asyncio
 import logging
+import json
+import os
+import shutil
+import time
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES, authenticate_ldap, create_user_token, get_user_role, verify_access_token
+from collection_registry import get_collection_registry
+from document_processor import SUPPORTED_EXTENSIONS, get_document_processor
+from embedding_batcher import get_embedding_batcher
+from index_manifest import make_chunk_id
+from ingestion import IngestionPipeline
+from jobs import IndexingJob, JobManager
+from lexical_index import get_lexical_index
+from retrieval import multi_query_search
+from context_packer import MAX_CONTEXT_TOKENS, pack_context, get_token_counter
+from model_config import load_models_config
+from model_router import TASKS, estimate_tokens, get_model_router, infer_task
+from model_residency import ModelResidencyManager, OllamaBackend
+from gpu_optimizer import GPUOptimizer
+from vector_store import create_vector_client
+from semantic_cache import SemanticCache, get_collection_version, bump_collection_version_sync
+from telemetry import (
+    REQUEST_SECONDS, REQUESTS_IN_PROGRESS, observe_stage, record_llm, request_timings, span, start_request,
+    track_queue_depth, track_write_queue_depth
+)
+from write_behind import WRITE_FLUSH_SECONDS, get_write_behind_queue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def warm_up_models(app: FastAPI):
+    """Load the embedding model, then the warm set of LLMs; /ready waits for this"""
+    try:
+        seconds = await run_in_threadpool(app.state.embedder.engine.warm_up)
+    except Exception as e:
+        logger.error(f"Embedding model failed to load: {e}")
+        raise
+    logger.info(f"Embedding model {app.state.embedder.engine.model_name} loaded in {seconds:.1f}s")
+    # Tokenizers load on first use under a global lock; do it here, not mid-request
+    models = {profile["name"] for profile in load_models_config().values() if profile.get("name")}
+    await run_in_threadpool(lambda: [get_token_counter(model) for model in models])
+    try:
+        await app.state.residency.warm_up()
+    except Exception as e:
+        logger.warning(f"Model warm-up failed: {e}")
+
 # Initialize clients
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    app.state.chroma_client = chromadb.HttpClient(host="chromadb", port=8000)
+    # Redis and Ollama use their asyncio clients; the vector store client (Chroma
+    # or the embedded backend, per VECTOR_STORE) is synchronous, so every call
+    # to it is offloaded with run_in_threadpool.
+    app.state.chroma_client = create_vector_client(chroma_host="chromadb", chroma_port=8000)
     app.state.redis_client = Redis(host="redis", port=6379, decode_responses=True)
-    app.state.ollama_client = ollama.Client(host="http://localhost:11434")
+    app.state.ollama_client = ollama.AsyncClient(host="http://localhost:11434")
+    
+    # Collection handles are resolved once; uploads and history are stored in
+    # bulk in the background, off the request path
+    app.state.collections = get_collection_registry(app.state.chroma_client)
+    app.state.write_behind = get_write_behind_queue(app.state.chroma_client)
+    track_write_queue_depth(app.state.write_behind.pending)
+    
+    # Shared query embedder (same model DocumentProcessor indexes with), which
+    # micro-batches concurrent requests, and the semantic answer cache built on it
+    app.state.embedder = get_embedding_batcher()
+    app.state.semantic_cache = SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "2000")),
+        policy=os.getenv("SEMANTIC_CACHE_POLICY", "lru")
+    )
+    
+    # Background indexing jobs for bulk uploads
+    app.state.document_processor = get_document_processor()
+    app.state.job_manager = JobManager(app.state.redis_client)
+    
+    # Picks a model per request from models/models.yml
+    app.state.model_router = get_model_router()
+    
+    # Keeps the warm set loaded in Ollama and batches requests per model
+    app.state.residency = ModelResidencyManager(
+        OllamaBackend(app.state.ollama_client),
+        GPUOptimizer(),
+        warm_set=[m for m in os.getenv("WARM_MODELS", "llama3.2:latest").split(",") if m],
+        slots=int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+    )
+    track_queue_depth(app.state.residency.queue_depth)
+    
+    # Models load in the background so liveness checks pass meanwhile
+    app.state.warm_up = asyncio.create_task(warm_up_models(app))
     
     yield
     
-    # Shutdown
-    app.state.redis_client.close()
+    # Shutdown: store queued writes before closing
+    app.state.warm_up.cancel()
+    await run_in_threadpool(app.state.write_behind.close)
+    await app.state.redis_client.aclose()
 
 app = FastAPI(title="Enterprise AI Assistant API", lifespan=lifespan)
 security = HTTPBearer()
 
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """Request latency by route template, plus a log line with the per-stage timings.
+
+    Streaming responses are timed to their first byte; stream_completion logs
+    the full generation.
+    """
+    start_request()
+    start = time.perf_counter()
+    status = 500
+    REQUESTS_IN_PROGRESS.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_PROGRESS.dec()
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUEST_SECONDS.labels(request.method, path, str(status)).observe(elapsed)
+        timings = request_timings()
+        if timings:
+            logger.info(f"request {request.method} {path} status={status} total_ms={elapsed * 1000:.1f} stages={timings}")
+
 # Models
 class QueryRequest(BaseModel):
     query: str
     collection: Optional[str] = "default"
     use_rag: bool = True
-    model: str = "llama3.2:latest"
+    model: Optional[str] = None  # None lets the router choose
+    task: Optional[str] = None  # lookup, qa, summarization, drafting, technical or code
+    expansions: List[str] = []  # alternative phrasings searched alongside the query
+    stream: bool = False
 
 class Document(BaseModel):
     content: str
     metadata: dict
     collection: str = "default"
 
+class BulkDocuments(BaseModel):
+    documents: List[Document]
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "data/uploads")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+BULK_BATCH_SIZE = 256
+
 # Authentication middleware
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    # Implement your authentication logic here
-    # For production, integrate with LDAP/AD
-    if token != "your-secret-token":
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
+    """Claims of a valid access token; verified once per token, then served from memory"""
+    claims = verify_access_token(credentials.credentials)
+    if claims is None:
         raise HTTPException(status_code=403, detail="Invalid authentication")
-    return token
+    return claims
+
+def require_permission(permission: str):
+    """Dependency: a valid token whose role grants ``permission``"""
+    async def check(user: Dict = Depends(verify_token)) -> Dict:
+        if permission not in user["permissions"]:
+            raise HTTPException(status_code=403, detail=f"Missing permission: {permission}")
+        return user
+    return check
+
+SYSTEM_PROMPT = 'You are a helpful AI assistant for an oil and gas company. Provide accurate, professional responses based on the provided context.'
+
+def build_messages(query: str, context: str) -> List[dict]:
+    """Build the chat messages for a RAG query"""
+    prompt = f"""Context information:
+{context}
+
+User question: {query}
+
+Please provide a detailed and accurate answer based on the context provided. If the context doesn't contain relevant information, please state that clearly."""
+    
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': prompt}
+    ]
+
+def prompt_overhead(model: str, query: str) -> int:
+    """Tokens of the prompt outside the retrieved context"""
+    counter = get_token_counter(model)
+    return sum(counter.count(message['content']) for message in build_messages(query, ""))
+
+def generation_stats(final_chunk: dict, ttft: Optional[float] = None) -> dict:
+    """Time-to-first-token and decode rate from Ollama's final response counters"""
+    eval_count = final_chunk.get('eval_count') or 0
+    eval_duration = final_chunk.get('eval_duration') or 0  # nanoseconds
+    
+    stats = {
+        "tokens": eval_count,
+        "tokens_per_sec": round(eval_count / (eval_duration / 1e9), 2) if eval_duration else None
+    }
+    if ttft is not None:
+        stats["ttft_ms"] = round(ttft * 1000, 1)
+    return stats
+
+def sse_event(data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"data: {json.dumps(data)}\n\n"
+
+async def stream_cached(cached_response: str, model: str):
+    """Replay a cached answer as a single event"""
+    yield sse_event({"type": "token", "content": cached_response})
+    yield sse_event({"type": "done", "model": model, "cached": True, "ttft_ms": 0.0})
+
+async def store_answer(request: QueryRequest, model: str, cache_key: str, embedding, scope: str, version: int, result: str):
+    """Write a finished answer to the exact-match Redis cache and the semantic cache"""
+    await app.state.redis_client.setex(cache_key, 3600, result)
+    # Expanded queries retrieve different context, so only plain ones are matched semantically
+    if not request.expansions:
+        app.state.semantic_cache.store(request.query, embedding, result, model, scope, version)
+
+@asynccontextmanager
+async def model_slot(model: str):
+    """Hold the router's reservation for ``model`` and a residency slot.
+
+    Waiting for the slot (and any model load) is timed as ``llm_queue``, the
+    generation itself as ``llm``.
+    """
+    with app.state.model_router.track(model, reserved=True):
+        waited = time.perf_counter()
+        async with app.state.residency.acquire(model):
+            observe_stage("llm_queue", time.perf_counter() - waited)
+            with span("llm", model=model):
+                yield
+
+async def stream_completion(model: str, messages: List[dict], context_used: bool, on_complete, received: float):
+    """Forward tokens from Ollama as Server-Sent Events and cache the finished text.
+
+    ``received`` is when the request arrived (``time.perf_counter()``), so
+    ttft_ms includes retrieval and waiting for a model slot.
+    """
+    ttft = None
+    parts = []
+    final_chunk = {}
+    
+    try:
+        async with model_slot(model):
+            async for chunk in await app.state.ollama_client.chat(
+                model=model, messages=messages, stream=True, keep_alive=app.state.residency.keep_alive(model)
+            ):
+                content = chunk['message']['content']
+                if content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - received
+                    parts.append(content)
+                    yield sse_event({"type": "token", "content": content})
+                if chunk.get('done'):
+                    final_chunk = chunk
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+        yield sse_event({"type": "error", "detail": str(e)})
+        return
+    
+    result = "".join(parts)
+    await on_complete(result)
+    
+    record_llm(model, final_chunk)
+    stats = generation_stats(final_chunk, ttft)
+    logger.info(f"query model={model} stream=True ttft_ms={stats.get('ttft_ms')} tokens_per_sec={stats['tokens_per_sec']} stages={request_timings()}")
+    
+    yield sse_event({
+        "type": "done",
+        "model": model,
+        "context_used": context_used,
+        "cached": False,
+        **stats
+    })
 
 # Endpoints
+@app.post("/api/auth/login")
+async def login(request: LoginRequest):
+    """Exchange AD credentials for an access token"""
+    user = await run_in_threadpool(authenticate_ldap, request.username, request.password)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    
+    return {
+        "access_token": create_user_token(user),
+        "token_type": "bearer",
+        "role": get_user_role(user.groups),
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
 @app.post("/api/query")
 async def query_assistant(
     request: QueryRequest,
-    token: str = Depends(verify_token)
+    user: Dict = Depends(verify_token)
 ):
-    """Query the AI assistant with RAG capabilities"""
+    """Query the AI assistant with RAG capabilities.
     
-    # Check cache first
-    cache_key = f"query:{request.model}:{request.query}"
-    cached_response = app.state.redis_client.get(cache_key)
+    With ``stream`` set, tokens are returned as Server-Sent Events while they are
+    generated, followed by a final ``done`` event carrying ttft_ms and tokens_per_sec.
     
-    if cached_response and not request.use_rag:
-        return {"response": cached_response, "cached": True}
+    Without an explicit ``model`` the router picks one for the task (inferred when
+    not given) and the expected prompt size.
+    """
     
-    context = ""
+    received = time.perf_counter()
+    task = request.task or infer_task(request.query, request.use_rag)
+    if task not in TASKS:
+        raise HTTPException(status_code=400, detail=f"Unknown task: {task}")
+    expected_tokens = estimate_tokens(request.query) + (MAX_CONTEXT_TOKENS if request.use_rag else 0)
+    model = app.state.model_router.route(task, expected_tokens, override=request.model)["model"]
     
-    # RAG retrieval
-    if request.use_rag:
-        collection = app.state.chroma_client.get_or_create_collection(request.collection)
-        
-        # Search for relevant documents
-        results = collection.query(
-            query_texts=[request.query],
-            n_results=5
-        )
+    # The route holds a reservation on the model until the generation takes it over
+    try:
+        # Check cache first. Keys are scoped by model and by the collection's index
+        # version, so answers built from a stale index are never served.
+        scope = request.collection if request.use_rag else "-"
+        version = await get_collection_version(app.state.redis_client, scope) if request.use_rag else 0
+        cache_key = f"query:{model}:{scope}:{version}:{request.query}"
+        if request.expansions:
+            cache_key += "|" + "|".join(request.expansions)
+        with span("cache_lookup"):
+            cached_response = await app.state.redis_client.get(cache_key)
+    
+        embedding = None
+        if not cached_response:
+            with span("embed"):
+                embedding = await app.state.embedder.aembed_query(request.query)
+            if not request.expansions:
+                with span("semantic_cache_lookup"):
+                    hit = app.state.semantic_cache.lookup(embedding, model, scope, version)
+                if hit:
+                    cached_response = hit["response"]
+    
+        if cached_response:
+            app.state.model_router.release(model)
+            if request.stream:
+                return StreamingResponse(stream_cached(cached_response, model), media_type="text/event-stream")
+            return {"response": cached_response, "model": model, "cached": True}
+    
+        context = ""
+    
+        # RAG retrieval
+        if request.use_rag:
+            # Search for relevant documents (vector + BM25, fused), for the query and
+            # any expansions at once
+            queries = [request.query] + request.expansions
+            embeddings = [embedding]
+            if request.expansions:
+                with span("embed"):
+                    embeddings += await app.state.embedder.aembed(request.expansions)
+            with span("retrieve"):
+                results = await run_in_threadpool(
+                    app.state.collections.run,
+                    request.collection,
+                    lambda collection: multi_query_search(
+                        collection,
+                        queries,
+                        embeddings,
+                        get_lexical_index(request.collection),
+                        n_results=10
+                    )
+                )
         
-        if results['documents']:
-            context = "\n\n".join(results['documents'][0])
+            if results['documents']:
+                # Pack by relevance into the model's token budget, minus overlap
+                with span("context_build"):
+                    context, pack_stats = await run_in_threadpool(
+                        lambda: pack_context(
+                            results['documents'][0],
+                            results['metadatas'][0],
+                            model,
+                            prompt_overhead=prompt_overhead(model, request.query)
+                        )
+                    )
+                logger.info(f"context model={model} {pack_stats}")
     
-    # Generate response
-    prompt = f"""Context information:
-{context}
-
-User question: {request.query}
-
-Please provide a detailed and accurate answer based on the context provided. If the context doesn't contain relevant information, please state that clearly."""
+        # Generate response
+        messages = build_messages(request.query, context)
+    except BaseException:
+        app.state.model_router.release(model)
+        raise
     
-    try:
-        response = app.state.ollama_client.chat(
-            model=request.model,
-            messages=[
-                {
-                    'role': 'system',
-                    'content': 'You are a helpful AI assistant for an oil and gas company. Provide accurate, professional responses based on the provided context.'
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ]
+    async def on_complete(result: str):
+        await store_answer(request, model, cache_key, embedding, scope, version, result)
+    
+    if request.stream:
+        return StreamingResponse(
+            stream_completion(model, messages, bool(context), on_complete, received),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
+    
+    try:
+        async with model_slot(model):
+            response = await app.state.ollama_client.chat(
+                model=model,
+                messages=messages,
+                keep_alive=app.state.residency.keep_alive(model)
+            )
         
         result = response['message']['content']
+        record_llm(model, response)
         
         # Cache the response
-        app.state.redis_client.setex(cache_key, 3600, result)
+        await on_complete(result)
+        
+        stats = generation_stats(response)
+        logger.info(f"query model={model} stream=False tokens_per_sec={stats['tokens_per_sec']}")
         
         return {
             "response": result,
-            "model": request.model,
+            "model": model,
             "context_used": bool(context),
-            "cached": False
+            "cached": False,
+            **stats
         }
         
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/documents/upload")
+def index_uploads(collection: str, ids: List[str], documents: List[str]):
+    """Runs on the write-behind worker once uploads are stored: BM25 index, then
+    a new collection version so cached answers see the documents"""
+    lexical_index = get_lexical_index(collection)
+    lexical_index.add(ids, documents)
+    lexical_index.save()
+    bump_collection_version_sync(collection)
+
+@app.post("/api/documents/upload", status_code=202)
 async def upload_document(
     document: Document,
-    token: str = Depends(verify_token)
+    user: Dict = Depends(require_permission("write"))
 ):
-    """Upload and index a document"""
+    """Queue a document for indexing; it is searchable once the next batch is written.
+
+    The 202 only means the document is queued in this process's memory: it is
+    stored within WRITE_FLUSH_SECONDS (and on a clean shutdown), but a crash
+    before then loses it. Callers that need a durable write should check for the
+    returned ID or use /api/documents/bulk, which reports through the job API.
+    """
     
     try:
-        collection = app.state.chroma_client.get_or_create_collection(document.collection)
-        
-        # Generate embedding and store
-        collection.add(
+        # The content-hash ID makes re-uploads idempotent
+        source = document.metadata.get('filename', 'unknown')
+        chunk_id = make_chunk_id(source, document.content)
+        app.state.write_behind.add(
+            document.collection,
+            ids=[chunk_id],
             documents=[document.content],
             metadatas=[document.metadata],
-            ids=[f"doc_{document.metadata.get('filename', 'unknown')}_{hash(document.content)}"]
+            on_written=index_uploads
         )
         
-        return {"status": "success", "message": "Document indexed successfully"}
+        return {
+            "status": "queued",
+            "id": chunk_id,
+            "durable": False,
+            "message": f"Document queued for indexing; held in memory until written (within {WRITE_FLUSH_SECONDS:g}s)"
+        }
         
     except Exception as e:
         logger.error(f"Error uploading document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def index_bulk_documents(job: IndexingJob, documents: List[Document]):
+    """Index pre-extracted documents in batches, keeping each source in a single batch"""
+    processor = app.state.document_processor
+    
+    by_collection: Dict[str, Dict[str, List[Document]]] = {}
+    for document in documents:
+        source = document.metadata.get('source') or document.metadata['filename']
+        by_collection.setdefault(document.collection, {}).setdefault(source, []).append(document)
+    
+    for collection_name, sources in by_collection.items():
+        batch: Dict[str, List[Document]] = {}
+        pending = 0
+        
+        for i, (source, source_documents) in enumerate(sources.items()):
+            batch[source] = source_documents
+            pending += len(source_documents)
+            if pending < BULK_BATCH_SIZE and i < len(sources) - 1:
+                continue
+            
+            chunks = [
+                {"content": d.content, "metadata": {**d.metadata, "source": batch_source}}
+                for batch_source, batch_documents in batch.items() for d in batch_documents
+            ]
+            try:
+                written = processor.index_documents(chunks, collection_name)
+                error = None
+            except Exception as e:
+                logger.error(f"Bulk indexing into {collection_name} failed: {e}")
+                written, error = 0, str(e)
+            
+            job.add_chunks(written)
+            for batch_source, batch_documents in batch.items():
+                for _ in batch_documents:
+                    job.item_done(batch_source, error=error)
+            batch, pending = {}, 0
+
+def ingest_uploaded_files(job: IndexingJob, paths: List[str], collection_name: str):
+    """Run uploaded files through the ingestion pipeline, reporting per-file progress"""
+    pipeline = IngestionPipeline(
+        processor=app.state.document_processor,
+        collection_name=collection_name,
+        workers=INGEST_WORKERS,
+        on_file_done=lambda path, chunks, error: job.item_done(os.path.basename(path), chunks, error)
+    )
+    pipeline.run(paths)
+
+def save_upload(upload: UploadFile, path: str):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+
+async def run_indexing_job(job: IndexingJob, func, *args):
+    # DocumentProcessor and IngestionPipeline bump the collection versions as they write
+    await app.state.job_manager.run(job, func, *args)
+
+@app.post("/api/documents/bulk", status_code=202)
+async def upload_documents_bulk(
+    bulk: BulkDocuments,
+    background_tasks: BackgroundTasks,
+    user: Dict = Depends(require_permission("write"))
+):
+    """Queue a batch of pre-extracted documents for background indexing.
+
+    Every document needs a ``source`` or ``filename`` in its metadata: chunks
+    are tracked per source, and re-sending a source replaces its chunks.
+    """
+    
+    missing = [i for i, d in enumerate(bulk.documents) if not (d.metadata.get('source') or d.metadata.get('filename'))]
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Documents {missing[:10]} have no metadata.source or metadata.filename"
+        )
+    
+    collections = sorted({d.collection for d in bulk.documents})
+    items = [d.metadata.get('source') or d.metadata['filename'] for d in bulk.documents]
+    job = app.state.job_manager.create(collections, items)
+    
+    background_tasks.add_task(run_indexing_job, job, index_bulk_documents, job, bulk.documents)
+    
+    return {"job_id": job.id, "status": job.status, "total": len(items)}
+
+@app.post("/api/documents/upload-files", status_code=202)
+async def upload_files(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    collection: str = Form("default"),
+    user: Dict = Depends(require_permission("write"))
+):
+    """Queue raw PDF/DOCX/XLSX files for background extraction and indexing"""
+    
+    target_dir = os.path.join(UPLOAD_DIR, os.path.basename(collection))
+    os.makedirs(target_dir, exist_ok=True)
+    
+    paths = []
+    for upload in files:
+        filename = os.path.basename(upload.filename or "")
+        if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {upload.filename}")
+        
+        # Stable paths let the index manifest skip files that were uploaded before
+        path = os.path.join(target_dir, filename)
+        await run_in_threadpool(save_upload, upload, path)
+        paths.append(path)
+    
+    job = app.state.job_manager.create([collection], [os.path.basename(p) for p in paths])
+    background_tasks.add_task(run_indexing_job, job, ingest_uploaded_files, job, paths, collection)
+    
+    return {"job_id": job.id, "status": job.status, "total": len(paths)}
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str, user: Dict = Depends(verify_token)):
+    """Progress and per-file errors of a background indexing job"""
+    status = await app.state.job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/api/cache/stats")
+async def cache_stats(user: Dict = Depends(verify_token)):
+    """Semantic cache hit-ratio statistics"""
+    return app.state.semantic_cache.stats()
+
+@app.get("/api/embeddings/stats")
+async def embedding_stats(user: Dict = Depends(verify_token)):
+    """Query-embedding cache and encode-time statistics"""
+    return {
+        "engine": app.state.embedder.engine.stats(),
+        "batcher": app.state.embedder.stats()
+    }
+
+@app.get("/api/models/routing")
+async def routing_stats(user: Dict = Depends(verify_token)):
+    """Per-model in-flight requests, routing counts and GPU residency"""
+    return {
+        "router": app.state.model_router.stats(),
+        "residency": app.state.residency.stats()
+    }
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness: the embedding model is loaded and start-up warm-up has finished"""
+    warm_up = app.state.warm_up
+    if not warm_up.done():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    if warm_up.exception() is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "detail": str(warm_up.exception())})
+    return {"status": "ready", "resident_models": app.state.residency.stats()["resident"]}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (cluster-internal, so not behind the bearer token)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/api/models")
-async def list_models(token: str = Depends(verify_token)):
+async def list_models(user: Dict = Depends(verify_token)):
     """List available LLM models"""
     
     try:
-        models = app.state.ollama_client.list()
+        models = await app.state.ollama_client.list()
         return {"models": [model['name'] for model in models['models']]}
     except Exception as e:
         logger.error(f"Error listing models: {e}")
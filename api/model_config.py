@@ -0,0 +1,47 @@
+# api/model_config.py
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+import yaml
+
+MODELS_CONFIG = os.getenv(
+    "MODELS_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "models.yml")
+)
+DEFAULT_CONTEXT_LENGTH = 4096
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def load_models_config(path: str = MODELS_CONFIG) -> Dict[str, Dict]:
+    """Model profiles from models.yml, keyed by profile name (empty if the file is missing)"""
+    if not os.path.exists(path):
+        logger.warning(f"Model config {path} not found; routing and context budgets use defaults (set MODELS_CONFIG)")
+        return {}
+
+    with open(path) as f:
+        return (yaml.safe_load(f) or {}).get("models", {})
+
+def profiles_for_model(model: str) -> List[Dict]:
+    return [profile for profile in load_models_config().values() if profile.get("name") == model]
+
+def context_length(model: str, profile: Optional[str] = None) -> int:
+    """Context window for a model.
+
+    Uses the named profile when given; otherwise the smallest window declared
+    for the model, so a prompt sized with it fits every profile.
+    """
+    config = load_models_config()
+    if profile and profile in config:
+        return int(config[profile].get("context_length", DEFAULT_CONTEXT_LENGTH))
+
+    lengths = [int(p["context_length"]) for p in profiles_for_model(model) if "context_length" in p]
+    return min(lengths) if lengths else DEFAULT_CONTEXT_LENGTH
+
+def tokenizer_name(model: str) -> Optional[str]:
+    """Hugging Face tokenizer declared for a model, if any"""
+    for profile in profiles_for_model(model):
+        if profile.get("tokenizer"):
+            return profile["tokenizer"]
+    return None
@@ -0,0 +1,270 @@
+# api/model_residency.py
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional
+from gpu_optimizer import GPUOptimizer
+from model_config import load_models_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_MEMORY_GB = 8.0
+KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+
+class OllamaBackend:
+    """Residency operations against Ollama's API (async client)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def running(self) -> List[str]:
+        response = await self.client.ps()
+        return [m.get("name") or m.get("model") for m in response["models"]]
+
+    async def load(self, model: str, keep_alive):
+        # An empty prompt loads the model without generating
+        await self.client.generate(model=model, prompt="", keep_alive=keep_alive)
+
+    async def unload(self, model: str):
+        await self.client.generate(model=model, prompt="", keep_alive=0)
+
+class FakeBackend:
+    """In-memory stand-in for Ollama, for running the manager on CPU"""
+
+    def __init__(self, load_seconds: float = 0.0):
+        self.load_seconds = load_seconds
+        self.loaded: Dict[str, object] = {}
+        self.loads: List[str] = []
+        self.unloads: List[str] = []
+
+    async def running(self) -> List[str]:
+        return list(self.loaded)
+
+    async def load(self, model: str, keep_alive):
+        await asyncio.sleep(self.load_seconds)
+        self.loaded[model] = keep_alive
+        self.loads.append(model)
+
+    async def unload(self, model: str):
+        self.loaded.pop(model, None)
+        self.unloads.append(model)
+
+class ModelResidencyManager:
+    """Keeps the right models resident in GPU memory and batches work per model.
+
+    Loaded models are tracked in LRU order (synced from the backend's running
+    models). Before a request runs, its model is loaded if needed, evicting least
+    recently used idle models until ``GPUOptimizer.can_load_model`` admits it by
+    ``memory_requirement`` from models.yml; the warm set is loaded at startup
+    with no expiry and evicted last. A model larger than the whole budget still
+    loads, after every idle model is evicted, with Ollama offloading the layers
+    that do not fit to the CPU.
+
+    Requests wait for one of ``slots`` generation slots. When several models
+    have waiters, the model currently being served keeps the slots for up to
+    ``max_batch`` grants in a row, then resident models go before ones that need
+    loading, oldest waiter first, so alternating traffic does not swap models on
+    every request.
+    """
+
+    def __init__(
+        self,
+        backend,
+        optimizer: Optional[GPUOptimizer] = None,
+        profiles: Optional[Dict[str, Dict]] = None,
+        warm_set: Optional[List[str]] = None,
+        keep_alive=KEEP_ALIVE,
+        slots: int = 4,
+        max_batch: int = 8
+    ):
+        self.backend = backend
+        self.optimizer = optimizer or GPUOptimizer()
+        self.profiles = profiles if profiles is not None else load_models_config()
+        self.warm_set = list(warm_set or [])
+        self.default_keep_alive = keep_alive
+        self.slots = slots
+        self.max_batch = max_batch
+
+        self._resident: "OrderedDict[str, float]" = OrderedDict()  # model -> last used
+        self._active: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[tuple]] = OrderedDict()  # model -> (enqueued_at, future)
+        self._slots_used = 0
+        self._current: Optional[str] = None
+        self._streak = 0
+        self._load_lock = asyncio.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.switches = 0
+
+    # -- residency ---------------------------------------------------------
+
+    def memory_of(self, model: str) -> float:
+        sizes = [float(p["memory_requirement"]) for p in self.profiles.values()
+                 if p.get("name") == model and "memory_requirement" in p]
+        return max(sizes) if sizes else DEFAULT_MODEL_MEMORY_GB
+
+    def keep_alive(self, model: str):
+        """keep_alive to send with requests, so Ollama's own expiry matches ours"""
+        return -1 if model in self.warm_set else self.default_keep_alive
+
+    def resident_gb(self, exclude: Optional[str] = None) -> float:
+        return sum(self.memory_of(m) for m in self._resident if m != exclude)
+
+    async def sync(self):
+        """Adopt the backend's view of loaded models, keeping known LRU order"""
+        running = set(await self.backend.running())
+        for model in list(self._resident):
+            if model not in running:
+                del self._resident[model]
+        for model in running:
+            if model not in self._resident:
+                self._resident[model] = time.monotonic()
+                self._resident.move_to_end(model, last=False)
+
+    def _eviction_order(self, keep: str) -> List[str]:
+        idle = [m for m in self._resident if m != keep and not self._active.get(m)]
+        # LRU order, warm models last
+        return [m for m in idle if m not in self.warm_set] + [m for m in idle if m in self.warm_set]
+
+    async def ensure_loaded(self, model: str):
+        """Load a model, evicting LRU idle models until it fits the memory budget"""
+        if model in self._resident:
+            self._resident[model] = time.monotonic()
+            self._resident.move_to_end(model)
+            return
+
+        async with self._load_lock:
+            await self.sync()
+            if model in self._resident:
+                self._resident.move_to_end(model)
+                return
+
+            needed = self.memory_of(model)
+            if not self.optimizer.fits(needed):
+                logger.warning(
+                    f"residency model={model} ({needed} GB) exceeds the {self.optimizer.max_memory_gb:g} GB "
+                    f"GPU budget; evicting idle models, Ollama will offload the rest to CPU"
+                )
+
+            for victim in self._eviction_order(model):
+                if self.optimizer.can_load_model(needed, self.resident_gb()):
+                    break
+                logger.info(f"residency evict model={victim} for={model}")
+                await self.backend.unload(victim)
+                del self._resident[victim]
+                self.evictions += 1
+
+            if self.optimizer.fits(needed) and not self.optimizer.can_load_model(needed, self.resident_gb()):
+                logger.warning(f"residency model={model} ({needed} GB) exceeds the free budget; loading anyway")
+
+            started = time.perf_counter()
+            await self.backend.load(model, self.keep_alive(model))
+            elapsed = time.perf_counter() - started
+            self._resident[model] = time.monotonic()
+            self.loads += 1
+            self.load_seconds += elapsed
+            logger.info(f"residency load model={model} seconds={elapsed:.2f}")
+
+    async def warm_up(self):
+        """Sync with the backend and preload the warm set"""
+        await self.sync()
+        for model in self.warm_set:
+            await self.ensure_loaded(model)
+
+    # -- scheduling --------------------------------------------------------
+
+    def _grant(self, model: str):
+        self._slots_used += 1
+        self._active[model] = self._active.get(model, 0) + 1
+        if model == self._current:
+            self._streak += 1
+        else:
+            if self._current is not None:
+                self.switches += 1
+            self._current = model
+            self._streak = 1
+
+    def _pick(self) -> Optional[str]:
+        for model in list(self._waiting):
+            queue = self._waiting[model]
+            while queue and queue[0][1].done():
+                queue.popleft()  # cancelled while waiting
+            if not queue:
+                del self._waiting[model]
+        if not self._waiting:
+            return None
+
+        if self._current in self._waiting and self._streak < self.max_batch:
+            return self._current
+
+        def oldest(model: str) -> float:
+            return self._waiting[model][0][0]
+
+        resident = [m for m in self._waiting if m in self._resident]
+        if resident:
+            others = [m for m in resident if m != self._current] or resident
+            return min(others, key=oldest)
+        return min(self._waiting, key=oldest)
+
+    def _dispatch(self):
+        while self._slots_used < self.slots:
+            model = self._pick()
+            if model is None:
+                return
+            _, future = self._waiting[model].popleft()
+            self._grant(model)
+            future.set_result(None)
+
+    def _release(self, model: str):
+        self._slots_used -= 1
+        self._active[model] -= 1
+        if model in self._resident:
+            self._resident[model] = time.monotonic()
+            self._resident.move_to_end(model)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def acquire(self, model: str):
+        """Wait for a generation slot for ``model`` and make sure it is loaded"""
+        if self._slots_used < self.slots and not self._waiting:
+            self._grant(model)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(model, deque()).append((time.monotonic(), future))
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Granted just before the cancellation landed: give the slot back
+                if future.done() and not future.cancelled():
+                    self._release(model)
+                raise
+
+        try:
+            await self.ensure_loaded(model)
+            yield
+        finally:
+            self._release(model)
+
+    def queue_depth(self) -> int:
+        """Generations holding a slot plus those waiting for one"""
+        return self._slots_used + sum(len(q) for q in self._waiting.values())
+
+    def stats(self) -> Dict:
+        return {
+            "resident": list(self._resident),
+            "resident_gb": self.resident_gb(),
+            "budget_gb": self.optimizer.max_memory_gb,
+            "warm_set": self.warm_set,
+            "active": {m: n for m, n in self._active.items() if n},
+            "waiting": {m: len(q) for m, q in self._waiting.items() if q},
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_seconds": round(self.load_seconds, 2),
+            "model_switches": self.switches
+        }
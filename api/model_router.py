@@ -0,0 +1,145 @@
+# api/model_router.py
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from context_packer import ANSWER_RESERVE_TOKENS, TokenCounter
+from model_config import DEFAULT_CONTEXT_LENGTH, load_models_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("ROUTER_MAX_CONCURRENCY", "4"))
+FALLBACK_MODEL = os.getenv("ROUTER_FALLBACK_MODEL", "llama3.2:latest")
+TASKS = ("lookup", "qa", "summarization", "drafting", "technical", "code")
+
+# Routing happens before a model (and so its tokenizer) is chosen
+_estimator = TokenCounter()
+
+def estimate_tokens(text: str) -> int:
+    return _estimator.count(text)
+
+def infer_task(query: str, use_rag: bool = False) -> str:
+    """Task type for a request that did not declare one"""
+    if use_rag:
+        return "qa"
+    return "lookup" if estimate_tokens(query) <= 64 else "qa"
+
+class ModelRouter:
+    """Sends each request to the cheapest adequate model in models.yml.
+
+    A profile is adequate for a request when it lists the task, its context window
+    holds the prompt plus the answer reserve, and the prompt is within its
+    ``max_prompt_tokens``. Adequate profiles are tried in order of
+    ``memory_requirement``; a model already running ``max_concurrency`` requests
+    is passed over for the next one, so bursts spill onto other resident models
+    instead of queueing behind one. Explicit model choices bypass routing but are
+    still counted and logged.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None):
+        self.profiles = profiles if profiles is not None else load_models_config()
+        self._in_flight: Dict[str, int] = {}
+        self._routed: Dict[str, int] = {}
+        self._overrides = 0
+        self._lock = threading.Lock()
+
+    def _max_concurrency(self, profile: Dict) -> int:
+        return int(profile.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))
+
+    def candidates(self, task: str, prompt_tokens: int) -> List[tuple]:
+        """Adequate (profile name, profile) pairs, cheapest first"""
+        adequate = []
+        for name, profile in self.profiles.items():
+            if task not in profile.get("tasks", []):
+                continue
+            window = int(profile.get("context_length", DEFAULT_CONTEXT_LENGTH))
+            if prompt_tokens + ANSWER_RESERVE_TOKENS > window:
+                continue
+            if prompt_tokens > int(profile.get("max_prompt_tokens", window)):
+                continue
+            adequate.append((name, profile))
+        return sorted(adequate, key=lambda item: float(item[1].get("memory_requirement", 0)))
+
+    def route(self, task: str, prompt_tokens: int = 0, override: Optional[str] = None) -> Dict:
+        """Pick a model and reserve it: returns the decision with model, profile and reason.
+
+        The reservation counts against the model's queue depth from the moment
+        it is chosen, so a burst of requests sees each other's choices. Hand it
+        to ``track(model, reserved=True)`` for the generation, or give it back
+        with ``release`` if there is none (cached answer, failure before it).
+        """
+        decision = {"task": task, "prompt_tokens": prompt_tokens}
+        adequate = [] if override else self.candidates(task, prompt_tokens)
+
+        with self._lock:
+            if override:
+                self._overrides += 1
+                decision.update(model=override, profile=None, reason="override")
+            elif not adequate:
+                # Nothing declares the task or fits the prompt: take the largest window
+                profiles = sorted(self.profiles.items(), key=lambda item: int(item[1].get("context_length", 0)))
+                name, profile = profiles[-1] if profiles else (None, {"name": FALLBACK_MODEL})
+                decision.update(model=profile["name"], profile=name, reason="fallback")
+            else:
+                free = [(n, p) for n, p in adequate if self._in_flight.get(p["name"], 0) < self._max_concurrency(p)]
+                if free:
+                    name, profile = free[0]
+                    reason = "cheapest" if (name, profile) == adequate[0] else "spillover"
+                else:
+                    # Everything is busy: queue on the least loaded model
+                    name, profile = min(
+                        adequate, key=lambda item: self._in_flight.get(item[1]["name"], 0) / self._max_concurrency(item[1])
+                    )
+                    reason = "saturated"
+                decision.update(model=profile["name"], profile=name, reason=reason)
+
+            model = decision["model"]
+            if not override:
+                self._routed[model] = self._routed.get(model, 0) + 1
+            decision["queue_depth"] = self._in_flight.get(model, 0)
+            self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        logger.info(f"route {decision}")
+        return decision
+
+    def release(self, model: str):
+        """Give back a reservation from ``route`` that will not be tracked"""
+        with self._lock:
+            self._in_flight[model] -= 1
+
+    @contextmanager
+    def track(self, model: str, reserved: bool = False):
+        """Count a request against a model's queue depth while it runs.
+
+        With ``reserved`` the count is the one ``route`` already took.
+        """
+        if not reserved:
+            with self._lock:
+                self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def queue_depth(self, model: str) -> int:
+        with self._lock:
+            return self._in_flight.get(model, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": {m: n for m, n in self._in_flight.items() if n},
+                "routed": dict(self._routed),
+                "overrides": self._overrides
+            }
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Shared router, so queue depth covers every caller in the process"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
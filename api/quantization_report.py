@@ -0,0 +1,97 @@
+# api/quantization_report.py
+import argparse
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from vector_store import _normalize, create_vector_client, quantize, top_k
+
+logger = logging.getLogger(__name__)
+
+# (quantization, rescore factor) pairs compared against exact float32 search
+SETTINGS = [("float32", 0), ("float16", 0), ("float16", 4), ("int8", 0), ("int8", 2), ("int8", 4)]
+
+def load_vectors(collection_name: str, chroma_host: str = "chromadb", chroma_port: int = 8000,
+                 limit: Optional[int] = None) -> np.ndarray:
+    """Normalized embeddings of a collection from the configured vector store"""
+    client = create_vector_client(chroma_host=chroma_host, chroma_port=chroma_port)
+    collection = client.get_collection(collection_name)
+    records = collection.get(include=["embeddings"], limit=limit)
+    return _normalize(records["embeddings"])
+
+def split_holdout(vectors: np.ndarray, holdout: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Remove ``holdout`` random rows from the index to use as queries"""
+    rng = np.random.default_rng(seed)
+    held = rng.choice(len(vectors), size=min(holdout, len(vectors) // 10 or 1), replace=False)
+    keep = np.ones(len(vectors), dtype=bool)
+    keep[held] = False
+    return vectors[keep], vectors[held]
+
+def evaluate(index: np.ndarray, queries: np.ndarray, k: int = 10) -> List[Dict]:
+    """Recall@k, scanned bytes and latency of each setting versus exact float32 search"""
+    exact = [set(top_k(q, index, k)[1].tolist()) for q in queries]
+    dimension = index.shape[1]
+    report = []
+
+    for mode, rescore_factor in SETTINGS:
+        quantized, scale = quantize(index, mode)
+        scanned = index if quantized is None else quantized
+
+        started = time.perf_counter()
+        found = [top_k(q, index, k, quantized, scale, rescore_factor=rescore_factor)[1] for q in queries]
+        elapsed = time.perf_counter() - started
+
+        recall = np.mean([len(truth & set(rows.tolist())) / len(truth) for truth, rows in zip(exact, found)])
+        scale_bytes = scale.nbytes if scale is not None else 0
+        report.append({
+            "quantization": mode,
+            "rescore_factor": rescore_factor,
+            f"recall_at_{k}": round(float(recall), 4),
+            "bytes_per_vector": scanned.itemsize * dimension,
+            "scanned_mb": round((scanned.nbytes + scale_bytes) / 2**20, 2),
+            "memory_ratio": round((scanned.nbytes + scale_bytes) / index.nbytes, 3),
+            "avg_query_ms": round(elapsed / len(queries) * 1000, 3)
+        })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall versus memory of quantized vector storage")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--chroma-host", default="chromadb")
+    parser.add_argument("--chroma-port", type=int, default=8000)
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate on at most this many records")
+    parser.add_argument("--holdout", type=int, default=200, help="Records held out of the index as queries")
+    parser.add_argument("--queries", help="Text file of real queries (one per line) used instead of held-out records")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    vectors = load_vectors(args.collection, args.chroma_host, args.chroma_port, args.limit)
+
+    if args.queries:
+        from embedding_batcher import get_embedding_batcher
+        with open(args.queries) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        index, queries = vectors, _normalize(get_embedding_batcher().embed(texts, use_cache=False))
+    else:
+        index, queries = split_holdout(vectors, args.holdout)
+
+    logger.info(f"Evaluating {len(queries)} queries against {len(index)} vectors")
+    report = {
+        "collection": args.collection,
+        "vectors": len(index),
+        "dimension": int(index.shape[1]),
+        "queries": len(queries),
+        "k": args.k,
+        "results": evaluate(index, queries, args.k)
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# api/reference_cache.py
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from io import StringIO
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "1024"))
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_REDIS_URL = os.getenv("REFERENCE_CACHE_REDIS_URL")  # e.g. redis://redis:6379/1
+LOCAL_TTL_WITH_REDIS = 30.0
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a query and its parameters"""
+    digest = hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest[:24]
+
+def _is_frame(value) -> bool:
+    # A DataFrame can only exist once pandas is loaded, so there is no need to import it here
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(value, pd.DataFrame)
+
+def _encode(value) -> str:
+    if _is_frame(value):
+        return json.dumps({"frame": value.to_json(orient="split", date_format="iso")})
+    return json.dumps({"value": value})
+
+def _decode(payload: str):
+    data = json.loads(payload)
+    if "frame" in data:
+        import pandas as pd
+        return pd.read_json(StringIO(data["frame"]), orient="split")
+    return data["value"]
+
+def _copy(value):
+    # Callers get their own frame, so mutating a result cannot corrupt the cache
+    return value.copy() if _is_frame(value) else value
+
+class ReferenceCache:
+    """Read-through TTL cache for slowly changing reference data.
+
+    Entries live in a size-bounded in-process LRU. With a Redis client, values
+    are also shared through Redis under ``namespace``, so one process's database
+    read serves the others; local copies then live at most LOCAL_TTL_WITH_REDIS
+    seconds, which bounds how long an invalidation made elsewhere goes unseen.
+    Concurrent misses on the same key load it once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = REFERENCE_CACHE_SIZE,
+        default_ttl: float = REFERENCE_CACHE_TTL,
+        redis=None,
+        namespace: str = "refcache"
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.redis = redis
+        self.namespace = namespace
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, value, ttl: float):
+        if self.redis is not None:
+            ttl = min(ttl, LOCAL_TTL_WITH_REDIS)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_redis(self, key: str):
+        if self.redis is None:
+            return None
+        try:
+            payload = self.redis.get(self._redis_key(key))
+            return None if payload is None else (_decode(payload),)
+        except Exception as e:
+            logger.warning(f"Reference cache Redis read failed: {e}")
+            return None
+
+    def _set_redis(self, key: str, value, ttl: float):
+        if self.redis is None:
+            return
+        try:
+            self.redis.setex(self._redis_key(key), max(1, int(ttl)), _encode(value))
+        except Exception as e:
+            logger.warning(f"Reference cache Redis write failed: {e}")
+
+    def get(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None):
+        """Cached value for ``key``, calling ``loader`` on a miss"""
+        ttl = self.default_ttl if ttl is None else ttl
+
+        entry = self._get_local(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return _copy(entry[1])
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            # Another thread may have loaded it while we waited
+            entry = self._get_local(key)
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                return _copy(entry[1])
+
+            shared = self._get_redis(key)
+            if shared is not None:
+                value = shared[0]
+                with self._lock:
+                    self.redis_hits += 1
+            else:
+                value = loader()
+                with self._lock:
+                    self.misses += 1
+                self._set_redis(key, value, ttl)
+
+            self._set_local(key, value, ttl)
+
+        with self._lock:
+            if self._loading.get(key) is loading and not loading.locked():
+                del self._loading[key]
+        return _copy(value)
+
+    def invalidate(self, key: str):
+        """Drop one entry here and in Redis"""
+        self.invalidate_prefix(key, exact=True)
+
+    def invalidate_prefix(self, prefix: str = "", exact: bool = False):
+        """Drop every entry whose key starts with ``prefix`` (all entries when empty)"""
+        with self._lock:
+            keys = [k for k in self._entries if (k == prefix if exact else k.startswith(prefix))]
+            for key in keys:
+                del self._entries[key]
+
+        if self.redis is not None:
+            try:
+                if exact:
+                    self.redis.delete(self._redis_key(prefix))
+                else:
+                    stale = list(self.redis.scan_iter(match=f"{self._redis_key(prefix)}*"))
+                    if stale:
+                        self.redis.delete(*stale)
+            except Exception as e:
+                logger.warning(f"Reference cache Redis invalidation failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+                "shared": self.redis is not None
+            }
+
+_cache: Optional[ReferenceCache] = None
+_cache_lock = threading.Lock()
+
+def get_reference_cache() -> ReferenceCache:
+    """Process-wide reference cache, shared through Redis when REFERENCE_CACHE_REDIS_URL is set"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            redis = None
+            if REFERENCE_CACHE_REDIS_URL:
+                from redis import Redis
+                redis = Redis.from_url(REFERENCE_CACHE_REDIS_URL, decode_responses=True)
+            _cache = ReferenceCache(redis=redis)
+        return _cache
@@ -0,0 +1,84 @@
+# api/retrieval.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+RRF_K = 60
+
+# Keyword searches run here while the vector query is in flight
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval")
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def multi_query_search(
+    collection,
+    queries: Sequence[str],
+    query_embeddings: Sequence[List[float]],
+    lexical_index=None,
+    n_results: int = 5,
+    where: Optional[Dict] = None,
+    candidates: int = 20,
+    lexical_queries: Optional[Sequence[str]] = None
+) -> Dict:
+    """Hybrid search for several phrasings of one information need.
+
+    All embeddings go to the vector store in one batched query while the keyword
+    searches run alongside it. Each query's results are fused by RRF; the
+    per-query lists are then merged by best fused score and de-duplicated by
+    chunk ID. Returns the shape of ``collection.query`` for a single query, plus
+    the merged ``scores``. Size the result to a token budget with
+    ``context_packer.pack_context``.
+    """
+    if not queries:
+        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "scores": [[]]}
+    lexical_queries = list(lexical_queries or queries)
+
+    lexical_future = None
+    if lexical_index is not None:
+        lexical_future = _executor.submit(
+            lambda: [[doc_id for doc_id, _ in lexical_index.search(q, candidates)] for q in lexical_queries]
+        )
+
+    vector_results = collection.query(
+        query_embeddings=list(query_embeddings),
+        n_results=candidates,
+        where=where
+    )
+    lexical_rankings = lexical_future.result() if lexical_future is not None else []
+
+    found: Dict[str, Tuple[str, Dict]] = {}
+    best: Dict[str, float] = {}
+    for i in range(len(queries)):
+        vector_ids = vector_results['ids'][i] if vector_results['ids'] else []
+        for doc_id, document, metadata in zip(vector_ids, vector_results['documents'][i], vector_results['metadatas'][i]):
+            found[doc_id] = (document, metadata)
+
+        rankings = [vector_ids]
+        if lexical_rankings:
+            rankings.append(lexical_rankings[i])
+
+        for doc_id, score in reciprocal_rank_fusion(rankings):
+            if score > best.get(doc_id, 0.0):
+                best[doc_id] = score
+
+    merged = sorted(best.items(), key=lambda item: item[1], reverse=True)
+
+    # Keyword-only hits are fetched by ID; the metadata filter still applies to them
+    missing = [doc_id for doc_id, _ in merged if doc_id not in found]
+    if missing:
+        fetched = collection.get(ids=missing, where=where)
+        for doc_id, document, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+            found[doc_id] = (document, metadata)
+
+    ranked = [(doc_id, score) for doc_id, score in merged if doc_id in found][:n_results]
+    return {
+        "ids": [[doc_id for doc_id, _ in ranked]],
+        "documents": [[found[doc_id][0] for doc_id, _ in ranked]],
+        "metadatas": [[found[doc_id][1] for doc_id, _ in ranked]],
+        "scores": [[score for _, score in ranked]]
+    }
@@ -0,0 +1,168 @@
+# api/semantic_cache.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+Scope = Tuple[str, str, int]  # (model, collection, collection version)
+
+class _Entry:
+    __slots__ = ("scope", "query", "embedding", "response", "hits")
+
+    def __init__(self, scope: Scope, query: str, embedding: np.ndarray, response: str):
+        self.scope = scope
+        self.query = query
+        self.embedding = embedding
+        self.response = response
+        self.hits = 0
+
+class SemanticCache:
+    """In-process cache of LLM answers looked up by query-embedding similarity.
+
+    Entries are scoped by model, collection and collection version, so bumping a
+    collection's version (on re-index) makes every answer built from the old
+    index unreachable; those entries then age out through normal eviction.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 2000, policy: str = "lru"):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.policy = policy
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._scopes: Dict[Scope, List[int]] = {}
+        self._matrices: Dict[Scope, np.ndarray] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _matrix(self, scope: Scope) -> Optional[np.ndarray]:
+        """Stacked embeddings of a scope, rebuilt lazily after writes"""
+        ids = self._scopes.get(scope)
+        if not ids:
+            return None
+        if scope not in self._matrices:
+            self._matrices[scope] = np.stack([self._entries[i].embedding for i in ids])
+        return self._matrices[scope]
+
+    def lookup(self, embedding, model: str, collection: str, version: int = 0) -> Optional[Dict]:
+        """Return the closest cached answer above the similarity threshold"""
+        scope = (model, collection, version)
+        query = self._normalize(embedding)
+
+        with self._lock:
+            matrix = self._matrix(scope)
+            if matrix is not None:
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = self._scopes[scope][best]
+                    entry = self._entries[entry_id]
+                    entry.hits += 1
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {
+                        "response": entry.response,
+                        "matched_query": entry.query,
+                        "similarity": float(scores[best])
+                    }
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, embedding, response: str, model: str, collection: str, version: int = 0):
+        """Add an answer to the cache, evicting if the cache is full"""
+        scope = (model, collection, version)
+
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                self._evict()
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, query, self._normalize(embedding), response)
+            self._scopes.setdefault(scope, []).append(entry_id)
+            self._matrices.pop(scope, None)
+
+    def _evict(self):
+        if self.policy == "lfu":
+            # Ties fall back to recency because _entries is kept in LRU order
+            entry_id = min(self._entries, key=lambda i: self._entries[i].hits)
+        else:
+            entry_id = next(iter(self._entries))
+
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.remove(entry_id)
+        if not ids:
+            del self._scopes[entry.scope]
+        self._matrices.pop(entry.scope, None)
+        self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit-ratio and size statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "policy": self.policy,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+async def get_collection_version(redis_client, collection: str) -> int:
+    """Current index version of a collection (bumped whenever it is re-indexed)"""
+    version = await redis_client.get(f"collection_version:{collection}")
+    return int(version) if version else 0
+
+async def bump_collection_version(redis_client, collection: str) -> int:
+    """Invalidate cached answers for a collection after its contents change"""
+    return await redis_client.incr(f"collection_version:{collection}")
+
+_version_client = None
+_version_client_lock = threading.Lock()
+
+def set_version_client(client):
+    """Synchronous Redis client for bump_collection_version_sync (tests and benchmarks pass a stand-in)"""
+    global _version_client
+    _version_client = client
+
+def bump_collection_version_sync(collection: str) -> Optional[int]:
+    """bump_collection_version for indexing code outside the event loop (CLI,
+    worker threads). Best effort: a Redis outage is logged, not raised, since
+    the index itself has already been written."""
+    global _version_client
+    try:
+        with _version_client_lock:
+            if _version_client is None:
+                import redis
+                _version_client = redis.Redis(
+                    host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+                    socket_connect_timeout=2, socket_timeout=2
+                )
+        return _version_client.incr(f"collection_version:{collection}")
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached answers for {collection}: {e}")
+        return None
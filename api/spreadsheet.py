@@ -0,0 +1,115 @@
+# api/spreadsheet.py
+import os
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from context_packer import TokenCounter
+
+EXCEL_CHUNK_TOKENS = int(os.getenv("EXCEL_CHUNK_TOKENS", "256"))
+
+Row = Tuple[int, Sequence[Any]]  # (spreadsheet row number, cell values)
+
+def format_cell(value: Any) -> str:
+    """Cell value as compact single-line text"""
+    if value is None or value != value:  # empty, or NaN from pandas
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return " ".join(str(value).split()).replace("|", "/")
+
+def _trimmed(values: Sequence[Any]) -> List[str]:
+    cells = [format_cell(v) for v in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return cells
+
+def iter_sheets(file_path: str) -> Iterator[Tuple[str, Iterator[Row]]]:
+    """Each sheet's name and a lazy iterator over its rows.
+
+    .xlsx/.xlsm are read once, in openpyxl's read-only mode, so rows are parsed
+    as they are consumed and memory does not grow with the sheet. Legacy .xls
+    has no streaming reader and is loaded whole through pandas.
+    """
+    if file_path.lower().endswith(".xls"):
+        import pandas as pd
+        sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+        for sheet_name, frame in sheets.items():
+            yield str(sheet_name), ((i + 1, row) for i, row in enumerate(frame.itertuples(index=False, name=None)))
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            # Stored dimensions are often wrong in generated files; read to the real end
+            sheet.reset_dimensions()
+            yield sheet.title, enumerate(sheet.iter_rows(values_only=True), start=1)
+    finally:
+        workbook.close()
+
+def row_groups(rows: Iterator[Row], max_tokens: int = EXCEL_CHUNK_TOKENS,
+               counter: Optional[TokenCounter] = None) -> Iterator[Dict]:
+    """Group rows under their header into blocks of about ``max_tokens``.
+
+    The first non-empty row is the header and is repeated at the top of every
+    block, so each chunk reads as a self-contained table. Rows are never split;
+    a single row larger than the budget becomes a block of its own. Yields
+    ``text``, ``row_start`` and ``row_end`` (spreadsheet row numbers).
+    """
+    counter = counter or TokenCounter()
+    header: Optional[List[str]] = None
+    header_line = ""
+    header_tokens = 0
+
+    lines: List[str] = []
+    used = 0
+    row_start = row_end = 0
+
+    for row_number, values in rows:
+        cells = _trimmed(values)
+        if not any(cells):
+            continue
+
+        if header is None:
+            header = [c or f"column_{i + 1}" for i, c in enumerate(cells)]
+            header_line = "| " + " | ".join(header) + " |\n"
+            header_tokens = counter.count(header_line)
+            continue
+
+        if len(cells) > len(header):
+            header += [f"column_{i + 1}" for i in range(len(header), len(cells))]
+            header_line = "| " + " | ".join(header) + " |\n"
+            header_tokens = counter.count(header_line)
+
+        line = "| " + " | ".join(cells) + " |\n"
+        tokens = counter.count(line)
+        if lines and header_tokens + used + tokens > max_tokens:
+            yield {"text": header_line + "".join(lines), "row_start": row_start, "row_end": row_end}
+            lines, used = [], 0
+
+        if not lines:
+            row_start = row_number
+        lines.append(line)
+        used += tokens
+        row_end = row_number
+
+    if lines:
+        yield {"text": header_line + "".join(lines), "row_start": row_start, "row_end": row_end}
+
+def iter_spreadsheet_chunks(file_path: str, max_tokens: int = EXCEL_CHUNK_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Chunks of every sheet, streamed, with sheet and row range in the metadata"""
+    counter = TokenCounter()
+    for sheet_name, rows in iter_sheets(file_path):
+        for i, group in enumerate(row_groups(rows, max_tokens, counter)):
+            yield {
+                "content": f"Sheet: {sheet_name}\n{group['text']}",
+                "metadata": {
+                    "source": file_path,
+                    "sheet": sheet_name,
+                    "chunk": i,
+                    "row_start": group["row_start"],
+                    "row_end": group["row_end"],
+                    "type": "excel"
+                }
+            }
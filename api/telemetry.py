@@ -0,0 +1,141 @@
+# api/telemetry.py
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REQUEST_SECONDS = Histogram(
+    "ai_api_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge("ai_api_requests_in_progress", "HTTP requests being handled")
+STAGE_SECONDS = Histogram(
+    "ai_api_stage_duration_seconds", "Time spent per pipeline stage", ["component", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("ai_api_stage_errors_total", "Pipeline stages that raised", ["component", "stage"])
+LLM_PREFILL_SECONDS = Histogram(
+    "ai_api_llm_prefill_seconds", "Prompt evaluation time reported by Ollama", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_DECODE_SECONDS = Histogram(
+    "ai_api_llm_decode_seconds", "Generation time reported by Ollama", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_LOAD_SECONDS = Histogram(
+    "ai_api_llm_load_seconds", "Model load time reported by Ollama", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("ai_api_llm_tokens_total", "Prompt and generated tokens", ["model", "kind"])
+LLM_QUEUE_DEPTH = Gauge("ai_api_llm_queue_depth", "Generations running or waiting for a model slot")
+WRITE_QUEUE_DEPTH = Gauge("ai_api_write_queue_depth", "Vector store writes queued but not yet stored")
+EMBED_BATCH_SIZE = Histogram(
+    "ai_api_embedding_batch_size", "Texts per batched embedding encode", ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+EMBED_WAIT_SECONDS = Histogram(
+    "ai_api_embedding_wait_seconds", "Time embedding requests wait for their batch", ["model", "kind"],
+    buckets=LATENCY_BUCKETS
+)
+EMBED_QUEUE_DEPTH = Gauge(
+    "ai_api_embedding_queue_depth", "Embedding requests waiting for a batch", ["model", "kind"]
+)
+
+# Stage durations of the current request, for the per-request log line
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+_tracer = None
+if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "ai-api")}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("ai-api")
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry export requested but unavailable: {e}")
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting stage timings for the current request"""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+def request_timings() -> Dict[str, float]:
+    """Stage timings of the current request so far, in milliseconds"""
+    return {stage: round(seconds * 1000, 1) for stage, seconds in (_timings.get() or {}).items()}
+
+def _add_timing(stage: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def span(stage: str, component: str = "api", **attributes):
+    """Time a stage into the stage histogram, the request's timings and, when
+    OpenTelemetry export is configured, a trace span"""
+    start = time.perf_counter()
+    trace_span = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else nullcontext()
+    with trace_span:
+        try:
+            yield
+        except BaseException:
+            STAGE_ERRORS.labels(component, stage).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.labels(component, stage).observe(elapsed)
+            _add_timing(stage, elapsed)
+
+def observe_stage(stage: str, seconds: float, component: str = "api"):
+    """Record a stage timed by the caller, for waits that do not fit a ``with`` block"""
+    STAGE_SECONDS.labels(component, stage).observe(seconds)
+    _add_timing(stage, seconds)
+
+def record_llm(model: str, response) -> Dict[str, float]:
+    """Split an Ollama call into load, prefill and decode from its final counters"""
+    durations = {}
+    for key, stage, histogram in (
+        ("load_duration", "llm_load", LLM_LOAD_SECONDS),
+        ("prompt_eval_duration", "llm_prefill", LLM_PREFILL_SECONDS),
+        ("eval_duration", "llm_decode", LLM_DECODE_SECONDS),
+    ):
+        nanoseconds = (response or {}).get(key) or 0
+        if nanoseconds:
+            seconds = nanoseconds / 1e9
+            histogram.labels(model).observe(seconds)
+            STAGE_SECONDS.labels("llm", stage).observe(seconds)
+            _add_timing(stage, seconds)
+            durations[stage] = seconds
+
+    LLM_TOKENS.labels(model, "prompt").inc((response or {}).get("prompt_eval_count") or 0)
+    LLM_TOKENS.labels(model, "generated").inc((response or {}).get("eval_count") or 0)
+    return durations
+
+def track_queue_depth(depth: Callable[[], float]):
+    """Report the LLM queue depth (e.g. from the residency manager) when scraped"""
+    LLM_QUEUE_DEPTH.set_function(depth)
+
+def track_write_queue_depth(depth: Callable[[], float]):
+    """Report the write-behind backlog when scraped"""
+    WRITE_QUEUE_DEPTH.set_function(depth)
+
+def track_embedding_queue_depth(model: str, kind: str, depth: Callable[[], float]):
+    """Report an embedding batcher's query or document backlog when scraped"""
+    EMBED_QUEUE_DEPTH.labels(model, kind).set_function(depth)
+
+def record_embedding_batch(model: str, texts: int, waits: Dict[str, List[float]]):
+    """One batched encode: its size and how long each request waited, by kind"""
+    EMBED_BATCH_SIZE.labels(model).observe(texts)
+    for kind, seconds in waits.items():
+        for wait in seconds:
+            EMBED_WAIT_SECONDS.labels(model, kind).observe(wait)
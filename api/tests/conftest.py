@@ -0,0 +1,12 @@
+# api/tests/conftest.py
+import os
+import sys
+import tempfile
+
+# The API modules import each other as top-level modules, as they do in the image
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Index state is read from these at import time; keep it out of the working tree
+_state_dir = tempfile.mkdtemp(prefix="ai-api-tests-")
+for name in ("MANIFEST_DIR", "LEXICAL_INDEX_DIR", "UPLOAD_DIR", "VECTOR_STORE_DIR"):
+    os.environ.setdefault(name, os.path.join(_state_dir, name.lower()))
@@ -0,0 +1,53 @@
+# api/tests/test_auth.py
+import pytest
+from ldap3.core.exceptions import LDAPBindError
+import auth
+
+DETAILS = {"full_name": "Pat Operator", "email": "pat@company.local", "groups": ["Engineers"]}
+
+class FakeConnection:
+    """Pooled ldap3 connection: rebind reports failure by return value, as without raise_exceptions"""
+
+    def __init__(self, password: str = "right"):
+        self.password = password
+        self.closed = False
+        self.searches = 0
+
+    def rebind(self, user, password, **kwargs):
+        if password == "raise":
+            raise LDAPBindError("invalidCredentials")
+        return password == self.password
+
+    def unbind(self):
+        self.closed = True
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(auth, "ldap_pool", auth.LDAPConnectionPool(size=1))
+    monkeypatch.setattr(auth.ldap_pool, "_open", lambda: conn)
+
+    def lookup(connection, username):
+        connection.searches += 1
+        return dict(DETAILS)
+    monkeypatch.setattr(auth, "_lookup_user", lookup)
+    yield conn
+    auth.group_cache.invalidate("user:pat")
+
+def test_valid_password_authenticates(conn):
+    user = auth.authenticate_ldap("Pat", "right")
+    assert user.username == "Pat" and user.groups == ["Engineers"]
+    assert conn.searches == 1
+
+def test_wrong_password_rejected_with_cached_groups(conn):
+    # A recent login leaves the user's directory details cached
+    assert auth.authenticate_ldap("pat", "right") is not None
+    assert auth.authenticate_ldap("pat", "wrong") is None
+    assert auth.authenticate_ldap("pat", "raise") is None
+    # The failed binds left the pooled connection usable
+    assert not conn.closed
+    assert auth.authenticate_ldap("pat", "right") is not None
+    assert conn.searches == 1
+
+def test_empty_password_rejected(conn):
+    assert auth.authenticate_ldap("pat", "") is None
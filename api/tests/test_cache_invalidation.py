@@ -0,0 +1,65 @@
+# api/tests/test_cache_invalidation.py
+from benchmark import InMemoryRedis
+from collection_registry import get_collection_registry
+from document_processor import DocumentProcessor
+from index_manifest import get_index_manifest
+from ingestion import IngestionPipeline
+from semantic_cache import set_version_client
+from vector_store import LocalVectorClient
+
+def _processor(tmp_path) -> DocumentProcessor:
+    processor = DocumentProcessor()
+    processor._client = LocalVectorClient(str(tmp_path / "vectors"))
+    return processor
+
+def _version(redis: InMemoryRedis, collection: str) -> int:
+    entry = redis._live(f"collection_version:{collection}")
+    return int(entry[1]) if entry else 0
+
+def test_index_documents_bumps_version_only_on_change(tmp_path):
+    redis = InMemoryRedis()
+    set_version_client(redis.sync())
+    processor = _processor(tmp_path)
+    chunks = [{"content": f"Relief valve setting {i} bar", "metadata": {"source": "valves.txt"}} for i in range(3)]
+
+    assert processor.index_documents(chunks, "invalidation") == 3
+    assert _version(redis, "invalidation") == 1
+
+    # Unchanged source: nothing written, cached answers stay valid
+    assert processor.index_documents(chunks, "invalidation") == 0
+    assert _version(redis, "invalidation") == 1
+
+    # Changed source: new chunk written, dropped ones deleted
+    processor.index_documents(chunks[:1] + [{"content": "Relief valve setting 9 bar", "metadata": {"source": "valves.txt"}}],
+                              "invalidation")
+    assert _version(redis, "invalidation") == 2
+
+def test_pipeline_prune_bumps_version(tmp_path):
+    redis = InMemoryRedis()
+    set_version_client(redis.sync())
+    processor = _processor(tmp_path)
+    root = tmp_path / "share"
+    root.mkdir()
+    kept = root / "current.txt"
+    kept.write_text("Current pump manual")
+    gone = str(root / "retired.pdf")  # indexed, then removed from the share
+    processor.index_documents([
+        {"content": "Retired pump manual", "metadata": {"source": gone}},
+        {"content": "Current pump manual", "metadata": {"source": str(kept)}}
+    ], "pruned")
+    assert _version(redis, "pruned") == 1
+    manifest = get_index_manifest("pruned")
+    gone_ids, kept_ids = manifest.chunk_ids(gone), manifest.chunk_ids(str(kept))
+    assert len(gone_ids) == 1
+
+    pipeline = IngestionPipeline(processor=processor, collection_name="pruned", workers=1)
+    stats = pipeline.run([], prune_roots=[str(root)])
+
+    assert stats["deleted_chunks"] == 1
+    assert _version(redis, "pruned") == 2
+    collection = get_collection_registry(processor.client).get("pruned")
+    assert collection.get(ids=gone_ids)["ids"] == []
+    assert collection.get(ids=kept_ids)["ids"] == kept_ids
+    manifest.refresh()
+    assert manifest.chunk_ids(gone) == []
+    assert manifest.chunk_ids(str(kept)) == kept_ids
@@ -0,0 +1,30 @@
+# api/tests/test_collection_registry.py
+import pytest
+from collection_registry import CollectionRegistry
+from vector_store import LocalVectorClient
+
+def test_stale_handle_is_refreshed_and_retried(tmp_path):
+    client = LocalVectorClient(str(tmp_path))
+    registry = CollectionRegistry(client)
+    stale = registry.get("manuals")
+    stale.upsert(ids=["a"], embeddings=[[1.0, 0.0]], documents=["a"])
+
+    # Deleted behind the registry's back: the cached handle's files are gone
+    client.delete_collection("manuals")
+
+    registry.run("manuals", lambda c: c.upsert(ids=["b"], embeddings=[[0.0, 1.0]], documents=["b"]))
+    fresh = registry.get("manuals")
+    assert fresh is not stale
+    assert fresh.count() == 1
+
+def test_other_errors_are_not_retried(tmp_path):
+    registry = CollectionRegistry(LocalVectorClient(str(tmp_path)))
+    calls = []
+
+    def add_without_embeddings(collection):
+        calls.append(collection)
+        collection.add(ids=["a"], documents=["no embedding function"])
+
+    with pytest.raises(ValueError, match="Embeddings"):
+        registry.run("manuals", add_without_embeddings)
+    assert len(calls) == 1
@@ -0,0 +1,92 @@
+# api/tests/test_database_connectors.py
+import threading
+import time
+import pytest
+from database_connectors import ConnectionPool, DatabaseConnector
+
+@pytest.fixture
+def connector(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DATABASE", str(tmp_path / "plant.db"))
+    connector = DatabaseConnector(pool_size=2)
+    with connector.sql_server_connection() as conn:
+        conn.execute("CREATE TABLE readings (id INTEGER PRIMARY KEY, tag TEXT, value REAL)")
+        conn.executemany("INSERT INTO readings (tag, value) VALUES (?, ?)",
+                         [(f"PT-{i % 3}", float(i)) for i in range(12)])
+        conn.commit()
+    yield connector
+    connector.pool().close()
+
+def _pool(connector, **kwargs) -> ConnectionPool:
+    return ConnectionPool(connector._connect_sqlite, name="test", **kwargs)
+
+def test_exhausted_pool_times_out(connector):
+    pool = _pool(connector, max_size=2, timeout=0.1)
+    with pool.connection(), pool.connection():
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+        assert time.monotonic() - started >= 0.1
+
+    stats = pool.stats()
+    assert stats["size"] == 2 and stats["idle"] == 2 and stats["waits"] == 1
+    pool.close()
+
+def test_waiter_gets_returned_connection(connector):
+    pool = _pool(connector, max_size=1, timeout=5)
+    held = pool._checkout()
+    threading.Timer(0.05, pool._checkin, args=(held,)).start()
+
+    with pool.connection() as conn:
+        assert conn is held
+    assert pool.stats()["created"] == 1
+    pool.close()
+
+def test_idle_connection_is_pinged_before_reuse(connector):
+    pool = _pool(connector, max_size=1, check_after=0.0)
+    with pool.connection() as first:
+        pass
+    first.close()  # dies while idle, e.g. dropped by the server
+
+    with pool.connection() as second:
+        assert second is not first
+        assert second.execute("SELECT COUNT(*) FROM readings").fetchone() == (12,)
+    stats = pool.stats()
+    assert stats["discarded"] == 1 and stats["created"] == 2
+
+    # Within check_after the connection is handed out without a ping
+    fresh = _pool(connector, max_size=1, check_after=60.0)
+    with fresh.connection() as conn:
+        pass
+    with fresh.connection() as again:
+        assert again is conn
+    assert fresh.stats()["reused"] == 1
+    pool.close()
+    fresh.close()
+
+def test_returned_connection_is_rolled_back(connector):
+    pool = _pool(connector, max_size=1)
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM readings")  # never committed
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM readings").fetchone() == (12,)
+
+    # A connection that cannot roll back is dropped instead of pooled
+    with pool.connection() as conn:
+        conn.close()
+    stats = pool.stats()
+    assert stats["size"] == 0 and stats["idle"] == 0 and stats["discarded"] == 1
+
+def test_stream_query_yields_arraysize_batches(connector):
+    frames = list(connector.stream_query("SELECT * FROM readings ORDER BY id", arraysize=5))
+    assert [len(frame) for frame in frames] == [5, 5, 2]
+    assert list(frames[0].columns) == ["id", "tag", "value"]
+
+    empty = list(connector.stream_query("SELECT * FROM readings WHERE tag = ?", ("none",), arraysize=5))
+    assert len(empty) == 1 and empty[0].empty and list(empty[0].columns) == ["id", "tag", "value"]
+
+    frame = connector.query("SELECT * FROM readings WHERE tag = :tag", {"tag": "PT-1"})
+    assert list(frame["value"]) == [1.0, 4.0, 7.0, 10.0]
+    # Every stream returned its connection
+    assert connector.pool().stats()["idle"] == connector.pool().stats()["size"]
@@ -0,0 +1,52 @@
+# api/tests/test_document_processor.py
+import pytest
+from benchmark import InMemoryRedis
+from collection_registry import get_collection_registry
+from document_processor import DocumentProcessor
+from index_manifest import get_index_manifest
+from semantic_cache import set_version_client
+from vector_store import LocalVectorClient
+
+class FlakyEmbedder:
+    """Wraps the real batcher and fails the first ``failures`` calls"""
+
+    def __init__(self, embedder, failures: int = 1):
+        self.embedder = embedder
+        self.failures = failures
+
+    def embed(self, texts, use_cache=True):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding service unavailable")
+        return self.embedder.embed(texts, use_cache=use_cache)
+
+@pytest.fixture
+def processor(tmp_path):
+    set_version_client(InMemoryRedis().sync())
+    processor = DocumentProcessor()
+    processor._client = LocalVectorClient(str(tmp_path / "vectors"))
+    return processor
+
+def _count(processor, collection):
+    return get_collection_registry(processor.client).get(collection).count()
+
+def test_failed_write_is_redone_by_retry(processor):
+    processor.embedder = FlakyEmbedder(processor.embedder)
+    chunks = [{"content": f"Compressor K-{i} trip setting", "metadata": {"source": "k.txt"}} for i in range(3)]
+
+    with pytest.raises(RuntimeError):
+        processor.index_documents(chunks, "flaky")
+    assert get_index_manifest("flaky").chunk_ids("k.txt") == []
+
+    assert processor.index_documents(chunks, "flaky") == 3
+    assert _count(processor, "flaky") == 3
+    assert len(get_index_manifest("flaky").chunk_ids("k.txt")) == 3
+
+def test_sourceless_chunks_are_not_orphaned(processor):
+    first = [{"content": "Flare stack purge rate", "metadata": {}}]
+    second = [{"content": "Glycol regenerator temperature", "metadata": {}}]
+
+    assert processor.index_documents(first, "sourceless") == 1
+    assert processor.index_documents(second, "sourceless") == 1
+    assert processor.index_documents(first, "sourceless") == 0
+    assert _count(processor, "sourceless") == 2
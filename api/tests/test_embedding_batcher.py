@@ -0,0 +1,48 @@
+# api/tests/test_embedding_batcher.py
+import threading
+from prometheus_client import REGISTRY
+from embedding_batcher import EmbeddingBatcher
+
+class GatedEngine:
+    """Records each encode; the first one blocks until released"""
+
+    model_name = "gated-test-model"
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def embed(self, texts, use_cache=True):
+        self.calls.append((list(texts), use_cache))
+        self.started.set()
+        self.release.wait(5)
+        return [[float(len(t))] for t in texts]
+
+def test_queries_are_batched_ahead_of_queued_documents():
+    engine = GatedEngine()
+    batcher = EmbeddingBatcher(engine, max_batch_size=2, max_wait_ms=1)
+    first = batcher.submit(["d0"], use_cache=False)
+    assert engine.started.wait(5)  # the worker is busy encoding d0
+
+    documents = [batcher.submit([f"d{i}"], use_cache=False) for i in (1, 2, 3)]
+    query = batcher.submit(["q"])
+    assert batcher.stats()["queue_depth"] == {"query": 1, "document": 3}
+    engine.release.set()
+
+    assert query.result(5) == [[1.0]]
+    assert [f.result(5) for f in [first] + documents] == [[[2.0]]] * 4
+    assert engine.calls[1] == (["q"], True)
+    assert engine.calls[2] == (["d1"], False)
+
+def test_batches_are_recorded_in_metrics():
+    engine = GatedEngine()
+    engine.release.set()
+    labels = {"model": GatedEngine.model_name}
+    before = REGISTRY.get_sample_value("ai_api_embedding_batch_size_count", labels) or 0.0
+
+    EmbeddingBatcher(engine).embed(["a", "b"])
+
+    assert REGISTRY.get_sample_value("ai_api_embedding_batch_size_count", labels) == before + 1
+    assert REGISTRY.get_sample_value("ai_api_embedding_wait_seconds_count", dict(labels, kind="query")) >= 1
+    assert REGISTRY.get_sample_value("ai_api_embedding_queue_depth", dict(labels, kind="document")) == 0
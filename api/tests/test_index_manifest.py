@@ -0,0 +1,66 @@
+# api/tests/test_index_manifest.py
+import os
+import threading
+from index_manifest import IndexManifest, get_index_manifest
+
+def test_separate_writers_keep_each_others_entries(tmp_path):
+    # Two instances stand in for the API and the ingestion CLI
+    api = IndexManifest("shared", str(tmp_path))
+    cli = IndexManifest("shared", str(tmp_path))
+
+    api.update("a.pdf", "hash-a", ["chunk_a"])
+    cli.update("b.pdf", "hash-b", ["chunk_b"])
+    api.save()
+    cli.save()
+
+    merged = IndexManifest("shared", str(tmp_path))
+    assert sorted(merged.sources) == ["a.pdf", "b.pdf"]
+    # The saver also sees the other writer's entries from then on
+    assert cli.chunk_ids("a.pdf") == ["chunk_a"]
+
+def test_removal_survives_merge(tmp_path):
+    seed = IndexManifest("shared", str(tmp_path))
+    seed.update("a.pdf", "hash-a", ["chunk_a"])
+    seed.update("b.pdf", "hash-b", ["chunk_b"])
+    seed.save()
+
+    api = IndexManifest("shared", str(tmp_path))
+    cli = IndexManifest("shared", str(tmp_path))
+    assert api.remove("a.pdf") == ["chunk_a"]
+    cli.update("b.pdf", "hash-b2", ["chunk_b2"])
+    api.save()
+    cli.save()
+
+    merged = IndexManifest("shared", str(tmp_path))
+    assert list(merged.sources) == ["b.pdf"]
+    assert merged.chunk_ids("b.pdf") == ["chunk_b2"]
+
+def test_refresh_picks_up_other_writers(tmp_path):
+    api = IndexManifest("shared", str(tmp_path))
+    cli = IndexManifest("shared", str(tmp_path))
+    cli.update("c.pdf", "hash-c", ["chunk_c"])
+    cli.save()
+
+    assert not api.is_unchanged("c.pdf", "hash-c")
+    api.refresh()
+    assert api.is_unchanged("c.pdf", "hash-c")
+
+def test_shared_instance_under_concurrent_jobs():
+    manifest = get_index_manifest("concurrent_jobs")
+    assert get_index_manifest("concurrent_jobs") is manifest
+
+    def job(n: int):
+        for i in range(50):
+            manifest.update(f"job{n}/file{i}.pdf", "hash", [f"chunk_{n}_{i}"])
+            if i % 10 == 0:
+                manifest.save()
+        manifest.save()
+
+    threads = [threading.Thread(target=job, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = IndexManifest("concurrent_jobs", os.path.dirname(manifest.path))
+    assert len(reloaded.sources) == 200
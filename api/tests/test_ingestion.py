@@ -0,0 +1,29 @@
+# api/tests/test_ingestion.py
+import random
+from benchmark import InMemoryRedis, write_pdf, synthetic_text
+from collection_registry import get_collection_registry
+from document_processor import DocumentProcessor
+from ingestion import INGEST_START_METHOD, IngestionPipeline
+from semantic_cache import set_version_client
+from vector_store import LocalVectorClient
+
+def test_pipeline_extracts_in_spawned_workers(tmp_path):
+    assert INGEST_START_METHOD == "spawn"
+    set_version_client(InMemoryRedis().sync())
+    rng = random.Random(0)
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"manual_{i}.pdf")
+        write_pdf(path, [[synthetic_text(rng, 12) for _ in range(20)] for _ in range(3)])
+        paths.append(path)
+
+    processor = DocumentProcessor()
+    processor._client = LocalVectorClient(str(tmp_path / "vectors"))
+    pipeline = IngestionPipeline(processor=processor, collection_name="spawned", workers=2)
+    stats = pipeline.run(paths)
+
+    assert stats["errors"] == {}
+    assert stats["stages"]["extract"]["items"] == 3
+    written = stats["stages"]["write"]["items"]
+    assert written > 0
+    assert get_collection_registry(processor.client).get("spawned").count() == written
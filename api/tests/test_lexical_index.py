@@ -0,0 +1,75 @@
+# api/tests/test_lexical_index.py
+import json
+import os
+import numpy as np
+from lexical_index import MAX_SEGMENTS, LexicalIndex
+
+def _ids(results):
+    return [doc_id for doc_id, _ in results]
+
+def _segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.startswith("segment."))
+
+def test_add_replace_delete_across_saves(tmp_path):
+    index = LexicalIndex("manuals", str(tmp_path))
+    index.add(["p101", "p102"], ["Pump P-101A seal flush", "Pump P-102 bearing"])
+    assert _ids(index.search("P101A")) == ["p101"]  # unsaved delta is searchable
+    index.save()
+
+    index.add(["p102"], ["Compressor K-200 valve"])
+    index.delete(["p101"])
+    assert index.search("seal") == []
+    assert _ids(index.search("valve")) == ["p102"]
+    assert len(index) == 1
+    index.save()
+
+    reloaded = LexicalIndex("manuals", str(tmp_path))
+    assert len(reloaded) == 1
+    assert reloaded.search("bearing") == []
+    assert _ids(reloaded.search("K-200")) == ["p102"]
+
+def test_save_writes_only_the_delta(tmp_path):
+    index = LexicalIndex("manuals", str(tmp_path))
+    index.add([f"doc{i}" for i in range(100)], [f"valve {i} inspection" for i in range(100)])
+    index.save()
+    first = os.path.join(index.path, "segment.0.postings.npy")
+    written = os.stat(first).st_mtime_ns
+
+    index.add(["extra"], ["gearbox oil"])
+    index.save()
+
+    assert os.stat(first).st_mtime_ns == written
+    assert len(np.load(os.path.join(index.path, "segment.1.doc_ids.npy"))) == 1
+    assert _ids(index.search("gearbox")) == ["extra"]
+
+def test_segments_merge_and_obsolete_files_go(tmp_path):
+    index = LexicalIndex("manuals", str(tmp_path))
+    for i in range(MAX_SEGMENTS * 3):
+        index.add([f"doc{i}"], [f"heat exchanger tube {i}"])
+        if i % 2:
+            index.delete([f"doc{i - 1}"])
+        index.save()
+
+    with open(index.meta_path) as f:
+        meta = json.load(f)
+    assert len(meta["segments"]) <= MAX_SEGMENTS
+    live_ids = {s["id"] for s in meta["segments"]}
+    assert {int(name.split(".")[1]) for name in _segment_files(index.path)} == live_ids
+
+    expected = {f"doc{i}" for i in range(1, MAX_SEGMENTS * 3, 2)}
+    assert set(_ids(index.search("tube", k=100))) == expected
+    assert len(LexicalIndex("manuals", str(tmp_path))) == len(expected)
+
+def test_separate_writers_merge(tmp_path):
+    # Two instances stand in for the API and the ingestion CLI
+    api = LexicalIndex("shared", str(tmp_path))
+    cli = LexicalIndex("shared", str(tmp_path))
+    api.add(["a"], ["relief valve"])
+    api.save()
+
+    cli.add(["b"], ["relief damper"])
+    cli.delete(["a"])
+    cli.save()
+
+    assert _ids(api.search("relief")) == ["b"]
+    assert len(LexicalIndex("shared", str(tmp_path))) == 1
@@ -0,0 +1,85 @@
+# api/tests/test_model_residency.py
+import asyncio
+from gpu_optimizer import GPUOptimizer
+from model_residency import FakeBackend, ModelResidencyManager
+
+# Two 4 GB models fit an 11 GB budget with the 20% buffer; a third does not
+PROFILES = {
+    "pa": {"name": "a", "memory_requirement": 4.0},
+    "pb": {"name": "b", "memory_requirement": 4.0},
+    "pc": {"name": "c", "memory_requirement": 4.0},
+    "huge": {"name": "huge", "memory_requirement": 16.0}
+}
+
+def _manager(**kwargs) -> ModelResidencyManager:
+    return ModelResidencyManager(FakeBackend(), GPUOptimizer(max_memory_gb=11), profiles=PROFILES, **kwargs)
+
+def test_warm_set_preloads_without_expiry():
+    manager = _manager(warm_set=["a", "b"])
+    asyncio.run(manager.warm_up())
+
+    assert manager.backend.loads == ["a", "b"]
+    assert manager.backend.loaded == {"a": -1, "b": -1}
+    assert manager.keep_alive("c") == manager.default_keep_alive
+
+def test_evicts_least_recently_used_to_fit_budget():
+    async def run():
+        manager = _manager()
+        await manager.ensure_loaded("a")
+        await manager.ensure_loaded("b")
+        await manager.ensure_loaded("a")  # b is now least recently used
+        await manager.ensure_loaded("c")
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.backend.unloads == ["b"]
+    assert list(manager.backend.loaded) == ["a", "c"]
+    assert manager.resident_gb() == 8.0
+
+def test_warm_models_are_evicted_last():
+    async def run():
+        manager = _manager(warm_set=["a"])
+        await manager.warm_up()
+        await manager.ensure_loaded("b")
+        await manager.ensure_loaded("c")
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.backend.unloads == ["b"]
+
+def test_model_larger_than_budget_loads_alone():
+    async def run():
+        manager = _manager()
+        await manager.ensure_loaded("a")
+        await manager.ensure_loaded("b")
+        await manager.ensure_loaded("huge")  # Ollama offloads what does not fit
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.backend.unloads == ["a", "b"]
+    assert list(manager.backend.loaded) == ["huge"]
+
+def test_max_batch_hands_slots_to_other_models():
+    async def run():
+        manager = _manager(slots=1, max_batch=2)
+        await manager.ensure_loaded("a")
+        await manager.ensure_loaded("b")
+        order = []
+
+        async def job(model: str, tag: str):
+            async with manager.acquire(model):
+                order.append(tag)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(job("a", "a0"))]
+        await asyncio.sleep(0)  # a0 holds the only slot
+        tasks += [asyncio.create_task(job("a", tag)) for tag in ("a1", "a2", "a3")]
+        tasks.append(asyncio.create_task(job("b", "b1")))
+        await asyncio.gather(*tasks)
+        return manager, order
+
+    manager, order = asyncio.run(run())
+    # a runs max_batch in a row, then the waiting b gets its turn
+    assert order == ["a0", "a1", "b1", "a2", "a3"]
+    assert manager.switches == 2
+    assert manager.backend.loads == ["a", "b"]
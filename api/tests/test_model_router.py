@@ -0,0 +1,69 @@
+# api/tests/test_model_router.py
+import threading
+from model_config import load_models_config
+from model_router import ModelRouter
+
+PROFILES = {
+    "small": {"name": "small", "memory_requirement": 2.0, "context_length": 4096, "max_prompt_tokens": 1024,
+              "max_concurrency": 2, "tasks": ["qa"]},
+    "medium": {"name": "medium", "memory_requirement": 5.0, "context_length": 8192,
+               "max_concurrency": 2, "tasks": ["qa", "technical"]},
+    "large": {"name": "large", "memory_requirement": 16.0, "context_length": 16384,
+              "max_concurrency": 2, "tasks": ["code"]}
+}
+
+def test_cheapest_adequate_model_wins():
+    router = ModelRouter(PROFILES)
+    decision = router.route("qa", 100)
+    assert (decision["model"], decision["reason"]) == ("small", "cheapest")
+    # Past the small model's max_prompt_tokens
+    assert router.route("qa", 2000)["model"] == "medium"
+
+def test_no_adequate_profile_falls_back_to_largest_window():
+    decision = ModelRouter(PROFILES).route("summarization", 100)
+    assert (decision["model"], decision["reason"]) == ("large", "fallback")
+
+def test_route_reserves_until_released():
+    router = ModelRouter(PROFILES)
+    # Nothing tracked yet: reservations alone spill the burst onto the next model
+    models = [router.route("qa", 100)["model"] for _ in range(5)]
+    assert models == ["small", "small", "medium", "medium", "small"]
+    saturated = router.route("qa", 100)
+    assert (saturated["model"], saturated["reason"]) == ("medium", "saturated")  # least loaded
+
+    # Tracking takes over a reservation instead of adding to it
+    with router.track("small", reserved=True):
+        assert router.queue_depth("small") == 3
+    router.release("medium")
+    assert router.queue_depth("small") == 2
+    assert router.queue_depth("medium") == 2
+
+def test_override_is_reserved_but_not_routed():
+    router = ModelRouter(PROFILES)
+    decision = router.route("qa", 100, override="custom")
+    assert (decision["model"], decision["reason"]) == ("custom", "override")
+    assert router.queue_depth("custom") == 1
+    assert router.stats()["overrides"] == 1 and router.stats()["routed"] == {}
+
+def test_concurrent_burst_respects_max_concurrency():
+    router = ModelRouter(PROFILES)
+    barrier = threading.Barrier(4)
+    chosen = []
+
+    def request():
+        barrier.wait()
+        chosen.append(router.route("qa", 100)["model"])
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(chosen) == ["medium", "medium", "small", "small"]
+
+def test_long_technical_prompt_goes_to_gpt_oss():
+    profiles = load_models_config()
+    assert profiles, "models/models.yml should be found from the api directory"
+    router = ModelRouter(profiles)
+    assert router.route("technical", 6000)["model"] == "gpt-oss:20b"
+    assert router.route("technical", 1000)["model"] == "mistral:7b-instruct"
@@ -0,0 +1,48 @@
+# api/tests/test_query_concurrency.py
+import asyncio
+import time
+import httpx
+from auth import create_access_token
+from benchmark import Benchmark, FakeOllama
+
+# One generation takes ANSWER_TOKENS * TOKEN_MS; long enough to dwarf request overhead
+TOKEN_MS = 10.0
+ANSWER_TOKENS = 40
+CONCURRENCY = 4  # ModelResidencyManager's default slots per model
+
+async def _timed_queries(tmp_path, concurrency: int):
+    """Wall time for ``concurrency`` simultaneous uncached /api/query calls"""
+    import main
+
+    llm = FakeOllama(token_ms=TOKEN_MS, prefill_ms_per_1k=0.0, answer_tokens=ANSWER_TOKENS)
+    app = Benchmark(str(tmp_path), vector_store="local", llm=llm).build_app()
+    app.state.warm_up = asyncio.create_task(main.warm_up_models(app))
+    await app.state.warm_up
+    app.state.semantic_cache.threshold = 2.0  # every query misses
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'test', 'role': 'admin'})}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 headers=headers, timeout=60) as client:
+        # Warm request: route, tokenizer and embedding caches
+        await client.post("/api/query", json={"query": "warm up", "use_rag": False})
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/query", json={"query": f"pump seal failure {i}", "use_rag": False})
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * concurrency
+    assert not any(r.json()["cached"] for r in responses)
+    return elapsed, llm.calls
+
+def test_parallel_queries_overlap(tmp_path):
+    one_generation = ANSWER_TOKENS * TOKEN_MS / 1000
+    elapsed, calls = asyncio.run(_timed_queries(tmp_path, CONCURRENCY))
+
+    assert calls == CONCURRENCY + 1
+    # Serialized requests would take CONCURRENCY generations back to back
+    assert elapsed < one_generation * CONCURRENCY / 2, (
+        f"{CONCURRENCY} queries took {elapsed:.2f}s; one generation is {one_generation:.2f}s"
+    )
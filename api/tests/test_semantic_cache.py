@@ -0,0 +1,38 @@
+# api/tests/test_semantic_cache.py
+from semantic_cache import SemanticCache
+
+A, B, C = [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]
+
+def _filled(policy: str) -> SemanticCache:
+    cache = SemanticCache(max_entries=2, policy=policy)
+    cache.store("a", A, "answer a", "m", "docs")
+    cache.store("b", B, "answer b", "m", "docs")
+    # a is used more often, b more recently
+    cache.lookup(A, "m", "docs")
+    cache.lookup(A, "m", "docs")
+    cache.lookup(B, "m", "docs")
+    cache.store("c", C, "answer c", "m", "docs")
+    return cache
+
+def _cached(cache: SemanticCache, embedding) -> bool:
+    return cache.lookup(embedding, "m", "docs") is not None
+
+def test_lru_evicts_least_recently_used():
+    cache = _filled("lru")
+    assert (_cached(cache, A), _cached(cache, B), _cached(cache, C)) == (False, True, True)
+    assert cache.stats()["evictions"] == 1
+
+def test_lfu_evicts_least_frequently_used():
+    cache = _filled("lfu")
+    assert (_cached(cache, A), _cached(cache, B), _cached(cache, C)) == (True, False, True)
+
+def test_entries_are_keyed_by_model_collection_and_version():
+    cache = SemanticCache()
+    cache.store("pump seal", A, "answer", "m", "docs", version=1)
+
+    hit = cache.lookup([0.99, 0.1, 0.0], "m", "docs", version=1)
+    assert hit["response"] == "answer" and hit["matched_query"] == "pump seal"
+    assert cache.lookup(A, "m", "docs", version=2) is None  # re-indexed since
+    assert cache.lookup(A, "other", "docs", version=1) is None
+    assert cache.lookup(A, "m", "manuals", version=1) is None
+    assert cache.lookup(B, "m", "docs", version=1) is None  # below the threshold
@@ -0,0 +1,90 @@
+# api/tests/test_vector_store.py
+import threading
+import numpy as np
+import pytest
+from vector_store import MAX_SEGMENTS, LocalCollection, LocalVectorClient
+
+DIMENSION = 8
+
+def _vectors(rng, n):
+    return rng.standard_normal((n, DIMENSION)).astype(np.float32).tolist()
+
+def _fill(collection, rng, batches, size=5):
+    for batch in range(batches):
+        ids = [f"doc{batch}_{i}" for i in range(size)]
+        collection.upsert(ids=ids, embeddings=_vectors(rng, size), documents=ids)
+
+def test_crash_before_commit_leaves_collection_loadable(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("crash")
+    _fill(collection, rng, MAX_SEGMENTS)
+
+    # The next write merges; fail it between writing the merged segment and committing
+    def crash():
+        raise OSError("disk full")
+    monkeypatch.setattr(collection, "_commit", crash)
+    with pytest.raises(OSError):
+        _fill(collection, rng, 1)
+
+    reloaded = LocalCollection("crash", collection.path)
+    assert reloaded.count() == MAX_SEGMENTS * 5
+    assert reloaded.get(ids=["doc0_0"])["documents"] == ["doc0_0"]
+
+def test_queries_run_alongside_writes(tmp_path):
+    rng = np.random.default_rng(1)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("busy")
+    _fill(collection, rng, 2)
+    reader = LocalCollection("busy", collection.path)  # another process's view
+    errors = []
+    done = threading.Event()
+
+    def query():
+        query_rng = np.random.default_rng(2)
+        while not done.is_set():
+            try:
+                for target in (collection, reader):
+                    result = target.query(query_embeddings=_vectors(query_rng, 1), n_results=5)
+                    assert len(result["ids"][0]) == 5
+                    assert len(set(result["ids"][0])) == 5  # a replaced copy never shows up twice
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=query) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for _ in range(MAX_SEGMENTS * 4):
+        _fill(collection, rng, 3)  # rewrites the same IDs, forcing merges
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert collection.count() == 15
+
+def test_reload_maps_only_new_segments(tmp_path):
+    rng = np.random.default_rng(3)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("reload")
+    _fill(collection, rng, 2)
+    reader = LocalCollection("reload", collection.path)
+    first = list(reader._segments)
+
+    collection.upsert(ids=["doc0_0"], embeddings=_vectors(rng, 1), documents=["replaced"])
+    collection.delete(ids=["doc1_1"])
+
+    assert reader.count() == 9
+    assert reader._segments[:2] == first  # the same mapped objects, not reloaded
+    assert reader.get(ids=["doc0_0", "doc1_1", "doc1_2"])["documents"] == ["replaced", "doc1_2"]
+
+def test_get_and_delete_use_the_newest_copy(tmp_path):
+    rng = np.random.default_rng(4)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("copies")
+    collection.upsert(ids=["a", "b", "a"], embeddings=_vectors(rng, 3), documents=["a1", "b", "a2"],
+                      metadatas=[{"v": 1}, {"v": 1}, {"v": 2}])
+    collection.upsert(ids=["b"], embeddings=_vectors(rng, 1), documents=["b2"], metadatas=[{"v": 2}])
+    collection.add(ids=["a", "c"], embeddings=_vectors(rng, 2), documents=["ignored", "c"])
+
+    assert collection.count() == 3
+    assert collection.get(ids=["a", "b"])["documents"] == ["a2", "b2"]
+    collection.delete(where={"v": 2})
+    assert collection.get()["ids"] == ["c"]
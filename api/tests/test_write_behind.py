@@ -0,0 +1,77 @@
+# api/tests/test_write_behind.py
+import threading
+from write_behind import WriteBehindQueue
+
+class FakeStore:
+    """Collection registry and collection in one; the first ``failures`` upserts raise"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+        self.stored = {}
+        self.failed = threading.Event()
+
+    def run(self, name, fn):
+        return fn(self)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.calls.append(list(ids))
+        if self.failures:
+            self.failures -= 1
+            self.failed.set()
+            raise RuntimeError("vector store unavailable")
+        self.stored.update(zip(ids, documents))
+
+class FakeEmbedder:
+    def embed(self, texts, use_cache=True):
+        return [[1.0, 0.0] for _ in texts]
+
+def _queue(store, **kwargs) -> WriteBehindQueue:
+    kwargs.setdefault("flush_seconds", 60.0)
+    kwargs.setdefault("retry_seconds", 0.01)
+    return WriteBehindQueue(store, FakeEmbedder(), **kwargs)
+
+def test_flush_writes_one_batch_and_runs_callbacks():
+    store = FakeStore()
+    written = []
+    queue = _queue(store)
+    queue.add("notes", ["a", "b"], ["A", "B"], [{}, {}], on_written=lambda c, ids, docs: written.append(ids))
+    queue.add("notes", ["a"], ["A2"], [{}])  # replaces the pending copy, keeps its callback
+
+    assert queue.flush(timeout=5)
+    assert store.calls == [["b", "a"]]
+    assert store.stored == {"a": "A2", "b": "B"}
+    assert written == [["b", "a"]]
+    assert queue.stats()["pending"] == 0
+
+def test_failed_batch_is_retried():
+    store = FakeStore(failures=2)
+    queue = _queue(store)
+    queue.add("notes", ["a"], ["A"], [{}])
+
+    assert queue.flush(timeout=5)
+    assert store.stored == {"a": "A"}
+    assert queue.stats()["retries"] == 2 and queue.stats()["dropped"] == 0
+
+def test_attempts_are_counted_per_write():
+    store = FakeStore(failures=10)
+    queue = _queue(store, flush_seconds=0.01, max_retries=1, retry_seconds=0.2)
+    queue.add("notes", ["old"], ["O"], [{}])
+    assert store.failed.wait(5)
+    queue.add("notes", ["new"], ["N"], [{}])  # joins the retry of "old"
+
+    assert queue.flush(timeout=5)
+    # "old" is out of retries on its second failure; "new" still gets its own retry
+    assert store.calls == [["old"], ["old", "new"], ["new"]]
+    assert queue.stats()["dropped"] == 2
+
+def test_close_drains_pending_writes():
+    store = FakeStore()
+    queue = _queue(store)
+    queue.add("notes", ["a"], ["A"], [{}])
+    queue.add("manuals", ["b"], ["B"], [{}])
+    worker = queue._thread
+
+    queue.close(timeout=5)
+    assert store.stored == {"a": "A", "b": "B"}
+    assert not worker.is_alive()
@@ -0,0 +1,147 @@
+# api/text_chunker.py
+import os
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from context_packer import TokenCounter
+
+# Sizes are characters, or tokens when CHUNK_TOKENIZER names a Hugging Face
+# tokenizer (e.g. sentence-transformers/all-MiniLM-L6-v2)
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "256" if CHUNK_TOKENIZER else "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "32" if CHUNK_TOKENIZER else "200"))
+CHARS_PER_TOKEN = 4
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+Page = Tuple[int, str]  # (page number, text)
+
+class TextChunker:
+    """Splits a stream of pages into overlapping chunks with page ranges.
+
+    Each chunk ends at the latest paragraph break, line break, sentence end or
+    space (in that order of preference) that keeps it within ``chunk_size``, in
+    the back half of the window; only unbroken text is cut hard. The next chunk
+    starts about ``chunk_overlap`` before the cut, at a word boundary. Cuts are
+    found with ``str.rfind`` over a window, so splitting is linear in the text,
+    and only the unfinished tail of the text is buffered between pages.
+
+    With a ``counter`` sizes are tokens: the window is first sized at
+    CHARS_PER_TOKEN characters per token and then shrunk until it fits.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        counter: Optional[TokenCounter] = None,
+        separators: Sequence[str] = SEPARATORS
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.counter = counter
+        self.separators = separators
+
+        scale = CHARS_PER_TOKEN if counter is not None else 1
+        self._window = chunk_size * scale
+        self._overlap = chunk_overlap * scale
+
+    def _cut(self, text: str, start: int, limit: int) -> int:
+        """End of the chunk starting at ``start``, at most ``limit``"""
+        floor = start + (limit - start) // 2
+        for separator in self.separators:
+            position = text.rfind(separator, floor, limit)
+            if position != -1:
+                return position + len(separator)
+        return limit
+
+    def _fit(self, text: str, start: int, end: int) -> int:
+        """Shrink ``end`` until the chunk is within ``chunk_size`` tokens"""
+        while end - start > 1:
+            tokens = self.counter.count(text[start:end])
+            if tokens <= self.chunk_size:
+                break
+            limit = start + max(1, (end - start) * self.chunk_size // tokens)
+            end = self._cut(text, start, limit) if limit < end else end - 1
+        return end
+
+    def _next_start(self, text: str, start: int, end: int) -> int:
+        if end >= len(text) or self._overlap == 0:
+            return end
+        position = max(start + 1, end - self._overlap)
+        # Begin the overlap at a word boundary rather than mid-word
+        space = text.find(" ", position, end)
+        return space + 1 if space != -1 else end
+
+    def split_pages(self, pages: Iterable[Page]) -> Iterator[Dict]:
+        """Chunks of the pages' text in order.
+
+        Yields ``text``, ``page_start``, ``page_end``, and ``start`` and ``end``:
+        character offsets into the concatenated text of all pages.
+        """
+        buffer = ""
+        base = 0  # offset of buffer[0] in the whole text
+        page_offsets: List[int] = []  # buffer offset where each buffered page starts
+        page_numbers: List[int] = []
+        start = 0
+        exhausted = False
+        iterator = iter(pages)
+
+        while True:
+            # Buffer enough text for a full window, or everything left
+            while not exhausted and len(buffer) - start <= self._window:
+                try:
+                    number, text = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if buffer and not buffer.endswith("\n"):
+                    buffer += "\n"
+                page_offsets.append(len(buffer))
+                page_numbers.append(number)
+                buffer += text or ""
+
+            if start >= len(buffer):
+                return
+
+            limit = min(start + self._window, len(buffer))
+            end = limit if limit == len(buffer) and exhausted else self._cut(buffer, start, limit)
+            if self.counter is not None:
+                end = self._fit(buffer, start, end)
+
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield {
+                    "text": chunk,
+                    "page_start": page_numbers[max(0, bisect_right(page_offsets, start) - 1)],
+                    "page_end": page_numbers[max(0, bisect_right(page_offsets, end - 1) - 1)],
+                    "start": base + start,
+                    "end": base + end
+                }
+
+            if end >= len(buffer) and exhausted:
+                return
+            start = self._next_start(buffer, start, end)
+
+            # Drop consumed text once it is most of the buffer, so copying stays linear
+            if start > len(buffer) // 2:
+                keep = max(0, bisect_right(page_offsets, start) - 1)
+                buffer = buffer[start:]
+                base += start
+                page_offsets = [max(0, offset - start) for offset in page_offsets[keep:]]
+                page_numbers = page_numbers[keep:]
+                start = 0
+
+    def split_text(self, text: str) -> List[str]:
+        """Chunks of a single text, for callers without pages"""
+        return [chunk["text"] for chunk in self.split_pages([(1, text)])]
+
+_default_chunker: Optional[TextChunker] = None
+
+def get_text_chunker() -> TextChunker:
+    """Chunker configured by CHUNK_SIZE, CHUNK_OVERLAP and CHUNK_TOKENIZER"""
+    global _default_chunker
+    if _default_chunker is None:
+        counter = TokenCounter(CHUNK_TOKENIZER) if CHUNK_TOKENIZER else None
+        _default_chunker = TextChunker(CHUNK_SIZE, CHUNK_OVERLAP, counter)
+    return _default_chunker
@@ -1,15 +1,38 @@
 # api/use_cases/correspondence.py
+from datetime import datetime
 from typing import Dict, List, Optional
+import asyncio
+import inspect
 import json
+from collection_registry import get_collection_registry
+from context_packer import MAX_CONTEXT_TOKENS, get_token_counter, pack_context
+from embedding_batcher import get_embedding_batcher
+from lexical_index import get_lexical_index
+from retrieval import multi_query_search
+from model_router import estimate_tokens, get_model_router
+from telemetry import record_llm, span
+from write_behind import WriteBehindQueue, get_write_behind_queue
 
 class CorrespondenceAssistant:
-    def __init__(self, ollama_client, chroma_client):
+    def __init__(self, ollama_client, chroma_client, model: Optional[str] = None,
+                 writer: Optional[WriteBehindQueue] = None):
         self.ollama_client = ollama_client
         self.chroma_client = chroma_client
+        self.collections = get_collection_registry(chroma_client)
+        self.writer = writer or get_write_behind_queue(chroma_client)
+        self.embedder = get_embedding_batcher()
+        self.model = model  # None routes each request through models.yml
+        self.router = get_model_router()
         
         # Load templates
         self.templates = self.load_templates()
     
+    async def _chat(self, **kwargs) -> Dict:
+        """One LLM call that works with sync or async clients without blocking the loop"""
+        if inspect.iscoroutinefunction(self.ollama_client.chat):
+            return await self.ollama_client.chat(**kwargs)
+        return await asyncio.to_thread(self.ollama_client.chat, **kwargs)
+    
     def load_templates(self) -> Dict:
         """Load correspondence templates"""
         return {
@@ -43,12 +66,18 @@ class CorrespondenceAssistant:
         template = self.templates.get(correspondence_type, self.templates["project_update"])
         
         # Search for similar past correspondence
-        collection = self.chroma_client.get_or_create_collection("correspondence_history")
-        similar_docs = collection.query(
-            query_texts=[" ".join(key_points)],
-            n_results=3,
-            where={"type": correspondence_type}
-        )
+        with span("embed", "correspondence"):
+            query_embedding = await self.embedder.aembed_query(" ".join(key_points))
+        with span("retrieve", "correspondence"):
+            similar_docs = await asyncio.to_thread(
+                self.collections.run,
+                "correspondence_history",
+                lambda collection: collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=3,
+                    where={"type": correspondence_type}
+                )
+            )
         
         # Build context
         context = f"Correspondence Type: {correspondence_type}\n"
@@ -73,31 +102,37 @@ class CorrespondenceAssistant:
         Please draft a complete, professional correspondence that addresses all key points.
         """
         
-        response = self.ollama_client.chat(
-            model="mistral:7b-instruct",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a professional correspondence writer for an oil and gas company. Write in a {template['tone']} tone."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            options={"temperature": 0.7}
-        )
-        
-        # Save to history
-        collection.add(
+        model = self.router.route("drafting", estimate_tokens(prompt), override=self.model)["model"]
+        with self.router.track(model, reserved=True), span("llm", "correspondence", model=model):
+            response = await self._chat(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"You are a professional correspondence writer for an oil and gas company. Write in a {template['tone']} tone."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                options={"temperature": 0.7}
+            )
+        
+        record_llm(model, response)
+        
+        # Save to history; written in the next background batch
+        now = datetime.now()
+        self.writer.add(
+            "correspondence_history",
+            ids=[f"corr_{now.timestamp()}"],
             documents=[response['message']['content']],
             metadatas=[{
                 "type": correspondence_type,
                 "recipient": recipient_info.get('name', 'Unknown'),
-                "date": datetime.now().isoformat(),
+                "date": now.isoformat(),
                 "key_points": json.dumps(key_points)
-            }],
-            ids=[f"corr_{datetime.now().timestamp()}"]
+            }]
         )
         
         return {
@@ -115,27 +150,57 @@ class CorrespondenceAssistant:
     ) -> Dict:
         """Provide consultation on specific topics"""
         
-        # Search knowledge base
-        kb_collection = self.chroma_client.get_or_create_collection("knowledge_base")
-        relevant_docs = kb_collection.query(
-            query_texts=[topic] + specific_questions,
-            n_results=10
-        )
-        
-        # Build consultation response
-        context = ""
-        if relevant_docs['documents']:
-            context = "Relevant Information:\n"
-            context += "\n---\n".join(relevant_docs['documents'][0])
-        
-        # Adjust model and temperature based on technical level
+        # Search knowledge base for the topic and every question (one embedding
+        # batch, one merged and de-duplicated result list)
+        queries = [topic] + specific_questions
+        with span("embed", "consultation"):
+            query_embeddings = await self.embedder.aembed(queries)
+        with span("retrieve", "consultation"):
+            relevant_docs = await asyncio.to_thread(
+                self.collections.run,
+                "knowledge_base",
+                lambda collection: multi_query_search(
+                    collection,
+                    queries,
+                    query_embeddings,
+                    get_lexical_index("knowledge_base"),
+                    n_results=10 + 2 * len(specific_questions)
+                )
+            )
+        
+        # Adjust task (and so the routed model) and temperature based on technical level
         model_config = {
-            "low": {"model": "llama3.2:latest", "temperature": 0.8},
-            "medium": {"model": "mistral:7b-instruct", "temperature": 0.6},
-            "high": {"model": "mistral:7b-instruct", "temperature": 0.4}
+            "low": {"task": "qa", "temperature": 0.8},
+            "medium": {"task": "technical", "temperature": 0.6},
+            "high": {"task": "technical", "temperature": 0.4}
         }
         
         config = model_config.get(technical_level, model_config["medium"])
+        questions_text = "\n".join(queries)
+        model = self.router.route(
+            config["task"], estimate_tokens(questions_text) + MAX_CONTEXT_TOKENS, override=self.model
+        )["model"]
+        
+        # Build consultation response, packing the merged results into the model's budget
+        context = ""
+        sources_used = 0
+        if relevant_docs['documents'][0]:
+            try:
+                with span("context_build", "consultation"):
+                    sections, pack_stats = await asyncio.to_thread(
+                        lambda: pack_context(
+                            relevant_docs['documents'][0],
+                            relevant_docs['metadatas'][0],
+                            model,
+                            prompt_overhead=get_token_counter(model).count(questions_text) + 96,
+                            separator="\n---\n"
+                        )
+                    )
+            except BaseException:
+                self.router.release(model)  # the generation will not claim the route's reservation
+                raise
+            context = "Relevant Information:\n" + sections
+            sources_used = pack_stats["chunks_used"]
         
         consultation_prompt = f"""
         Topic: {topic}
@@ -149,25 +214,28 @@ class CorrespondenceAssistant:
         Please provide a comprehensive consultation addressing each question with appropriate technical depth.
         """
         
-        response = self.ollama_client.chat(
-            model=config["model"],
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a senior technical consultant in the oil and gas industry. Provide clear, actionable advice at a {technical_level} technical level."
-                },
-                {
-                    "role": "user",
-                    "content": consultation_prompt
-                }
-            ],
-            options={"temperature": config["temperature"]}
-        )
+        with self.router.track(model, reserved=True), span("llm", "consultation", model=model):
+            response = await self._chat(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"You are a senior technical consultant in the oil and gas industry. Provide clear, actionable advice at a {technical_level} technical level."
+                    },
+                    {
+                        "role": "user",
+                        "content": consultation_prompt
+                    }
+                ],
+                options={"temperature": config["temperature"]}
+            )
+        
+        record_llm(model, response)
         
         return {
             "consultation": response['message']['content'],
             "topic": topic,
             "questions_addressed": len(specific_questions),
             "technical_level": technical_level,
-            "sources_used": len(relevant_docs['documents'][0]) if relevant_docs['documents'] else 0
+            "sources_used": sources_used
         }
\ No newline at end of file
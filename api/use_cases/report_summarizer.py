@@ -1,22 +1,58 @@
 # api/use_cases/report_summarizer.py
 from datetime import datetime, timedelta
+import asyncio
+import inspect
+import os
 import pandas as pd
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
+from context_packer import ANSWER_RESERVE_TOKENS, get_token_counter
+from model_config import context_length
+from model_router import estimate_tokens, get_model_router
+from telemetry import record_llm, span
+
+DEPARTMENT_PROMPT = "You are an operations analyst. Summarize the daily reports concisely, highlighting key metrics, issues, and achievements."
+EXECUTIVE_PROMPT = "Create a concise executive summary of all departmental reports, highlighting critical issues and achievements."
+MAX_REDUCE_DEPTH = 3
+
+def department_blocks(reports_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per department with its report lines, built column-wise.
+
+    Returns columns ``department``, ``lines`` (list of report lines) and
+    ``report_count``, sorted by department.
+    """
+    content = reports_df['content'].fillna("").astype(str).str.slice(0, 200)
+    lines = "- " + reports_df['report_type'].astype(str) + ": " + content + "...\n"
+
+    metrics = reports_df['key_metrics']
+    has_metrics = metrics.notna() & metrics.astype(str).str.len().gt(0)
+    lines = lines + ("  Key Metrics: " + metrics.astype(str) + "\n").where(has_metrics, "")
+
+    grouped = lines.groupby(reports_df['department'], sort=True)
+    return pd.DataFrame({
+        "lines": grouped.agg(list),
+        "report_count": grouped.size()
+    }).rename_axis("department").reset_index()
 
 class DailyReportSummarizer:
-    def __init__(self, ollama_client, db_connector):
+    """Map-reduce summarization of the day's operational reports.
+
+    Department summaries (map) run concurrently, at most ``max_concurrency`` LLM
+    calls at a time, and are yielded as they finish; the executive summary
+    (reduce) follows. Input too large for the routed model's context is split into
+    parts that fit, summarized separately and then summarized together.
+    """
+
+    def __init__(self, ollama_client, db_connector, model: Optional[str] = None, max_concurrency: Optional[int] = None):
         self.ollama_client = ollama_client
         self.db_connector = db_connector
-    
-    async def summarize_operational_reports(self, date: datetime = None) -> Dict:
-        """Summarize daily operational reports"""
-        
-        if not date:
-            date = datetime.now().date()
-        
-        # Fetch reports from database
-        reports_query = f"""
-        SELECT 
+        self.model = model  # None routes each summary through models.yml
+        self.router = get_model_router()
+        self.max_concurrency = max_concurrency or int(os.getenv("REPORT_SUMMARY_CONCURRENCY", "4"))
+
+    def fetch_reports(self, date) -> pd.DataFrame:
+        """The day's reports, streamed in batches with content cut to what prompts use"""
+        reports_query = """
+        SELECT
             report_id,
             report_type,
             department,
@@ -24,70 +60,151 @@ class DailyReportSummarizer:
             key_metrics,
             created_at
         FROM operational_reports
-        WHERE DATE(created_at) = '{date}'
+        WHERE DATE(created_at) = ?
         ORDER BY department, report_type
         """
-        
-        reports_df = self.db_connector.query_sql_server(reports_query)
-        
+
+        batches = []
+        for batch in self.db_connector.stream_query(reports_query, [str(date)]):
+            batch['content'] = batch['content'].fillna("").astype(str).str.slice(0, 200)
+            batches.append(batch)
+        return pd.concat(batches, ignore_index=True)
+
+    async def _chat(self, semaphore: asyncio.Semaphore, model: str, system: str, prompt: str) -> str:
+        """One LLM call under the concurrency limit; works with sync or async clients.
+
+        Takes over the router reservation for ``model``, held while queued too.
+        """
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        with self.router.track(model, reserved=True):
+            async with semaphore:
+                with span("llm", "report_summarizer", model=model):
+                    if inspect.iscoroutinefunction(self.ollama_client.chat):
+                        response = await self.ollama_client.chat(model=model, messages=messages, options={"temperature": 0.5})
+                    else:
+                        response = await asyncio.to_thread(
+                            self.ollama_client.chat, model=model, messages=messages, options={"temperature": 0.5}
+                        )
+        record_llm(model, response)
+        return response['message']['content']
+
+    async def summarize_lines(
+        self,
+        semaphore: asyncio.Semaphore,
+        lines: List[str],
+        header: str,
+        system: str,
+        instruction: str,
+        depth: int = 0
+    ) -> str:
+        """Summarize ``lines``, reducing hierarchically when they exceed the context"""
+        text = "".join(lines)
+        model = self.router.route("summarization", estimate_tokens(header + text), override=self.model)["model"]
+        counter = get_token_counter(model)
+        budget = context_length(model) - ANSWER_RESERVE_TOKENS - counter.count(system + instruction + header)
+
+        if counter.count(text) <= budget or depth >= MAX_REDUCE_DEPTH:
+            if depth >= MAX_REDUCE_DEPTH:
+                text = text[:budget * 4]  # last resort: roughly fit the window
+            return await self._chat(semaphore, model, system, f"{instruction}\n\n{header}{text}")
+        self.router.release(model)  # this level only splits; the parts route for themselves
+
+        # Map: split into parts that each fit the window
+        parts: List[List[str]] = [[]]
+        used = 0
+        for line in lines:
+            tokens = counter.count(line)
+            if tokens > budget:
+                line = line[:budget * 4]
+                tokens = counter.count(line)
+            if parts[-1] and used + tokens > budget:
+                parts.append([])
+                used = 0
+            parts[-1].append(line)
+            used += tokens
+
+        partials = await asyncio.gather(*[
+            self.summarize_lines(semaphore, part, header, system, instruction, depth + 1) for part in parts
+        ])
+
+        # Reduce: summarize the part summaries together
+        return await self.summarize_lines(
+            semaphore,
+            [f"Part {i + 1}:\n{summary}\n\n" for i, summary in enumerate(partials)],
+            header,
+            system,
+            instruction,
+            depth + 1
+        )
+
+    async def stream_operational_reports(self, date: datetime = None) -> AsyncIterator[Dict]:
+        """Yield department summaries as they complete, then the executive summary"""
+
+        if not date:
+            date = datetime.now().date()
+
+        with span("db", "report_summarizer"):
+            reports_df = await asyncio.to_thread(self.fetch_reports, date)
+
         if reports_df.empty:
-            return {"summary": "No reports found for the specified date."}
-        
-        # Group by department
-        summaries = []
-        
-        for dept, dept_reports in reports_df.groupby('department'):
-            dept_content = f"Department: {dept}\n"
-            dept_content += "Reports:\n"
-            
-            for _, report in dept_reports.iterrows():
-                dept_content += f"- {report['report_type']}: {report['content'][:200]}...\n"
-                if report['key_metrics']:
-                    dept_content += f"  Key Metrics: {report['key_metrics']}\n"
-            
-            # Generate department summary
-            dept_summary = self.ollama_client.chat(
-                model="llama3.2:latest",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an operations analyst. Summarize the daily reports concisely, highlighting key metrics, issues, and achievements."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Summarize these operational reports:\n\n{dept_content}"
-                    }
-                ],
-                options={"temperature": 0.5}
+            yield {"type": "empty", "date": str(date), "summary": "No reports found for the specified date."}
+            return
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        blocks = department_blocks(reports_df)
+
+        async def summarize_department(dept: str, lines: List[str], report_count: int) -> Dict:
+            summary = await self.summarize_lines(
+                semaphore,
+                lines,
+                f"Department: {dept}\nReports:\n",
+                DEPARTMENT_PROMPT,
+                "Summarize these operational reports:"
             )
-            
-            summaries.append({
-                "department": dept,
-                "summary": dept_summary['message']['content'],
-                "report_count": len(dept_reports)
-            })
-        
-        # Generate executive summary
-        all_summaries = "\n\n".join([f"{s['department']}:\n{s['summary']}" for s in summaries])
-        
-        executive_summary = self.ollama_client.chat(
-            model="llama3.2:latest",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Create a concise executive summary of all departmental reports, highlighting critical issues and achievements."
-                },
-                {
-                    "role": "user",
-                    "content": f"Department summaries:\n\n{all_summaries}"
-                }
-            ],
-            options={"temperature": 0.5}
+            return {"department": dept, "summary": summary, "report_count": int(report_count)}
+
+        # Map: all departments at once, bounded by the semaphore
+        tasks = [
+            asyncio.create_task(summarize_department(dept, lines, count))
+            for dept, lines, count in zip(blocks['department'], blocks['lines'], blocks['report_count'])
+        ]
+        summaries = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                summary = await finished
+                summaries.append(summary)
+                yield {"type": "department", **summary}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Reduce: executive summary over the department summaries, in department order
+        summaries.sort(key=lambda s: str(s['department']))
+        executive_summary = await self.summarize_lines(
+            semaphore,
+            [f"{s['department']}:\n{s['summary']}\n\n" for s in summaries],
+            "",
+            EXECUTIVE_PROMPT,
+            "Department summaries:"
         )
-        
-        return {
+
+        yield {
+            "type": "executive_summary",
             "date": str(date),
-            "executive_summary": executive_summary['message']['content'],
+            "executive_summary": executive_summary,
             "department_summaries": summaries,
             "total_reports": len(reports_df)
-        }
\ No newline at end of file
+        }
+
+    async def summarize_operational_reports(self, date: datetime = None) -> Dict:
+        """Summarize daily operational reports"""
+        result = {}
+        async for event in self.stream_operational_reports(date):
+            if event["type"] == "empty":
+                return {"summary": event["summary"]}
+            if event["type"] == "executive_summary":
+                result = {key: value for key, value in event.items() if key != "type"}
+        return result
@@ -1,37 +1,54 @@
 # api/use_cases/technical_manual.py
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
-from document_processor import DocumentProcessor
+import inspect
+from collection_registry import get_collection_registry
+from document_processor import DocumentProcessor, get_document_processor
 from database_connectors import DatabaseConnector
+from embedding_batcher import get_embedding_batcher
+from ingestion import IngestionPipeline
+from lexical_index import get_lexical_index
+from retrieval import multi_query_search
+from context_packer import MAX_CONTEXT_TOKENS, pack_context, get_token_counter
+from model_router import estimate_tokens, get_model_router
+from telemetry import record_llm, span
 
 class TechnicalManualAssistant:
-    def __init__(self, chroma_client, ollama_client):
+    def __init__(self, chroma_client, ollama_client, model: Optional[str] = None,
+                 processor: Optional[DocumentProcessor] = None):
         self.chroma_client = chroma_client
+        self.collections = get_collection_registry(chroma_client)
         self.ollama_client = ollama_client
-        self.processor = DocumentProcessor()
+        self.model = model  # None routes each query through models.yml
+        self.router = get_model_router()
+        self.processor = processor or get_document_processor()
         self.db_connector = DatabaseConnector()
+        self.embedder = get_embedding_batcher()
     
-    async def load_technical_manuals(self, manual_paths: List[str]):
+    async def _chat(self, **kwargs) -> Dict:
+        """One LLM call that works with sync or async clients without blocking the loop"""
+        if inspect.iscoroutinefunction(self.ollama_client.chat):
+            return await self.ollama_client.chat(**kwargs)
+        return await asyncio.to_thread(self.ollama_client.chat, **kwargs)
+    
+    async def load_technical_manuals(self, manual_paths: List[str]) -> Dict:
         """Load and index technical manuals"""
-        collection = self.chroma_client.get_or_create_collection(
-            "technical_manuals",
-            metadata={"type": "technical_documentation"}
+        await asyncio.to_thread(
+            self.collections.get, "technical_manuals", metadata={"type": "technical_documentation"}
         )
         
-        for path in manual_paths:
-            if path.endswith('.pdf'):
-                chunks = self.processor.process_pdf(path)
-            elif path.endswith('.docx'):
-                chunks = self.processor.process_docx(path)
-            else:
-                continue
-            
+        pipeline = IngestionPipeline(
+            processor=self.processor,
+            collection_name="technical_manuals",
             # Index with enhanced metadata
-            for chunk in chunks:
-                chunk['metadata']['document_type'] = 'technical_manual'
-                chunk['metadata']['department'] = 'engineering'
-            
-            self.processor.index_documents(chunks, "technical_manuals")
+            extra_metadata={
+                "document_type": "technical_manual",
+                "department": "engineering"
+            }
+        )
+        paths = [path for path in manual_paths if path.endswith(('.pdf', '.docx'))]
+        
+        return await asyncio.to_thread(pipeline.run, paths)
     
     async def query_manual(self, query: str, equipment_id: str = None) -> Dict:
         """Query technical manuals with optional equipment context"""
@@ -39,47 +56,84 @@ class TechnicalManualAssistant:
         # If equipment ID provided, get additional context from database
         equipment_context = ""
         if equipment_id:
-            equipment_data = self.db_connector.query_sql_server(
-                f"SELECT * FROM equipment_specs WHERE equipment_id = '{equipment_id}'"
-            )
+            # Cached reference data: repeat questions skip the database
+            with span("db", "technical_manual"):
+                equipment_data = await asyncio.to_thread(self.db_connector.get_equipment_specs, equipment_id)
             if not equipment_data.empty:
                 equipment_context = f"Equipment Details:\n{equipment_data.to_string()}\n\n"
         
-        # Search technical manuals
-        collection = self.chroma_client.get_collection("technical_manuals")
-        results = collection.query(
-            query_texts=[query],
-            n_results=5,
-            where={"document_type": "technical_manual"}
-        )
+        # Search technical manuals for the question as asked and, with an equipment
+        # ID, tagged with it, so exact tag matches rank without drowning the rest
+        queries = [query] + ([f"{query} {equipment_id}"] if equipment_id else [])
+        with span("embed", "technical_manual"):
+            query_embeddings = await self.embedder.aembed(queries)
+        with span("retrieve", "technical_manual"):
+            results = await asyncio.to_thread(
+                self.collections.run,
+                "technical_manuals",
+                lambda collection: multi_query_search(
+                    collection,
+                    queries,
+                    query_embeddings,
+                    get_lexical_index("technical_manuals"),
+                    n_results=10,
+                    where={"document_type": "technical_manual"}
+                ),
+                create=False
+            )
+        
+        # Long equipment context pushes the query to a larger-window model
+        model = self.router.route(
+            "technical",
+            estimate_tokens(equipment_context + query) + MAX_CONTEXT_TOKENS,
+            override=self.model
+        )["model"]
         
-        # Build context
+        # Build context, packing manual sections into what is left of the token budget
         context = equipment_context
         if results['documents']:
+            try:
+                with span("context_build", "technical_manual"):
+                    sections, _ = await asyncio.to_thread(
+                        lambda: pack_context(
+                            results['documents'][0],
+                            results['metadatas'][0],
+                            model,
+                            prompt_overhead=get_token_counter(model).count(equipment_context + query) + 64,
+                            separator="\n---\n"
+                        )
+                    )
+            except BaseException:
+                self.router.release(model)  # the generation will not claim the route's reservation
+                raise
             context += "Relevant Manual Sections:\n"
-            context += "\n---\n".join(results['documents'][0])
+            context += sections
         
         # Generate response
-        response = self.ollama_client.chat(
-            model="mistral:7b-instruct",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a technical expert assistant for oil and gas operations. Provide detailed, accurate responses based on technical manuals and equipment specifications."
-                },
-                {
-                    "role": "user",
-                    "content": f"Context:\n{context}\n\nQuestion: {query}"
+        with self.router.track(model, reserved=True), span("llm", "technical_manual", model=model):
+            response = await self._chat(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a technical expert assistant for oil and gas operations. Provide detailed, accurate responses based on technical manuals and equipment specifications."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Context:\n{context}\n\nQuestion: {query}"
+                    }
+                ],
+                options={
+                    "temperature": 0.3,  # Lower temperature for factual accuracy
+                    "top_p": 0.9
                 }
-            ],
-            options={
-                "temperature": 0.3,  # Lower temperature for factual accuracy
-                "top_p": 0.9
-            }
-        )
+            )
+        
+        record_llm(model, response)
         
         return {
             "answer": response['message']['content'],
             "sources": results['metadatas'][0] if results['documents'] else [],
-            "equipment_context_used": bool(equipment_id)
+            "equipment_context_used": bool(equipment_id),
+            "model": model
         }
\ No newline at end of file
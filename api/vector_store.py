@@ -0,0 +1,709 @@
+# api/vector_store.py
+import fcntl
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")  # "chroma" or "local"
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "data/vectors")
+IVF_THRESHOLD = int(os.getenv("VECTOR_IVF_THRESHOLD", "50000"))
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "float32")  # "float32", "float16" or "int8"
+RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))  # 0 disables exact rescoring
+SCORE_BLOCK_ROWS = 65536
+MAX_SEGMENTS = 8
+
+def create_vector_client(chroma_host: str = "chromadb", chroma_port: int = 8000):
+    """Vector store client selected by VECTOR_STORE.
+
+    Both backends expose the same collection API (add, upsert, query, get,
+    delete, count), so callers do not care which one they were given.
+    """
+    if VECTOR_STORE == "local":
+        return LocalVectorClient(VECTOR_STORE_DIR)
+
+    import chromadb
+    return chromadb.HttpClient(host=chroma_host, port=chroma_port)
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Compact copy of normalized vectors for scanning, plus per-dimension int8 scales"""
+    if mode == "float32":
+        return None, None
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1])
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return codes, scale.astype(np.float32)
+    raise ValueError(f"Unsupported vector quantization: {mode}")
+
+def approximate_scores(matrix: np.ndarray, query: np.ndarray, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """Dot products against float32, float16 or scaled int8 rows.
+
+    Compact rows are widened a block at a time, so a scan never materializes a
+    float32 copy of the whole segment.
+    """
+    if matrix.dtype == np.float32:
+        return np.asarray(matrix) @ query
+    if scale is not None:
+        query = query * scale
+
+    scores = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = matrix[start:start + SCORE_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ query
+    return scores
+
+def top_k(
+    query: np.ndarray,
+    vectors: np.ndarray,
+    n_results: int,
+    quantized: Optional[np.ndarray] = None,
+    scale: Optional[np.ndarray] = None,
+    rows: Optional[np.ndarray] = None,
+    rescore_factor: int = RESCORE_FACTOR
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best (scores, rows) among ``rows`` (all rows when None), unordered.
+
+    With a quantized copy the scan runs over it, and when ``rescore_factor`` is
+    set the best ``n_results * rescore_factor`` candidates are rescored against
+    the float32 vectors, which are only paged in for those rows.
+    """
+    matrix = vectors if quantized is None else quantized
+    scores = approximate_scores(matrix if rows is None else matrix[rows], query, scale)
+    if not len(scores):
+        return scores, np.zeros(0, dtype=np.int64)
+
+    rescore = quantized is not None and rescore_factor > 0
+    top = min(n_results * rescore_factor if rescore else n_results, len(scores))
+    best = np.argpartition(-scores, top - 1)[:top]
+    best_rows = best if rows is None else rows[best]
+    if not rescore:
+        return scores[best], best_rows
+
+    best_rows = np.sort(best_rows)  # ascending rows keep the mmap reads sequential
+    exact = np.asarray(vectors[best_rows]) @ query
+    top = min(n_results, len(exact))
+    keep = np.argpartition(-exact, top - 1)[:top]
+    return exact[keep], best_rows[keep]
+
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+def matches_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style metadata filter against one record"""
+    if not where:
+        return True
+    metadata = metadata or {}
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                if not _OPERATORS[operator](value, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+class _IVFIndex:
+    """Inverted-file index: rows bucketed by their nearest k-means centroid"""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @staticmethod
+    def build(vectors: np.ndarray, iterations: int = 10, seed: int = 0) -> "_IVFIndex":
+        n = len(vectors)
+        k = max(1, int(2 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+
+        sample = vectors[rng.choice(n, size=min(n, 64 * k), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(k):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.concatenate([
+            np.argmax(vectors[i:i + 65536] @ centroids.T, axis=1) for i in range(0, n, 65536)
+        ])
+        rows = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.zeros(k + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=k))
+        return _IVFIndex(centroids, offsets, rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+
+def _map_bytes(path: str) -> np.ndarray:
+    if os.path.getsize(path):
+        return np.memmap(path, dtype=np.uint8, mode="r")
+    return np.zeros(0, dtype=np.uint8)
+
+def _pack(values: List[bytes]) -> Tuple[np.ndarray, bytes]:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(v) for v in values])
+    return offsets, b"".join(values)
+
+class _Segment:
+    """Immutable on-disk batch of records, memory-mapped on load.
+
+    IDs are kept both in row order and sorted (with the rows they came from),
+    so finding IDs is a binary search over the mapped arrays rather than a
+    dictionary built from every record. Metadata is JSON per row, decoded on
+    use.
+    """
+
+    def __init__(self, path: str, segment_id: int):
+        self.id = segment_id
+        prefix = os.path.join(path, f"segment.{segment_id}")
+
+        self.ids = np.load(f"{prefix}.ids.npy", mmap_mode="r")
+        self.sorted_ids = np.load(f"{prefix}.sorted_ids.npy", mmap_mode="r")
+        self.id_rows = np.load(f"{prefix}.id_rows.npy", mmap_mode="r")
+        self.metadata_offsets = np.load(f"{prefix}.metadata_offsets.npy", mmap_mode="r")
+        self.metadata_bytes = _map_bytes(f"{prefix}.metadatas.bin")
+
+        self.vectors = np.load(f"{prefix}.vectors.npy", mmap_mode="r")
+        self.doc_offsets = np.load(f"{prefix}.doc_offsets.npy", mmap_mode="r")
+        self.documents = _map_bytes(f"{prefix}.documents.bin")
+
+        self.quantized = None
+        self.scale = None
+        if os.path.exists(f"{prefix}.vectors_float16.npy"):
+            self.quantized = np.load(f"{prefix}.vectors_float16.npy", mmap_mode="r")
+        elif os.path.exists(f"{prefix}.vectors_int8.npy"):
+            self.quantized = np.load(f"{prefix}.vectors_int8.npy", mmap_mode="r")
+            self.scale = np.load(f"{prefix}.vectors_int8_scale.npy")
+
+        self.ivf = None
+        if os.path.exists(f"{prefix}.ivf_centroids.npy"):
+            self.ivf = _IVFIndex(
+                np.load(f"{prefix}.ivf_centroids.npy", mmap_mode="r"),
+                np.load(f"{prefix}.ivf_offsets.npy", mmap_mode="r"),
+                np.load(f"{prefix}.ivf_rows.npy", mmap_mode="r")
+            )
+
+        self._where_masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find(self, ids: np.ndarray) -> np.ndarray:
+        """Row of the last copy of each ID in this segment, -1 where it has none"""
+        if not len(self) or not len(ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        # Equal IDs sort in row order, so the last copy sits just left of side="right"
+        position = np.maximum(np.searchsorted(self.sorted_ids, ids, side="right") - 1, 0)
+        return np.where(self.sorted_ids[position] == ids, self.id_rows[position], -1)
+
+    def doc_id(self, row: int) -> str:
+        return str(self.ids[row])
+
+    def document(self, row: int) -> str:
+        start, end = self.doc_offsets[row], self.doc_offsets[row + 1]
+        return bytes(self.documents[start:end]).decode("utf-8")
+
+    def metadata(self, row: int) -> Optional[Dict]:
+        start, end = self.metadata_offsets[row], self.metadata_offsets[row + 1]
+        return json.loads(bytes(self.metadata_bytes[start:end]))
+
+    def where_mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Rows matching a filter; cached per filter since segments never change"""
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        if key not in self._where_masks:
+            if len(self._where_masks) >= 32:
+                self._where_masks.pop(next(iter(self._where_masks)))
+            self._where_masks[key] = np.fromiter(
+                (matches_where(self.metadata(row), where) for row in range(len(self))), dtype=bool, count=len(self)
+            )
+        return self._where_masks[key]
+
+    @staticmethod
+    def write(path: str, segment_id: int, ids: List[str], vectors: np.ndarray,
+              documents: List[Optional[str]], metadatas: List[Optional[Dict]], build_ivf: bool = False,
+              quantization: str = VECTOR_QUANTIZATION):
+        prefix = os.path.join(path, f"segment.{segment_id}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        # float32 vectors are always kept: they back rescoring, merges and get()
+        np.save(f"{prefix}.vectors.npy", vectors)
+        quantized, scale = quantize(vectors, quantization)
+        if quantized is not None:
+            np.save(f"{prefix}.vectors_{quantization}.npy", quantized)
+        if scale is not None:
+            np.save(f"{prefix}.vectors_{quantization}_scale.npy", scale)
+
+        offsets, packed = _pack([(d or "").encode("utf-8") for d in documents])
+        np.save(f"{prefix}.doc_offsets.npy", offsets)
+        with open(f"{prefix}.documents.bin", "wb") as f:
+            f.write(packed)
+        offsets, packed = _pack([json.dumps(m).encode("utf-8") for m in metadatas])
+        np.save(f"{prefix}.metadata_offsets.npy", offsets)
+        with open(f"{prefix}.metadatas.bin", "wb") as f:
+            f.write(packed)
+
+        id_array = np.array(ids, dtype=str)
+        id_rows = np.argsort(id_array, kind="stable")
+        np.save(f"{prefix}.sorted_ids.npy", id_array[id_rows])
+        np.save(f"{prefix}.id_rows.npy", id_rows)
+
+        if build_ivf:
+            ivf = _IVFIndex.build(vectors)
+            np.save(f"{prefix}.ivf_centroids.npy", ivf.centroids)
+            np.save(f"{prefix}.ivf_offsets.npy", ivf.offsets)
+            np.save(f"{prefix}.ivf_rows.npy", ivf.rows)
+
+        # The IDs file goes last: a segment is complete once it exists
+        tmp_path = f"{prefix}.ids.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, id_array)
+        os.replace(tmp_path, f"{prefix}.ids.npy")
+
+    @staticmethod
+    def remove(path: str, segment_id: int):
+        prefix = f"segment.{segment_id}."
+        for name in os.listdir(path):
+            if name.startswith(prefix):
+                os.remove(os.path.join(path, name))
+
+class LocalCollection:
+    """Embedded vector collection with Chroma's collection API.
+
+    Records live in immutable segments of memory-mapped NumPy files, so loading
+    is zero-copy and every worker process shares one page-cached copy. Writes
+    append a new segment and atomically swap the collection manifest; small
+    segments are merged in the background of writes, and merged segments above
+    VECTOR_IVF_THRESHOLD rows get an IVF index instead of a flat scan. Vectors are
+    L2-normalized and distances are cosine distances.
+
+    Writers hold an exclusive lock on the collection's ``.lock`` file and
+    readers take it shared while they load, so a merge cannot remove segment
+    files a reader is about to map. Reloads only map the segments that changed.
+
+    With VECTOR_QUANTIZATION set to float16 or int8, segments also store a
+    compact copy that searches scan instead of the float32 vectors; the top
+    candidates are then rescored exactly (VECTOR_RESCORE_FACTOR). Existing
+    segments keep their format until they are merged.
+    """
+
+    def __init__(self, name: str, path: str, metadata: Optional[Dict] = None, embedding_function=None):
+        self.name = name
+        self.path = path
+        self.metadata = metadata
+        self.embedding_function = embedding_function
+        self.meta_path = os.path.join(path, "collection.json")
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._segments: List[_Segment] = []
+        self._live: List[np.ndarray] = []
+        self._deleted: set = set()
+        self._next_segment = 0
+        self._refresh()
+
+    # -- loading -----------------------------------------------------------
+
+    def _load(self):
+        """Apply collection.json to the loaded state.
+
+        Segments are only ever appended or have their tail merged into one new
+        segment, so the unchanged leading segments keep their live masks and
+        only new segments and new tombstones are applied to them.
+        """
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self._mtime = os.stat(self.meta_path).st_mtime_ns
+        self.metadata = meta.get("metadata", self.metadata)
+        self._next_segment = meta.get("next_segment", 0)
+
+        segment_ids = meta.get("segments", [])
+        keep = 0
+        while keep < min(len(segment_ids), len(self._segments)) and self._segments[keep].id == segment_ids[keep]:
+            keep += 1
+        self._segments = self._segments[:keep]
+        self._live = self._live[:keep]
+
+        deleted = set(meta.get("deleted", []))
+        self._clear_live(self._locate(deleted - self._deleted).values())
+        self._deleted = deleted
+        for segment_id in segment_ids[keep:]:
+            self._append_segment(_Segment(self.path, segment_id))
+
+    def _append_segment(self, segment: _Segment):
+        """Add the newest segment; copies of its IDs in older segments are no longer live"""
+        live = np.ones(len(segment), dtype=bool)
+        if len(segment) > 1:
+            repeated = segment.sorted_ids[:-1] == segment.sorted_ids[1:]
+            live[segment.id_rows[:-1][repeated]] = False  # only the last copy in the segment counts
+        if self._deleted:
+            rows = segment.find(np.array(sorted(self._deleted), dtype=str))
+            live[rows[rows >= 0]] = False
+
+        self._clear_live(self._locate(segment.ids).values())
+        self._segments.append(segment)
+        self._live.append(live)
+
+    def _locate(self, doc_ids) -> Dict[str, tuple]:
+        """(segment index, row) of each ID's live copy, for IDs that have one"""
+        pending = doc_ids if isinstance(doc_ids, np.ndarray) else np.array(list(doc_ids), dtype=str)
+        found = {}
+        for index in range(len(self._segments) - 1, -1, -1):
+            if not len(pending):
+                break
+            rows = self._segments[index].find(pending)
+            present = rows >= 0
+            # The newest copy decides: when it is dead the ID is deleted
+            for doc_id, row in zip(pending[present], rows[present]):
+                if self._live[index][row]:
+                    found[str(doc_id)] = (index, int(row))
+            pending = pending[~present]
+        return found
+
+    def _live_locations(self):
+        for index, live in enumerate(self._live):
+            for row in np.flatnonzero(live):
+                yield index, int(row)
+
+    def _clear_live(self, locations):
+        """Mark rows dead in fresh copies of their masks; queries may hold the old ones"""
+        rows_by_segment: Dict[int, List[int]] = {}
+        for index, row in locations:
+            rows_by_segment.setdefault(index, []).append(row)
+        for index, rows in rows_by_segment.items():
+            live = self._live[index].copy()
+            live[rows] = False
+            self._live[index] = live
+
+    def _refresh(self, locked: bool = False):
+        """Reload if another process changed the collection.
+
+        ``locked`` means the caller already holds the write lock; otherwise the
+        load runs under a shared lock.
+        """
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        if locked:
+            self._load()
+        else:
+            with self._read_lock():
+                self._load()
+
+    def _commit(self):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "name": self.name,
+                "metadata": self.metadata,
+                "segments": [s.id for s in self._segments],
+                "deleted": sorted(self._deleted),
+                "next_segment": self._next_segment
+            }, f)
+        os.replace(tmp_path, self.meta_path)
+        self._mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def _write_lock(self):
+        lock_file = open(os.path.join(self.path, ".lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _read_lock(self):
+        lock_file = open(os.path.join(self.path, ".lock"), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        return lock_file
+
+    # -- writes ------------------------------------------------------------
+
+    def _embed(self, embeddings, documents):
+        if embeddings is not None:
+            return embeddings
+        if self.embedding_function is None or documents is None:
+            raise ValueError("Embeddings or documents with an embedding function are required")
+        return self.embedding_function(documents)
+
+    def _write(self, ids, embeddings, metadatas, documents, overwrite: bool):
+        embeddings = self._embed(embeddings, documents)
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+
+        with self._lock, self._write_lock():
+            self._refresh(locked=True)
+
+            if not overwrite:
+                # Like Chroma's add, existing IDs are left untouched
+                existing = self._locate(ids)
+                keep = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+                ids = [ids[i] for i in keep]
+                embeddings = [embeddings[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                documents = [documents[i] for i in keep]
+            if not ids:
+                return
+
+            segment_id = self._next_segment
+            self._next_segment += 1
+            _Segment.write(self.path, segment_id, list(ids), _normalize(embeddings), list(documents), list(metadatas))
+
+            self._deleted.difference_update(ids)
+            self._append_segment(_Segment(self.path, segment_id))
+
+            merged = self._merge_tail() if len(self._segments) > MAX_SEGMENTS else []
+            self._commit()
+
+            # Only once collection.json no longer names them
+            for segment_id in merged:
+                _Segment.remove(self.path, segment_id)
+
+    def _merge_tail(self) -> List[int]:
+        """Merge the newest segments, tiered so each record is rewritten O(log N) times.
+
+        Returns the IDs of the merged-away segments, whose files the caller
+        removes after committing.
+        """
+        sizes = [int(live.sum()) for live in self._live]
+        start = len(sizes) - 1
+        total = sizes[start]
+        while start > 0 and sizes[start - 1] <= 4 * total:
+            start -= 1
+            total += sizes[start]
+        start = min(start, len(sizes) - 2)
+
+        merged = self._segments[start:]
+        ids, vectors, documents, metadatas = [], [], [], []
+        for index, segment in enumerate(merged, start=start):
+            rows = np.flatnonzero(self._live[index])
+            if len(rows):
+                ids.extend(segment.ids[rows].tolist())
+                vectors.append(np.asarray(segment.vectors[rows]))
+                documents.extend(segment.document(r) for r in rows)
+                metadatas.extend(segment.metadata(r) for r in rows)
+
+        segment_id = self._next_segment
+        self._next_segment += 1
+        dimension = merged[0].vectors.shape[1] if merged[0].vectors.ndim == 2 else 0
+        stacked = np.concatenate(vectors) if vectors else np.zeros((0, dimension), dtype=np.float32)
+        _Segment.write(self.path, segment_id, ids, stacked, documents, metadatas,
+                       build_ivf=len(ids) >= IVF_THRESHOLD)
+
+        # Tombstones only matter for records still held by unmerged segments
+        tombstones = np.array(sorted(self._deleted), dtype=str)
+        held = np.zeros(len(tombstones), dtype=bool)
+        for segment in self._segments[:start]:
+            held |= segment.find(tombstones) >= 0
+        self._deleted = set(tombstones[held].tolist())
+
+        # Live copies of the merged IDs were all in the tail, so the kept masks still hold
+        self._segments = self._segments[:start]
+        self._live = self._live[:start]
+        self._append_segment(_Segment(self.path, segment_id))
+
+        return [segment.id for segment in merged]
+
+    def add(self, ids: List[str], embeddings=None, metadatas=None, documents=None):
+        self._write(ids, embeddings, metadatas, documents, overwrite=False)
+
+    def upsert(self, ids: List[str], embeddings=None, metadatas=None, documents=None):
+        self._write(ids, embeddings, metadatas, documents, overwrite=True)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        with self._lock, self._write_lock():
+            self._refresh(locked=True)
+            if ids is not None:
+                targets = list(self._locate(ids).values())
+            else:
+                targets = list(self._live_locations())
+            if where:
+                targets = [(i, r) for i, r in targets if matches_where(self._segments[i].metadata(r), where)]
+
+            self._deleted.update(self._segments[i].doc_id(r) for i, r in targets)
+            self._clear_live(targets)
+            self._commit()
+
+    # -- reads -------------------------------------------------------------
+
+    def _record(self, index: int, row: int):
+        segment = self._segments[index]
+        return segment.doc_id(row), segment.document(row), segment.metadata(row), segment.vectors[row]
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return sum(int(live.sum()) for live in self._live)
+
+    @staticmethod
+    def _search(segments: List[_Segment], live: List[np.ndarray], queries: np.ndarray, n_results: int,
+                where: Optional[Dict]) -> List[List[tuple]]:
+        """Top-n (score, segment index, row) per query across all segments"""
+        hits: List[List[tuple]] = [[] for _ in range(len(queries))]
+
+        for index, segment in enumerate(segments):
+            if not len(segment):
+                continue
+            mask = live[index]
+            where_mask = segment.where_mask(where)
+            if where_mask is not None:
+                mask = mask & where_mask
+            if not mask.any():
+                continue
+
+            all_rows = mask.all()
+            for q, query in enumerate(queries):
+                if segment.ivf is not None:
+                    rows = segment.ivf.candidates(query, IVF_NPROBE)
+                    rows = rows[mask[rows]]
+                else:
+                    # An unfiltered flat scan reads the mapped arrays without gathering rows
+                    rows = None if all_rows else np.flatnonzero(mask)
+
+                scores, best = top_k(query, segment.vectors, n_results, segment.quantized, segment.scale, rows)
+                hits[q].extend((float(score), index, int(row)) for score, row in zip(scores, best))
+
+        return [sorted(h, reverse=True)[:n_results] for h in hits]
+
+    def query(self, query_embeddings=None, query_texts=None, n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        if query_embeddings is None:
+            query_embeddings = self._embed(None, query_texts)
+        include = include or ["documents", "metadatas", "distances"]
+
+        # Scan a snapshot outside the lock: segments are immutable and writes
+        # replace live masks rather than changing them in place
+        with self._lock:
+            self._refresh()
+            segments, live = list(self._segments), list(self._live)
+        results = self._search(segments, live, _normalize(query_embeddings), n_results, where)
+
+        response = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        for hits in results:
+            response["ids"].append([segments[i].doc_id(r) for _, i, r in hits])
+            response["documents"].append([segments[i].document(r) for _, i, r in hits])
+            response["metadatas"].append([segments[i].metadata(r) for _, i, r in hits])
+            response["distances"].append([1.0 - score for score, _, _ in hits])
+            if "embeddings" in include:
+                response["embeddings"].append([segments[i].vectors[r].tolist() for _, i, r in hits])
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                response[key] = None
+        return response
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas"]
+
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                found = self._locate(ids)
+                candidates = [found[doc_id] for doc_id in ids if doc_id in found]
+            else:
+                candidates = self._live_locations()
+            response = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+
+            for index, row in candidates:
+                doc_id, document, metadata, vector = self._record(index, row)
+                if not matches_where(metadata, where):
+                    continue
+                response["ids"].append(doc_id)
+                response["documents"].append(document)
+                response["metadatas"].append(metadata)
+                if "embeddings" in include:
+                    response["embeddings"].append(np.asarray(vector).tolist())
+                if limit and len(response["ids"]) >= limit:
+                    break
+
+        for key in ("documents", "metadatas", "embeddings"):
+            if key not in include:
+                response[key] = None
+        return response
+
+class LocalVectorClient:
+    """Chroma-client-compatible entry point to the embedded vector store"""
+
+    def __init__(self, path: str = VECTOR_STORE_DIR):
+        self.path = path
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _collection_path(self, name: str) -> str:
+        return os.path.join(self.path, os.path.basename(name))
+
+    def heartbeat(self) -> int:
+        return 1
+
+    def list_collections(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "collection.json"))
+        )
+
+    def get_collection(self, name: str, embedding_function=None) -> LocalCollection:
+        with self._lock:
+            if name not in self._collections:
+                path = self._collection_path(name)
+                if not os.path.exists(os.path.join(path, "collection.json")):
+                    raise ValueError(f"Collection {name} does not exist.")
+                self._collections[name] = LocalCollection(name, path, embedding_function=embedding_function)
+            collection = self._collections[name]
+            if embedding_function is not None:
+                collection.embedding_function = embedding_function
+            return collection
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None, embedding_function=None) -> LocalCollection:
+        path = self._collection_path(name)
+        with self._lock:
+            if name not in self._collections and not os.path.exists(os.path.join(path, "collection.json")):
+                os.makedirs(path, exist_ok=True)
+                collection = LocalCollection(name, path, metadata, embedding_function)
+                with collection._write_lock():
+                    if not os.path.exists(collection.meta_path):
+                        collection._commit()
+                self._collections[name] = collection
+        return self.get_collection(name, embedding_function)
+
+    create_collection = get_or_create_collection
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._collection_path(name), ignore_errors=True)
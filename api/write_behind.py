@@ -0,0 +1,255 @@
+# api/write_behind.py
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from collection_registry import CollectionRegistry, get_collection_registry
+from embedding_batcher import EmbeddingBatcher, get_embedding_batcher
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_FLUSH_SECONDS = float(os.getenv("WRITE_FLUSH_SECONDS", "1.0"))
+WRITE_MAX_RETRIES = int(os.getenv("WRITE_MAX_RETRIES", "5"))
+WRITE_RETRY_SECONDS = float(os.getenv("WRITE_RETRY_SECONDS", "0.5"))
+
+# Called as on_written(collection, ids, documents) once a batch has been stored
+OnWritten = Callable[[str, List[str], List[str]], None]
+
+class _Write:
+    __slots__ = ("id", "document", "metadata", "on_written", "attempts")
+
+    def __init__(self, doc_id: str, document: str, metadata: Dict, on_written: Optional[OnWritten]):
+        self.id = doc_id
+        self.document = document
+        self.metadata = metadata
+        self.on_written = on_written
+        self.attempts = 0
+
+class WriteBehindQueue:
+    """Buffers single-document writes and stores them as bulk upserts.
+
+    ``add`` returns immediately; a worker thread embeds and upserts each
+    collection's pending documents once ``batch_size`` have queued or the
+    oldest has waited ``flush_seconds``, using the embedder queries are
+    embedded with. A failed batch is requeued and retried with exponential
+    backoff; each write is retried up to ``max_retries`` times before it is
+    dropped and logged. A document queued again before it is written replaces
+    the pending copy, so a batch never repeats an ID. ``on_written`` callbacks
+    run after the batch holding their documents lands, once per callback per
+    batch, which is where dependent work (BM25 index, cache version bump)
+    belongs.
+    """
+
+    def __init__(
+        self,
+        registry: CollectionRegistry,
+        embedder: EmbeddingBatcher,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_seconds: float = WRITE_FLUSH_SECONDS,
+        max_retries: int = WRITE_MAX_RETRIES,
+        retry_seconds: float = WRITE_RETRY_SECONDS
+    ):
+        self.registry = registry
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+
+        self._pending: Dict[str, Dict[str, _Write]] = {}
+        self._oldest: Dict[str, float] = {}  # when each collection's oldest pending write queued
+        self._retry_at: Dict[str, float] = {}  # backoff after a failed batch
+        self._in_flight = 0
+        self._flushing = 0
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        self.batches = 0
+        self.written = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def _ensure_worker(self):
+        # Re-create the worker after a fork or close(), where it is no longer running
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def add(self, collection: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+            on_written: Optional[OnWritten] = None):
+        """Queue documents for ``collection``; they are stored in the background"""
+        with self._cond:
+            self._ensure_worker()
+            pending = self._pending.setdefault(collection, {})
+            self._oldest.setdefault(collection, time.monotonic())
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                replaced = pending.pop(doc_id, None)
+                callback = on_written or (replaced.on_written if replaced else None)
+                pending[doc_id] = _Write(doc_id, document, metadata, callback)
+            if len(pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(writes) for writes in self._pending.values())
+
+    def _next_batch(self, now: float):
+        """A due collection and its batch, or None and how long to wait"""
+        wait = self.flush_seconds
+        for collection, writes in self._pending.items():
+            retry_at = self._retry_at.get(collection, 0.0)
+            if now < retry_at:
+                wait = min(wait, retry_at - now)
+                continue
+            due_at = self._oldest[collection] + self.flush_seconds
+            if len(writes) >= self.batch_size or self._flushing or self._stop or now >= due_at:
+                batch = list(writes.values())[:self.batch_size]
+                for write in batch:
+                    del writes[write.id]
+                if writes:
+                    self._oldest[collection] = now
+                else:
+                    del self._pending[collection]
+                    del self._oldest[collection]
+                return collection, batch, 0.0
+            wait = min(wait, due_at - now)
+        return None, None, max(wait, 0.001)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    collection, batch, wait = self._next_batch(time.monotonic())
+                    if batch:
+                        break
+                    if self._stop and not self._pending:
+                        return
+                    self._cond.wait(wait)
+                self._in_flight += 1
+
+            try:
+                self._write(collection, batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _write(self, collection: str, batch: List[_Write]):
+        ids = [write.id for write in batch]
+        documents = [write.document for write in batch]
+        try:
+            with span("embed", "write_behind", writes=len(batch)):
+                embeddings = self.embedder.embed(documents, use_cache=False)
+            with span("vector_write", "write_behind", collection=collection, writes=len(batch)):
+                self.registry.run(collection, lambda c: c.upsert(
+                    ids=ids,
+                    documents=documents,
+                    metadatas=[write.metadata for write in batch],
+                    embeddings=embeddings
+                ))
+        except Exception as e:
+            self._requeue(collection, batch, e)
+            return
+
+        with self._cond:
+            self._retry_at.pop(collection, None)
+            self.batches += 1
+            self.written += len(batch)
+
+        callbacks: Dict[int, List[_Write]] = {}
+        for write in batch:
+            if write.on_written is not None:
+                callbacks.setdefault(id(write.on_written), []).append(write)
+        for writes in callbacks.values():
+            try:
+                writes[0].on_written(collection, [w.id for w in writes], [w.document for w in writes])
+            except Exception as e:
+                logger.error(f"Post-write step for {collection} failed: {e}")
+
+    def _requeue(self, collection: str, batch: List[_Write], error: Exception):
+        # Attempts are per write: a batch can mix retried writes with ones queued since
+        for write in batch:
+            write.attempts += 1
+        retry = [write for write in batch if write.attempts <= self.max_retries]
+        dropped = len(batch) - len(retry)
+
+        with self._cond:
+            if dropped:
+                self.dropped += dropped
+                logger.error(f"Dropping {dropped} writes to {collection} after {self.max_retries} retries: {error}")
+            if not retry:
+                return
+
+            # Writes queued since the batch was taken are newer; keep them over the retried copies
+            newer = self._pending.get(collection, {})
+            self._pending[collection] = {
+                **{write.id: write for write in retry if write.id not in newer},
+                **newer
+            }
+            attempts = max(write.attempts for write in retry)
+            self._oldest.setdefault(collection, time.monotonic())
+            self._retry_at[collection] = time.monotonic() + self.retry_seconds * 2 ** (attempts - 1)
+            self.retries += 1
+        logger.warning(f"Write of {len(batch)} documents to {collection} failed (attempt {attempts}): {error}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued now, waiting through retries; False if ``timeout`` ran out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not self._pending and not self._in_flight:
+                return True
+            self._ensure_worker()
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: Optional[float] = 30.0):
+        """Flush pending writes and stop the worker; a later ``add`` starts it again"""
+        if not self.flush(timeout):
+            logger.error(f"Shutting down with {self.pending()} unwritten documents")
+        with self._cond:
+            self._stop = True
+            self._pending.clear()
+            self._oldest.clear()
+            self._retry_at.clear()
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "pending": sum(len(writes) for writes in self._pending.values()),
+                "in_flight": self._in_flight,
+                "batches": self.batches,
+                "written": self.written,
+                "retries": self.retries,
+                "dropped": self.dropped
+            }
+
+_queues: Dict[int, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+def get_write_behind_queue(client) -> WriteBehindQueue:
+    """Shared write-behind queue per vector store client"""
+    with _queues_lock:
+        if id(client) not in _queues:
+            _queues[id(client)] = WriteBehindQueue(get_collection_registry(client), get_embedding_batcher())
+        return _queues[id(client)]
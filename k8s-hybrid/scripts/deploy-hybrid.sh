@@ -85,6 +85,11 @@ apply_configs() {
     # Create namespace first
     kubectl apply -f base/00-namespace.yaml
     
+    # Model profiles the API routes with, from the repository's models/models.yml
+    kubectl -n ai-assistant create configmap models-config \
+        --from-file=models.yml=../models/models.yml \
+        --dry-run=client -o yaml | kubectl apply -f -
+    
     # Apply all base configurations
     kubectl apply -f base/
     
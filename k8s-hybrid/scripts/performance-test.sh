@@ -8,6 +8,13 @@ echo "==============================="
 API_URL="http://ai-assistant.company.local/api"
 OLLAMA_URL="http://ai-assistant.company.local/ollama"
 
+# Bearer token for the API: log in via /api/auth/login, or mint one with the
+# deployment's SECRET_KEY:
+#   python -c "from auth import create_access_token; print(create_access_token({'sub': 'perf-test', 'role': 'viewer'}))"
+API_TOKEN="${API_TOKEN:?Set API_TOKEN to a valid access token}"
+
+# For repeatable, cluster-free numbers use api/benchmark.py instead
+
 # Test configurations
 MODELS=("phi3:mini" "llama3.2:1b" "llama3.2:latest" "mistral:7b-instruct")
 PROMPTS=(
@@ -25,7 +32,8 @@ test_model() {
     
     response=$(curl -s -X POST $API_URL/query \
         -H "Content-Type: application/json" \
-        -d "{\"model\":\"$model\",\"prompt\":\"$prompt\",\"stream\":false}" \
+        -H "Authorization: Bearer $API_TOKEN" \
+        -d "{\"model\":\"$model\",\"query\":\"$prompt\",\"use_rag\":false,\"stream\":false}" \
         2>/dev/null)
     
     local end_time=$(date +%s.%N)
@@ -62,7 +70,8 @@ echo "Testing concurrent requests (10 parallel)..."
 for i in {1..10}; do
     curl -s -X POST $API_URL/query \
         -H "Content-Type: application/json" \
-        -d '{"model":"phi3:mini","prompt":"Hello","stream":false}' \
+        -H "Authorization: Bearer $API_TOKEN" \
+        -d '{"model":"phi3:mini","query":"Hello","use_rag":false,"stream":false}' \
         >/dev/null 2>&1 &
 done
 wait